@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class BotConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.bot'
+
+    def ready(self):
+        from apps.bot.tracing import install_db_tracing
+
+        # Запросы ORM учитываются в трассировке апдейтов бота (TracingMiddleware)
+        connection_created.connect(install_db_tracing, dispatch_uid="bot_db_tracing")
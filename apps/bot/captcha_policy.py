@@ -0,0 +1,113 @@
+"""
+Политики показа капчи.
+
+Политика получает скользящую статистику респондента (см. captcha_state) и
+решает, нужна ли капча. Все расчеты O(1) и не обращаются ни к БД, ни к Redis.
+Активная политика задается настройкой BOT_CAPTCHA_POLICY.
+"""
+import math
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from apps.bot.captcha_utils import should_show_captcha
+
+# Ответ быстрее этого порога (сек) считается "слишком быстрым" для человека
+FAST_ANSWER_SECONDS = 1.5
+# Коэффициент сглаживания экспоненциального среднего
+EWMA_ALPHA = 0.3
+# Аккаунт моложе этого считается новым
+NEW_ACCOUNT_SECONDS = 24 * 60 * 60
+# Сколько ответов с вариантами нужно, чтобы оценивать шаблон выбора
+PATTERN_MIN_ANSWERS = 4
+
+
+@dataclass
+class CaptchaStats:
+    """Скользящая статистика ответов респондента"""
+    answered: int = 0
+    since_captcha: int = 0
+    last_captcha_at: float | None = None
+    fast_ratio: float = 0.0
+    last_answer_at: float | None = None
+    joined_at: float | None = None
+    # {число предложенных вариантов: {позиция: сколько раз выбрана}}
+    option_counts: Dict[int, Dict[int, int]] = field(default_factory=dict)
+
+    @property
+    def option_entropy(self) -> float | None:
+        """
+        Нормированная энтропия выбранных позиций вариантов (0 — всегда одна позиция, 1 — равномерно).
+        Считается отдельно для вопросов с одинаковым числом вариантов и нормируется на
+        максимум при этом числе вариантов и ответов (log(min(вариантов, ответов))), затем
+        группы усредняются с весом по числу ответов. None, если данных пока мало.
+        """
+        weighted = 0.0
+        total = 0
+        for options, counts in self.option_counts.items():
+            answers = sum(counts.values())
+            reachable = min(options, answers)
+            if reachable < 2:
+                continue
+            entropy = -sum((n / answers) * math.log(n / answers) for n in counts.values() if n)
+            weighted += answers * min(entropy / math.log(reachable), 1.0)
+            total += answers
+        if total < PATTERN_MIN_ANSWERS:
+            return None
+        return weighted / total
+
+
+class CaptchaPolicy(ABC):
+    """Базовая политика: решает, показывать ли капчу по статистике респондента"""
+
+    @abstractmethod
+    def should_challenge(self, stats: CaptchaStats) -> bool:
+        ...
+
+
+class FixedIntervalPolicy(CaptchaPolicy):
+    """Прежнее поведение: капча на фиксированных номерах ответов (5, 10, 15, ...)"""
+
+    def should_challenge(self, stats: CaptchaStats) -> bool:
+        return should_show_captcha(stats.answered)
+
+
+class RiskScorePolicy(CaptchaPolicy):
+    """
+    Капча только при высоком риске. Сигналы:
+    - доля слишком быстрых ответов;
+    - низкая энтропия выбранных позиций (всегда первый вариант и т.п.);
+    - новый аккаунт.
+    """
+    min_answers = 3
+    min_answers_between = 5
+    weights = {"fast": 0.6, "pattern": 0.3, "new_account": 0.2}
+
+    def __init__(self, threshold: float | None = None):
+        self.threshold = threshold if threshold is not None else settings.BOT_CAPTCHA_RISK_THRESHOLD
+
+    def score(self, stats: CaptchaStats) -> float:
+        score = self.weights["fast"] * stats.fast_ratio
+        entropy = stats.option_entropy
+        if entropy is not None:
+            score += self.weights["pattern"] * (1 - entropy)
+        if stats.joined_at and time.time() - stats.joined_at < NEW_ACCOUNT_SECONDS:
+            score += self.weights["new_account"]
+        return score
+
+    def should_challenge(self, stats: CaptchaStats) -> bool:
+        if stats.answered < self.min_answers:
+            return False
+        if stats.last_captcha_at is not None and stats.since_captcha < self.min_answers_between:
+            return False
+        return self.score(stats) >= self.threshold
+
+
+@lru_cache(maxsize=1)
+def get_captcha_policy() -> CaptchaPolicy:
+    return import_string(settings.BOT_CAPTCHA_POLICY)()
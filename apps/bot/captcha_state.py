@@ -0,0 +1,176 @@
+"""
+Состояние капчи респондента в Redis.
+
+На горячем пути (get_next_question) решение о капче принимается без запросов
+к БД: счетчики ответов, скользящая статистика для политики (captcha_policy),
+время последней капчи и текущая задача хранятся в хэше
+`bot:captcha:<respondent_id>`. Завершенные задачи складываются в список
+CAPTCHA_AUDIT_KEY и пачками записываются в CaptchaChallenge задачей
+flush_captcha_audit_task.
+"""
+import time
+from typing import Any, Dict
+
+from django.conf import settings
+
+from apps.bot.captcha_policy import EWMA_ALPHA, FAST_ANSWER_SECONDS, CaptchaStats, get_captcha_policy
+from apps.bot.storage import get_redis, pack_data, unpack_data
+from apps.polls.models import Answer
+from apps.users.models import TGUser
+
+CAPTCHA_COOLDOWN_SECONDS = 30
+CAPTCHA_MAX_ATTEMPTS = 3
+CAPTCHA_AUDIT_KEY = "bot:captcha:audit"
+# Пачка, которую flush_captcha_audit_task сейчас пишет в БД (удаляется после коммита)
+CAPTCHA_AUDIT_PROCESSING_KEY = "bot:captcha:audit:processing"
+# Готовые капчи-картинки (file_id в Telegram + ответ), пополняется refill_captcha_image_pool_task
+CAPTCHA_IMAGE_POOL_KEY = "bot:captcha:images"
+
+
+def _key(respondent_id: int) -> str:
+    return f"bot:captcha:{respondent_id}"
+
+
+def _to_float(value) -> float | None:
+    return float(value) if value else None
+
+
+def _stats_from_hash(raw: Dict[bytes, bytes]) -> CaptchaStats:
+    fields = {key.decode(): value for key, value in raw.items()}
+    return CaptchaStats(
+        answered=int(fields.get("answered", 0)),
+        since_captcha=int(fields.get("since", 0)),
+        last_captcha_at=_to_float(fields.get("last_at")),
+        fast_ratio=float(fields.get("fast", 0)),
+        last_answer_at=_to_float(fields.get("last_answer_at")),
+        joined_at=_to_float(fields.get("joined_at")),
+        option_counts=_option_counts(fields),
+    )
+
+
+def _option_counts(fields: Dict[str, bytes]) -> Dict[int, Dict[int, int]]:
+    """Поля "opt:<число вариантов>:<позиция>" -> {число вариантов: {позиция: счетчик}}"""
+    counts: Dict[int, Dict[int, int]] = {}
+    for name, value in fields.items():
+        parts = name.split(":")
+        if parts[0] != "opt" or len(parts) != 3:
+            continue
+        counts.setdefault(int(parts[1]), {})[int(parts[2])] = int(value)
+    return counts
+
+
+async def _seed(respondent) -> Dict[str, Any]:
+    """Начальные значения при отсутствии ключа: счетчик ответов и дата регистрации из БД"""
+    answered = await Answer.objects.filter(respondent_id=respondent.id, is_answered=True).acount()
+    joined_at = await TGUser.objects.filter(id=respondent.tg_user_id).values_list("created_at", flat=True).afirst()
+    return {
+        "answered": answered,
+        "since": answered,
+        "joined_at": joined_at.timestamp() if joined_at else 0,
+    }
+
+
+async def register_answer(
+    respondent, increment: int = 1, option_index: int | None = None, option_count: int | None = None
+) -> CaptchaStats:
+    """
+    Учитывает ответ и возвращает скользящую статистику респондента.
+    option_index — позиция выбранного варианта, option_count — сколько вариантов было предложено.
+    Обычно это два обращения к Redis; БД читается только если ключа еще нет
+    (новый респондент, истек TTL).
+    """
+    redis = get_redis()
+    key = _key(respondent.id)
+    raw = await redis.hgetall(key)
+    if raw:
+        stats = _stats_from_hash(raw)
+        updates: Dict[str, Any] = {}
+    else:
+        # Свежий счетчик из БД уже включает текущий ответ
+        updates = await _seed(respondent)
+        stats = _stats_from_hash({k.encode(): str(v).encode() for k, v in updates.items()})
+        increment = 0
+
+    now = time.time()
+    if increment:
+        stats.answered += increment
+        stats.since_captcha += increment
+        if stats.last_answer_at is not None:
+            latency = now - stats.last_answer_at
+            is_fast = 1.0 if latency < FAST_ANSWER_SECONDS else 0.0
+            stats.fast_ratio = EWMA_ALPHA * is_fast + (1 - EWMA_ALPHA) * stats.fast_ratio
+            updates["fast"] = stats.fast_ratio
+        if option_index is not None and option_count:
+            counts = stats.option_counts.setdefault(option_count, {})
+            counts[option_index] = counts.get(option_index, 0) + 1
+    # От времени последнего ответа считается следующий интервал
+    stats.last_answer_at = now
+    updates["last_answer_at"] = now
+
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.hset(key, mapping=updates)
+        if increment:
+            pipe.hincrby(key, "answered", increment)
+            pipe.hincrby(key, "since", increment)
+            if option_index is not None and option_count:
+                pipe.hincrby(key, f"opt:{option_count}:{option_index}", 1)
+        pipe.expire(key, settings.BOT_FSM_STATE_TTL)
+        await pipe.execute()
+    return stats
+
+
+def is_captcha_due(stats: CaptchaStats) -> bool:
+    """Решение политики, но не чаще, чем раз в CAPTCHA_COOLDOWN_SECONDS"""
+    if stats.last_captcha_at is not None and time.time() - stats.last_captcha_at < CAPTCHA_COOLDOWN_SECONDS:
+        return False
+    return get_captcha_policy().should_challenge(stats)
+
+
+async def start_challenge(respondent_id: int, captcha_type: str, question: str, correct_answer: str) -> None:
+    now = time.time()
+    challenge = {
+        "captcha_type": captcha_type,
+        "question": question,
+        "correct_answer": correct_answer,
+        "attempts": 0,
+        "created_at": now,
+    }
+    await get_redis().hset(_key(respondent_id), mapping={"last_at": now, "since": 0, "pending": pack_data(challenge)})
+
+
+async def pop_image_challenge() -> Dict[str, Any] | None:
+    """Берет готовую капчу-картинку из пула; None, если пул пуст"""
+    raw = await get_redis().lpop(CAPTCHA_IMAGE_POOL_KEY)
+    return unpack_data(raw) if raw else None
+
+
+async def get_pending_challenge(respondent_id: int) -> Dict[str, Any] | None:
+    raw = await get_redis().hget(_key(respondent_id), "pending")
+    return unpack_data(raw) if raw else None
+
+
+async def record_attempt(respondent_id: int, challenge: Dict[str, Any], user_answer: str, is_correct: bool) -> Dict[str, Any]:
+    """
+    Учитывает попытку. Решенная или проваленная задача снимается с респондента
+    и ставится в очередь на запись в CaptchaChallenge.
+    """
+    challenge["attempts"] += 1
+    challenge["user_answer"] = user_answer
+    challenge["is_correct"] = is_correct
+
+    redis = get_redis()
+    key = _key(respondent_id)
+    if not is_correct and challenge["attempts"] < CAPTCHA_MAX_ATTEMPTS:
+        await redis.hset(key, "pending", pack_data(challenge))
+        return challenge
+
+    challenge["solved_at"] = time.time() if is_correct else None
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.hdel(key, "pending")
+        pipe.rpush(CAPTCHA_AUDIT_KEY, pack_data({"respondent_id": respondent_id, **challenge}))
+        await pipe.execute()
+    return challenge
+
+
+async def reset(respondent_id: int) -> None:
+    await get_redis().delete(_key(respondent_id))
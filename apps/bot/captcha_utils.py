@@ -2,6 +2,7 @@
 Утилиты для генерации и проверки капчи (антибот)
 """
 import random
+from io import BytesIO
 from typing import Tuple
 
 
@@ -85,6 +86,49 @@ def generate_text_captcha(lang='uz_cyrl') -> Tuple[str, str]:
     return question, answer
 
 
+def generate_image_captcha(length: int = 5) -> Tuple[bytes, str]:
+    """
+    Рисует капчу-картинку с искаженными цифрами (CPU-затратно, вызывается только в Celery)
+    Возвращает (PNG, правильный_ответ)
+    """
+    from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+    answer = ''.join(random.choice('23456789') for _ in range(length))
+    width, height = 40 * length + 40, 90
+    image = Image.new('RGB', (width, height), (245, 245, 245))
+    font = ImageFont.load_default(size=48)
+
+    for index, digit in enumerate(answer):
+        glyph = Image.new('RGBA', (60, 70), (0, 0, 0, 0))
+        color = tuple(random.randint(0, 120) for _ in range(3))
+        ImageDraw.Draw(glyph).text((10, 5), digit, font=font, fill=color)
+        glyph = glyph.rotate(random.randint(-30, 30), resample=Image.BICUBIC, expand=False)
+        image.paste(glyph, (20 + index * 40, random.randint(0, 20)), glyph)
+
+    draw = ImageDraw.Draw(image)
+    # Шум: линии и точки
+    for _ in range(6):
+        points = [(random.randint(0, width), random.randint(0, height)) for _ in range(2)]
+        draw.line(points, fill=tuple(random.randint(80, 200) for _ in range(3)), width=2)
+    for _ in range(width * 2):
+        draw.point((random.randint(0, width - 1), random.randint(0, height - 1)), fill=(90, 90, 90))
+    image = image.filter(ImageFilter.SMOOTH)
+
+    buffer = BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue(), answer
+
+
+def get_image_captcha_caption(lang='uz_cyrl') -> str:
+    """Подпись к капче-картинке"""
+    texts = {
+        'uz_cyrl': "🤖 Антибот текшируви\n\nРасмдаги рақамларни киритинг:",
+        'uz_latn': "🤖 Antibot tekshiruvi\n\nRasmdagi raqamlarni kiriting:",
+        'ru': "🤖 Антибот проверка\n\nВведите цифры с картинки:"
+    }
+    return texts.get(lang, texts['uz_cyrl'])
+
+
 def should_show_captcha(answered_count: int) -> bool:
     """
     Определяет, нужно ли показать капчу
@@ -1,7 +1,10 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
 from decimal import Decimal
+from typing import Any
+
 from aiogram import Router
 from aiogram.enums import ChatAction
-from aiogram.filters import Command
+from aiogram.filters import BaseFilter, Command
 from aiogram.fsm.context import FSMContext
 from aiogram.types import (
     CallbackQuery,
@@ -14,47 +17,73 @@ from aiogram.types import (
 )
 from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.core.cache import cache
 from django.utils import timezone
-from django.db.models import Q
+from django.db.models import Exists, OuterRef, Q
 
 from apps.bot.states import PollStates, WithdrawalStates
+from apps.bot.utils import ACTIVE_POLLS_CACHE_TTL, get_active_polls_cache_key
+from apps.users.ledger import InsufficientBalanceError, areserve_withdrawal
 from apps.users.models import TGUser, WithdrawalRequest, TransactionHistory, LanguageChoices
 from apps.polls.models import Poll, Respondent
 
 
 menu_router = Router()
 
+# Размер страницы для экранов истории (завершенные опросы, выводы)
+HISTORY_PAGE_SIZE = 10
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+MAIN_MENU_TEXTS = {
+    'uz_cyrl': {
+        'webapp': '📝 Сўровнома тузиш',
+        'balance': '💰 Баланс',
+        'language': '🌐 Тилни ўзгартириш',
+        'active_polls': '📊 Актив сўровномалар',
+        'completed_polls': '✅ Якунланган сўровномалар',
+        'withdrawal_history': '📜 Чиқариш тарихи'
+    },
+    'uz_latn': {
+        'webapp': "📝 So'rovnoma tuzish",
+        'balance': "💰 Balans",
+        'language': "🌐 Tilni o'zgartirish",
+        'active_polls': "📊 Aktiv so'rovnomalar",
+        'completed_polls': "✅ Yakunlangan so'rovnomalar",
+        'withdrawal_history': "📜 Chiqarish tarixi"
+    },
+    'ru': {
+        'webapp': '📝 Создать опрос',
+        'balance': '💰 Баланс',
+        'language': '🌐 Изменить язык',
+        'active_polls': '📊 Активные опросы',
+        'completed_polls': '✅ Пройденные опросы',
+        'withdrawal_history': '📜 История выводов'
+    }
+}
+
+# Обратный индекс: текст кнопки меню (на любом языке) -> действие.
+# Строится один раз при импорте, чтобы классифицировать сообщение одним поиском в словаре.
+MENU_BUTTON_ACTIONS: dict[str, str] = {
+    label: action
+    for lang_texts in MAIN_MENU_TEXTS.values()
+    for action, label in lang_texts.items()
+}
+
+
+class MenuButtonFilter(BaseFilter):
+    """Пропускает только нажатия кнопок главного меню и передает действие в хендлер"""
+
+    async def __call__(self, message: Message) -> bool | dict[str, Any]:
+        action = MENU_BUTTON_ACTIONS.get(message.text or '')
+        if action not in MENU_HANDLERS:
+            return False
+        return {'menu_action': action}
+
 
 def get_main_menu_keyboard(lang='uz_cyrl'):
     """Возвращает главное меню бота в зависимости от языка"""
-    texts = {
-        'uz_cyrl': {
-            'webapp': '📝 Сўровнома тузиш',
-            'balance': '💰 Баланс',
-            'language': '🌐 Тилни ўзгартириш',
-            'active_polls': '📊 Актив сўровномалар',
-            'completed_polls': '✅ Якунланган сўровномалар',
-            'withdrawal_history': '📜 Чиқариш тарихи'
-        },
-        'uz_latn': {
-            'webapp': "📝 So'rovnoma tuzish",
-            'balance': "💰 Balans",
-            'language': "🌐 Tilni o'zgartirish",
-            'active_polls': "📊 Aktiv so'rovnomalar",
-            'completed_polls': "✅ Yakunlangan so'rovnomalar",
-            'withdrawal_history': "📜 Chiqarish tarixi"
-        },
-        'ru': {
-            'webapp': '📝 Создать опрос',
-            'balance': '💰 Баланс',
-            'language': '🌐 Изменить язык',
-            'active_polls': '📊 Активные опросы',
-            'completed_polls': '✅ Пройденные опросы',
-            'withdrawal_history': '📜 История выводов'
-        }
-    }
-    
-    text = texts.get(lang, texts['uz_cyrl'])
+    text = MAIN_MENU_TEXTS.get(lang, MAIN_MENU_TEXTS['uz_cyrl'])
     
     keyboard = ReplyKeyboardMarkup(
         keyboard=[
@@ -208,6 +237,16 @@ def get_text(key, lang='uz_cyrl'):
             'uz_latn': "❌ Bekor qilish",
             'ru': '❌ Отмена'
         },
+        'prev_page': {
+            'uz_cyrl': '⬅️ Олдинги',
+            'uz_latn': "⬅️ Oldingi",
+            'ru': '⬅️ Назад'
+        },
+        'next_page': {
+            'uz_cyrl': 'Кейинги ➡️',
+            'uz_latn': "Keyingi ➡️",
+            'ru': 'Вперёд ➡️'
+        },
         'cancelled': {
             'uz_cyrl': '❌ Операция бекор қилинди.',
             'uz_latn': "❌ Operatsiya bekor qilindi.",
@@ -231,7 +270,12 @@ async def show_menu(message: Message, user: TGUser | None):
     )
 
 
-@menu_router.message(lambda message: message.text and any(x in message.text for x in ['💰 Баланс', '💰 Balans']))
+@menu_router.message(MenuButtonFilter())
+async def route_menu_button(message: Message, menu_action: str, user: TGUser | None):
+    """Единая точка входа для кнопок главного меню"""
+    await MENU_HANDLERS[menu_action](message, user)
+
+
 async def show_balance(message: Message, user: TGUser | None):
     """Показать баланс пользователя"""
     if not user:
@@ -338,17 +382,16 @@ async def process_payment_details(message: Message, state: FSMContext, user: TGU
     data = await state.get_data()
     amount = data.get('amount')
     
-    # Создаем запрос на вывод
-    withdrawal = await sync_to_async(WithdrawalRequest.objects.create)(
-        user=user,
-        amount=amount,
-        payment_details=payment_details,
-        status='pending'
-    )
-    
-    # Списываем с баланса (резервируем)
-    user.balance -= amount
-    await sync_to_async(user.save)()
+    # Создаем запрос на вывод и атомарно резервируем сумму на балансе
+    try:
+        await areserve_withdrawal(user.id, amount, payment_details)
+    except InsufficientBalanceError:
+        await state.clear()
+        await message.answer(
+            get_text('insufficient_balance', user.lang),
+            reply_markup=get_main_menu_keyboard(user.lang)
+        )
+        return
     
     # Очищаем состояние
     await state.clear()
@@ -360,7 +403,6 @@ async def process_payment_details(message: Message, state: FSMContext, user: TGU
     )
 
 
-@menu_router.message(lambda message: message.text and any(x in message.text for x in ['🌐 Тилни ўзгартириш', "🌐 Tilni o'zgartirish", '🌐 Изменить язык']))
 async def change_language(message: Message, user: TGUser | None):
     """Изменить язык"""
     if not user:
@@ -401,18 +443,32 @@ async def process_language_change(callback: CallbackQuery, user: TGUser | None):
     )
 
 
-@menu_router.message(lambda message: message.text and any(x in message.text for x in ['📊 Актив сўровномалар', "📊 Aktiv so'rovnomalar", '📊 Активные опросы']))
 async def show_active_polls(message: Message, user: TGUser | None):
     """Показать активные опросы"""
     if not user:
         return
     
+    cache_key = get_active_polls_cache_key(user.id)
+    cached = await cache.aget(cache_key)
+    if cached and cached['lang'] == user.lang:
+        await message.answer(cached['text'], reply_markup=build_active_polls_keyboard(cached['buttons']))
+        return
+    
     await message.bot.send_chat_action(message.from_user.id, action=ChatAction.TYPING)
     
-    # Получаем активные опросы
-    active_polls = await sync_to_async(list)(
-        Poll.objects.filter(deadline__gte=timezone.now())
+    # Получаем активные опросы вместе со статусом прохождения одним запросом
+    completed_respondents = Respondent.objects.filter(
+        tg_user=user,
+        poll=OuterRef('pk'),
+        finished_at__isnull=False
     )
+    active_polls = [
+        poll async for poll in Poll.objects.filter(
+            deadline__gte=timezone.now()
+        ).annotate(
+            completed=Exists(completed_respondents)
+        ).only('name', 'uuid', 'reward')
+    ]
     
     if not active_polls:
         await message.answer(get_text('no_active_polls', user.lang))
@@ -420,34 +476,34 @@ async def show_active_polls(message: Message, user: TGUser | None):
     
     text = get_text('active_polls_title', user.lang)
     
-    keyboard_buttons = []
+    buttons = []
     for poll in active_polls:
-        # Проверяем, прошел ли пользователь этот опрос
-        completed = await sync_to_async(
-            Respondent.objects.filter(
-                tg_user=user,
-                poll=poll,
-                finished_at__isnull=False
-            ).exists
-        )()
-        
-        status = '✅ ' if completed else '▶️ '
+        status = '✅ ' if poll.completed else '▶️ '
         poll_text = f"{status}{poll.name}\n"
         poll_text += get_text('poll_reward', user.lang).format(reward=poll.reward)
         
         text += f"\n{poll_text}\n"
         
-        if not completed:
-            keyboard_buttons.append([
-                InlineKeyboardButton(
-                    text=f"{poll.name}",
-                    callback_data=f"start_poll:{poll.uuid}"
-                )
-            ])
+        if not poll.completed:
+            buttons.append((poll.name, str(poll.uuid)))
     
-    keyboard = InlineKeyboardMarkup(inline_keyboard=keyboard_buttons) if keyboard_buttons else None
+    await cache.aset(
+        cache_key,
+        {'lang': user.lang, 'text': text, 'buttons': buttons},
+        ACTIVE_POLLS_CACHE_TTL
+    )
     
-    await message.answer(text, reply_markup=keyboard)
+    await message.answer(text, reply_markup=build_active_polls_keyboard(buttons))
+
+
+def build_active_polls_keyboard(buttons) -> InlineKeyboardMarkup | None:
+    """Собирает клавиатуру запуска опросов из пар (название, uuid)"""
+    if not buttons:
+        return None
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=name, callback_data=f"start_poll:{poll_uuid}")]
+        for name, poll_uuid in buttons
+    ])
 
 
 @menu_router.callback_query(lambda c: c.data.startswith('start_poll:'))
@@ -467,25 +523,67 @@ async def start_poll_from_menu(callback: CallbackQuery, state: FSMContext, user:
     await get_current_question(callback.bot, callback.from_user.id, state, user, poll_uuid=poll_uuid)
 
 
-@menu_router.message(lambda message: message.text and any(x in message.text for x in ['✅ Якунланган сўровномалар', "✅ Yakunlangan so'rovnomalar", '✅ Пройденные опросы']))
-async def show_completed_polls(message: Message, user: TGUser | None):
-    """Показать завершенные опросы"""
-    if not user:
-        return
-    
-    await message.bot.send_chat_action(message.from_user.id, action=ChatAction.TYPING)
-    
-    # Получаем завершенные опросы пользователя
-    completed_respondents = await sync_to_async(list)(
-        Respondent.objects.filter(
-            tg_user=user,
-            finished_at__isnull=False
-        ).select_related('poll').order_by('-finished_at')
-    )
+def encode_history_cursor(moment: datetime, pk: int) -> str:
+    """Кодирует позицию (дата, id) в компактную строку для callback_data"""
+    return f"{(moment - EPOCH) // timedelta(microseconds=1)}_{pk}"
+
+
+def decode_history_cursor(raw: str) -> tuple[datetime, int]:
+    micros, pk = raw.split('_', 1)
+    micros = int(micros)
+    moment = EPOCH + timedelta(seconds=micros // 1_000_000, microseconds=micros % 1_000_000)
+    return moment, int(pk)
+
+
+async def fetch_history_page(queryset, date_field: str, cursor: str | None = None, direction: str = 'next'):
+    """
+    Keyset-пагинация по (date_field, id) в порядке убывания.
+    Возвращает (объекты страницы, есть_предыдущая, есть_следующая) и читает из БД только одну страницу.
+    """
+    if cursor is None:
+        items = [obj async for obj in queryset.order_by(f'-{date_field}', '-id')[:HISTORY_PAGE_SIZE + 1]]
+        return items[:HISTORY_PAGE_SIZE], False, len(items) > HISTORY_PAGE_SIZE
+
+    moment, pk = decode_history_cursor(cursor)
+    if direction == 'next':
+        # Более старые записи, чем последняя на текущей странице
+        queryset = queryset.filter(Q(**{f'{date_field}__lt': moment}) | Q(**{date_field: moment, 'id__lt': pk}))
+        items = [obj async for obj in queryset.order_by(f'-{date_field}', '-id')[:HISTORY_PAGE_SIZE + 1]]
+        return items[:HISTORY_PAGE_SIZE], True, len(items) > HISTORY_PAGE_SIZE
+
+    # Более новые записи, чем первая на текущей странице
+    queryset = queryset.filter(Q(**{f'{date_field}__gt': moment}) | Q(**{date_field: moment, 'id__gt': pk}))
+    items = [obj async for obj in queryset.order_by(date_field, 'id')[:HISTORY_PAGE_SIZE + 1]]
+    has_prev = len(items) > HISTORY_PAGE_SIZE
+    items = items[:HISTORY_PAGE_SIZE]
+    items.reverse()
+    return items, has_prev, True
+
+
+def build_history_keyboard(kind: str, items, date_field: str, has_prev: bool, has_next: bool, lang: str):
+    """Кнопки навигации по истории; курсоры берутся из первой и последней записи страницы"""
+    row = []
+    if has_prev:
+        first = items[0]
+        cursor = encode_history_cursor(getattr(first, date_field), first.id)
+        row.append(InlineKeyboardButton(text=get_text('prev_page', lang), callback_data=f"history:{kind}:prev:{cursor}"))
+    if has_next:
+        last = items[-1]
+        cursor = encode_history_cursor(getattr(last, date_field), last.id)
+        row.append(InlineKeyboardButton(text=get_text('next_page', lang), callback_data=f"history:{kind}:next:{cursor}"))
+    return InlineKeyboardMarkup(inline_keyboard=[row]) if row else None
+
+
+async def render_completed_polls_page(user: TGUser, cursor: str | None = None, direction: str = 'next'):
+    """Возвращает (текст, клавиатура) страницы завершенных опросов или None, если их нет"""
+    queryset = Respondent.objects.filter(
+        tg_user=user,
+        finished_at__isnull=False
+    ).select_related('poll')
+    completed_respondents, has_prev, has_next = await fetch_history_page(queryset, 'finished_at', cursor, direction)
     
     if not completed_respondents:
-        await message.answer(get_text('no_completed_polls', user.lang))
-        return
+        return None
     
     text = get_text('completed_polls_title', user.lang)
     
@@ -497,25 +595,17 @@ async def show_completed_polls(message: Message, user: TGUser | None):
         if poll.reward > 0:
             text += get_text('earned', user.lang).format(amount=poll.reward) + "\n"
     
-    await message.answer(text)
+    keyboard = build_history_keyboard('polls', completed_respondents, 'finished_at', has_prev, has_next, user.lang)
+    return text, keyboard
 
 
-@menu_router.message(lambda message: message.text and any(x in message.text for x in ['📜 Чиқариш тарихи', "📜 Chiqarish tarixi", '📜 История выводов']))
-async def show_withdrawal_history(message: Message, user: TGUser | None):
-    """Показать историю выводов"""
-    if not user:
-        return
-    
-    await message.bot.send_chat_action(message.from_user.id, action=ChatAction.TYPING)
-    
-    # Получаем историю выводов
-    withdrawals = await sync_to_async(list)(
-        WithdrawalRequest.objects.filter(user=user).order_by('-created_at')
-    )
+async def render_withdrawal_history_page(user: TGUser, cursor: str | None = None, direction: str = 'next'):
+    """Возвращает (текст, клавиатура) страницы истории выводов или None, если их нет"""
+    queryset = WithdrawalRequest.objects.filter(user=user).only('id', 'amount', 'status', 'created_at')
+    withdrawals, has_prev, has_next = await fetch_history_page(queryset, 'created_at', cursor, direction)
     
     if not withdrawals:
-        await message.answer(get_text('no_withdrawal_history', user.lang))
-        return
+        return None
     
     text = get_text('withdrawal_history_title', user.lang)
     
@@ -529,5 +619,74 @@ async def show_withdrawal_history(message: Message, user: TGUser | None):
         text += f"📅 {created_date}\n"
         text += f"{status}\n"
     
-    await message.answer(text)
+    keyboard = build_history_keyboard('withdrawals', withdrawals, 'created_at', has_prev, has_next, user.lang)
+    return text, keyboard
+
+
+HISTORY_RENDERERS = {
+    'polls': render_completed_polls_page,
+    'withdrawals': render_withdrawal_history_page,
+}
+
+
+async def show_completed_polls(message: Message, user: TGUser | None):
+    """Показать завершенные опросы"""
+    if not user:
+        return
+    
+    await message.bot.send_chat_action(message.from_user.id, action=ChatAction.TYPING)
+    
+    page = await render_completed_polls_page(user)
+    if not page:
+        await message.answer(get_text('no_completed_polls', user.lang))
+        return
+    
+    text, keyboard = page
+    await message.answer(text, reply_markup=keyboard)
+
+
+async def show_withdrawal_history(message: Message, user: TGUser | None):
+    """Показать историю выводов"""
+    if not user:
+        return
+    
+    await message.bot.send_chat_action(message.from_user.id, action=ChatAction.TYPING)
+    
+    page = await render_withdrawal_history_page(user)
+    if not page:
+        await message.answer(get_text('no_withdrawal_history', user.lang))
+        return
+    
+    text, keyboard = page
+    await message.answer(text, reply_markup=keyboard)
+
+
+@menu_router.callback_query(lambda c: c.data.startswith('history:'))
+async def paginate_history(callback: CallbackQuery, user: TGUser | None):
+    """Переключение страниц истории (опросы / выводы)"""
+    if not user:
+        return
+    
+    try:
+        _prefix, kind, direction, cursor = callback.data.split(':', 3)
+        renderer = HISTORY_RENDERERS[kind]
+        page = await renderer(user, cursor, direction)
+    except (KeyError, ValueError):
+        await callback.answer()
+        return
+    
+    await callback.answer()
+    if not page:
+        return
+    
+    text, keyboard = page
+    await callback.message.edit_text(text, reply_markup=keyboard)
+
 
+MENU_HANDLERS = {
+    'balance': show_balance,
+    'language': change_language,
+    'active_polls': show_active_polls,
+    'completed_polls': show_completed_polls,
+    'withdrawal_history': show_withdrawal_history,
+}
@@ -2,9 +2,9 @@ from aiogram import Router, types
 from aiogram.fsm.context import FSMContext
 from aiogram.types import ReplyKeyboardRemove
 from django.utils.translation import gettext_lazy as _
-from django.utils import timezone
 from asgiref.sync import sync_to_async
 
+from apps.bot import captcha_state
 from apps.bot.states import PollStates
 from apps.bot.utils import get_next_question, send_confirmation_text
 from apps.bot.captcha_utils import (
@@ -12,7 +12,7 @@ from apps.bot.captcha_utils import (
     get_captcha_failed_message,
     get_captcha_success_message
 )
-from apps.polls.models import Respondent, Answer, Question, CaptchaChallenge
+from apps.polls.models import Respondent, Answer, Question
 from apps.users.models import TGUser
 
 poll_router = Router()
@@ -56,7 +56,6 @@ async def process_custom_input(message: types.Message, state: FSMContext, user:
         message.from_user.id,
         state,
         respondent,
-        respondent.history,
         question_id
     )
 
@@ -65,40 +64,30 @@ async def process_custom_input(message: types.Message, state: FSMContext, user:
 async def process_captcha_answer(message: types.Message, state: FSMContext, user: TGUser):
     """Обработка ответа на капчу"""
     data = await state.get_data()
-    captcha_id = data.get("captcha_id")
     respondent_id = data.get("respondent_id")
-    previous_questions = data.get("previous_questions", [])
     question_id = data.get("question_id")
-    
-    if not captcha_id:
+
+    challenge = await captcha_state.get_pending_challenge(respondent_id) if respondent_id else None
+    if not challenge:
         await message.answer("Ошибка: капча не найдена")
         await state.clear()
         return
-    
+
     try:
-        captcha = await CaptchaChallenge.objects.aget(id=captcha_id)
         respondent = await Respondent.objects.select_related('tg_user', 'poll').aget(id=respondent_id)
-    except (CaptchaChallenge.DoesNotExist, Respondent.DoesNotExist):
+    except Respondent.DoesNotExist:
         await message.answer("Ошибка: данные не найдены")
         await state.clear()
         return
-    
-    user_answer = message.text.strip().lower()
-    correct_answer = captcha.correct_answer.lower()
-    
-    # Обновляем капчу
-    captcha.user_answer = message.text.strip()
-    captcha.attempts += 1
-    
-    if user_answer == correct_answer:
-        # Правильный ответ
-        captcha.is_correct = True
-        captcha.solved_at = timezone.now()
-        await sync_to_async(captcha.save)()
-        
+
+    user_answer = message.text.strip()
+    is_correct = user_answer.lower() == challenge["correct_answer"].lower()
+    challenge = await captcha_state.record_attempt(respondent_id, challenge, user_answer, is_correct)
+
+    if is_correct:
         # Отправляем сообщение об успехе
         await message.answer(get_captcha_success_message(user.lang))
-        
+
         # Продолжаем опрос
         await state.clear()
         await get_next_question(
@@ -106,23 +95,20 @@ async def process_captcha_answer(message: types.Message, state: FSMContext, user
             message.from_user.id,
             state,
             respondent,
-            previous_questions,
-            question_id
+            question_id,
+            count_answer=False
         )
+    elif challenge["attempts"] >= captcha_state.CAPTCHA_MAX_ATTEMPTS:
+        # Превышено количество попыток
+        await message.answer(get_captcha_failed_message(user.lang))
+
+        # Удаляем респондента и его ответы (бот)
+        await sync_to_async(Answer.objects.filter(respondent=respondent).delete)()
+        await sync_to_async(respondent.delete)()
+        await captcha_state.reset(respondent_id)
+
+        await state.clear()
     else:
-        # Неправильный ответ
-        await sync_to_async(captcha.save)()
-        
-        if captcha.attempts >= 3:
-            # Превышено количество попыток
-            await message.answer(get_captcha_failed_message(user.lang))
-            
-            # Удаляем респондента и его ответы (бот)
-            await sync_to_async(Answer.objects.filter(respondent=respondent).delete)()
-            await sync_to_async(respondent.delete)()
-            
-            await state.clear()
-        else:
-            # Еще есть попытки
-            await message.answer(get_captcha_error_message(user.lang, captcha.attempts))
-            # Состояние остается тем же - ждем новый ответ
+        # Еще есть попытки
+        await message.answer(get_captcha_error_message(user.lang, challenge["attempts"]))
+        # Состояние остается тем же - ждем новый ответ
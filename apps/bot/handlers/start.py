@@ -1,3 +1,4 @@
+import logging
 from uuid import UUID
 
 from aiogram.enums import ChatAction
@@ -15,11 +16,16 @@ from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from apps.bot.states import PollStates
-from apps.bot.utils import get_current_question, get_next_question, poll_checker, ANOTHER_STR, send_confirmation_text
+from apps.bot.storage import set_state_and_data
+from apps.bot.utils import (
+    get_current_question, get_next_question, poll_checker, ANOTHER_STR, send_confirmation_text,
+    invalidate_active_polls_cache
+)
 from apps.polls.models import Answer, Question, Respondent, Poll
 from apps.users.models import TGUser
 
 start_router = Router()
+logger = logging.getLogger(__name__)
 
 
 async def safe_edit_text(message: Message, text: str, reply_markup: InlineKeyboardMarkup | None = None):
@@ -29,9 +35,9 @@ async def safe_edit_text(message: Message, text: str, reply_markup: InlineKeyboa
         elif message.reply_markup != reply_markup:
             await message.edit_reply_markup(reply_markup=reply_markup)
         else:
-            print("ℹ️ Пропущено редактирование: текст и кнопки не изменились.")
+            logger.debug("Skip edit: text and markup unchanged", extra={"message_id": message.message_id})
     except TelegramBadRequest as e:
-        print(f"⚠️ Ошибка при редактировании сообщения: {e}")
+        logger.warning("Failed to edit message: %s", e, extra={"message_id": message.message_id})
 
 
 async def safe_delete_or_edit(message, text: str = None, reply_markup=None):
@@ -45,7 +51,7 @@ async def safe_delete_or_edit(message, text: str = None, reply_markup=None):
         else:
             await message.delete()
     except Exception as e:
-        print(f"⚠️ safe_delete_or_edit error: {e}")
+        logger.warning("safe_delete_or_edit failed: %s", e)
 
 
 @start_router.message(CommandStart(deep_link=True))
@@ -113,6 +119,7 @@ async def poll_callback_handler(callback, state: FSMContext, user: TGUser | None
         # ❗ Удаляем старого респондента и его ответы
         await Answer.objects.filter(respondent__tg_user=user, respondent__poll=poll).adelete()
         await Respondent.objects.filter(tg_user=user, poll=poll).adelete()
+        await invalidate_active_polls_cache(user.id)
 
         await safe_delete_or_edit(callback.message, str(_("Сўровнома янгидан бошланди.")))
         await get_current_question(callback.bot, callback.from_user.id, state, user, poll_uuid=poll_uuid)
@@ -128,11 +135,11 @@ async def handle_poll_answer(poll_answer: PollAnswer, state: FSMContext, user: T
             telegram_poll_id=telegram_poll_id
         )
     except Answer.DoesNotExist:
-        print("❌ Не найден answer по poll_id")
+        logger.warning("Answer not found for poll", extra={"telegram_poll_id": telegram_poll_id})
         return
 
     if not poll_answer.option_ids:
-        print("⚠️ Пользователь ничего не выбрал, повторяем вопрос")
+        logger.debug("Empty poll answer, repeating question", extra={"user_id": poll_answer.user.id})
         unfinished_answer = await Answer.objects.select_related("question", "respondent").filter(
             respondent__tg_user=user,
             is_answered=False,
@@ -204,7 +211,9 @@ async def handle_poll_answer(poll_answer: PollAnswer, state: FSMContext, user: T
         answer.is_answered = False
         await answer.asave()
 
-        await state.update_data(
+        await set_state_and_data(
+            state,
+            PollStates.waiting_for_mixed_custom_input,
             answer_id=answer.id,
             respondent_id=answer.respondent_id,
             question_id=answer.question_id
@@ -213,7 +222,6 @@ async def handle_poll_answer(poll_answer: PollAnswer, state: FSMContext, user: T
             poll_answer.user.id,
             "📝 Илтимос, ўз жавобингизни матн сифатида юборинг:"
         )
-        await state.set_state(PollStates.waiting_for_mixed_custom_input)
         return
 
 
@@ -222,8 +230,11 @@ async def handle_poll_answer(poll_answer: PollAnswer, state: FSMContext, user: T
     await answer.asave()
     await send_confirmation_text(poll_answer.bot, answer)
     # Следующий вопрос
-    await get_next_question(poll_answer.bot, poll_answer.user.id, state, answer.respondent,
-                            answer.respondent.history, answer.question_id)
+    await get_next_question(
+        poll_answer.bot, poll_answer.user.id, state, answer.respondent, answer.question_id,
+        option_index=min(selected_indexes) if selected_indexes else None,
+        option_count=len(choices) + (1 if is_mixed else 0),
+    )
 
 
 @start_router.message(PollStates.waiting_for_mixed_custom_input)
@@ -245,7 +256,6 @@ async def handle_custom_input_for_mixed(message: Message, state: FSMContext, use
         await send_confirmation_text(message.bot, answer, open_answer)
         await message.answer("✅ Жавоб қабул қилинди!", reply_markup=ReplyKeyboardRemove())
 
-        await get_next_question(message.bot, message.chat.id, state, answer.respondent, answer.respondent.history,
-                                answer.question_id)
+        await get_next_question(message.bot, message.chat.id, state, answer.respondent, answer.question_id)
     else:
         await get_current_question(message.bot, message.from_user.id, state, user)
@@ -1,14 +1,86 @@
 import logging
+import random
 from typing import Callable, Awaitable, Dict, Any
 
 from aiogram.dispatcher.middlewares.base import BaseMiddleware
 from aiogram.exceptions import TelegramForbiddenError
-from aiogram.types import TelegramObject
+from aiogram.types import TelegramObject, Update
+from django.conf import settings
 
+from apps.bot.tracing import UpdateTrace, current_trace
 from apps.bot.utils import async_get_or_create_user
 from apps.users.models import TGUser
+from config import metrics
 
 logger = logging.getLogger(__name__)
+trace_logger = logging.getLogger("apps.bot.trace")
+
+
+class TracingMiddleware(BaseMiddleware):
+    """
+    Внешний middleware на update: время обработки, число и время запросов ORM,
+    вызовы Bot API. Медленные апдейты (BOT_TRACE_SLOW_MS) пишутся в лог со списком
+    запросов, остальные — с вероятностью BOT_TRACE_SAMPLE_RATE.
+    Должен стоять первым, чтобы учитывать запросы остальных middleware.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        trace = UpdateTrace(
+            update_id=getattr(event, "update_id", None),
+            event_type=event.event_type if isinstance(event, Update) else type(event).__name__,
+        )
+        token = current_trace.set(trace)
+        try:
+            return await handler(event, data)
+        finally:
+            current_trace.reset(token)
+            self.emit(trace)
+
+    @staticmethod
+    def emit(trace: UpdateTrace) -> None:
+        elapsed = trace.elapsed()
+        metrics.BOT_UPDATE_DURATION.labels(trace.handler).observe(elapsed)
+        metrics.BOT_UPDATE_QUERIES.labels(trace.handler).observe(trace.query_count)
+        metrics.BOT_UPDATE_DB_TIME.labels(trace.handler).observe(trace.db_time)
+
+        is_slow = elapsed * 1000 >= settings.BOT_TRACE_SLOW_MS
+        if not is_slow and random.random() >= settings.BOT_TRACE_SAMPLE_RATE:
+            return
+        extra = {
+            "update_id": trace.update_id,
+            "event_type": trace.event_type,
+            "handler": trace.handler,
+            "duration_ms": round(elapsed * 1000, 1),
+            "db_queries": trace.query_count,
+            "db_ms": round(trace.db_time * 1000, 1),
+            "api_calls": [(method, round(duration * 1000, 1)) for method, duration in trace.api_calls],
+        }
+        if is_slow:
+            extra["queries"] = [(sql, round(duration * 1000, 2)) for sql, duration in trace.queries]
+            trace_logger.warning("slow update %s handled by %s", trace.update_id, trace.handler, extra={"trace": extra})
+        else:
+            trace_logger.info("update %s handled by %s", trace.update_id, trace.handler, extra={"trace": extra})
+
+
+class HandlerNameMiddleware(BaseMiddleware):
+    """Внутренний middleware: записывает в трассировку имя выбранного обработчика"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        trace = current_trace.get()
+        handler_object = data.get("handler")
+        if trace is not None and handler_object is not None:
+            trace.handler = getattr(handler_object.callback, "__name__", "unknown")
+        return await handler(event, data)
 
 
 class UserInternalIdMiddleware(BaseMiddleware):
@@ -1,11 +1,9 @@
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
-from aiogram.fsm.storage.redis import RedisStorage
 from aiogram.fsm.storage.memory import MemoryStorage
 from django.conf import settings
 from django.urls import reverse
-from redis.asyncio import Redis
 
 from apps.bot.handlers.echo import echo_router
 from apps.bot.handlers.start import start_router
@@ -13,20 +11,24 @@ from apps.bot.handlers.poll import poll_router
 from apps.bot.handlers.menu import menu_router
 from apps.bot.middlewares import UserInternalIdMiddleware
 from apps.bot.middlewares import ForbiddenUserMiddleware
-
-
-def get_redis_storage():
-    redis = Redis.from_url(settings.CACHES["default"]["LOCATION"])
-    return RedisStorage(redis)
+from apps.bot.middlewares import HandlerNameMiddleware
+from apps.bot.middlewares import TracingMiddleware
+from apps.bot.session import InstrumentedAiohttpSession
+from config import metrics
+from config.log import setup_queue_logging
+from apps.bot.storage import get_redis_storage
 
 
 def register_all_misc() -> (Dispatcher, Bot):
-    redis_storage = get_redis_storage()
-    memory_storage = MemoryStorage()
+    # Логи не должны блокировать event loop записью в stdout
+    setup_queue_logging()
     # Dispatcher is a root router
-    dp = Dispatcher(storage=memory_storage if settings.DEBUG else redis_storage)
+    dp = Dispatcher(storage=MemoryStorage() if settings.DEBUG else get_redis_storage())
+    dp.update.outer_middleware(TracingMiddleware())
     dp.update.outer_middleware(UserInternalIdMiddleware())
     dp.update.outer_middleware(ForbiddenUserMiddleware())
+    for observer in (dp.message, dp.callback_query, dp.poll_answer, dp.pre_checkout_query):
+        observer.middleware(HandlerNameMiddleware())
     # Register all the routers from handlers package
     routers = (
         menu_router,
@@ -36,13 +38,18 @@ def register_all_misc() -> (Dispatcher, Bot):
     )
     dp.include_routers(*routers)
     # Initialize Bot instance with default bot properties which will be passed to all API calls
-    bot = Bot(token=settings.BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+    bot = Bot(
+        token=settings.BOT_TOKEN,
+        session=InstrumentedAiohttpSession(),
+        default=DefaultBotProperties(parse_mode=ParseMode.HTML),
+    )
     return dp, bot
 
 
 async def bot_polling() -> None:
     # And the run events dispatching
     dp, bot = register_all_misc()
+    metrics.start_metrics_server()
 
     await dp.start_polling(bot)
 
@@ -56,7 +63,11 @@ def get_webhook_url():
 
 def get_bot_instance() -> Bot:
     """Возвращает экземпляр бота для использования в задачах Celery"""
-    return Bot(token=settings.BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+    return Bot(
+        token=settings.BOT_TOKEN,
+        session=InstrumentedAiohttpSession(),
+        default=DefaultBotProperties(parse_mode=ParseMode.HTML),
+    )
 
 
 async def start_webhook() -> None:
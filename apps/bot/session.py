@@ -0,0 +1,21 @@
+"""
+HTTP-сессия бота с замером каждого вызова Bot API: метрики в config.metrics
+и запись в трассировку текущего апдейта (apps.bot.tracing)
+"""
+import time
+
+from aiogram.client.session.aiohttp import AiohttpSession
+
+from apps.bot.tracing import record_api_call
+from config import metrics
+
+
+class InstrumentedAiohttpSession(AiohttpSession):
+    async def make_request(self, bot, method, timeout=None):
+        api_method = method.__api_method__
+        start = time.perf_counter()
+        try:
+            with metrics.bot_api_timer(api_method):
+                return await super().make_request(bot, method, timeout=timeout)
+        finally:
+            record_api_call(api_method, time.perf_counter() - start)
@@ -0,0 +1,109 @@
+"""
+Redis-хранилище FSM для бота.
+
+- один общий пул соединений на процесс (FSM, капча и прочие данные бота в Redis);
+- данные состояния кодируются msgpack вместо JSON;
+- у записей состояния и данных есть TTL, чтобы брошенные опросы не копились вечно;
+- set_state + update_data можно выполнить за два обращения к Redis вместо трех.
+"""
+from decimal import Decimal
+from typing import Any, Dict, Mapping
+
+import msgpack
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import StateType, StorageKey
+from aiogram.fsm.storage.redis import RedisStorage
+from django.conf import settings
+from redis.asyncio import ConnectionPool, Redis
+
+_redis_pool: ConnectionPool | None = None
+
+
+def get_redis() -> Redis:
+    """Возвращает async-клиент Redis поверх общего для процесса пула соединений"""
+    global _redis_pool
+    if _redis_pool is None:
+        _redis_pool = ConnectionPool.from_url(
+            settings.REDIS_URL,
+            max_connections=settings.BOT_REDIS_MAX_CONNECTIONS,
+        )
+    return Redis(connection_pool=_redis_pool)
+
+
+def _pack_default(obj: Any) -> Any:
+    # Decimal (например, сумма вывода) хранится строкой
+    if isinstance(obj, Decimal):
+        return str(obj)
+    raise TypeError(f"Cannot serialize {type(obj).__name__} to msgpack")
+
+
+def pack_data(data: Mapping[str, Any]) -> bytes:
+    return msgpack.packb(data, default=_pack_default, use_bin_type=True)
+
+
+def unpack_data(value: bytes) -> Dict[str, Any]:
+    return msgpack.unpackb(value, raw=False, strict_map_key=False)
+
+
+class MsgPackRedisStorage(RedisStorage):
+    """RedisStorage с msgpack-кодированием данных и пайплайном для state + data"""
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        redis_key = self.key_builder.build(key, "data")
+        if not data:
+            await self.redis.delete(redis_key)
+            return
+        await self.redis.set(redis_key, pack_data(data), ex=self.data_ttl)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        redis_key = self.key_builder.build(key, "data")
+        value = await self.redis.get(redis_key)
+        if value is None:
+            return {}
+        return unpack_data(value)
+
+    async def set_state_and_update_data(
+        self,
+        key: StorageKey,
+        state: StateType,
+        data: Mapping[str, Any],
+    ) -> Dict[str, Any]:
+        """
+        Устанавливает состояние и дополняет данные.
+        Чтение текущих данных и запись состояния идут одним пайплайном.
+        """
+        state_key = self.key_builder.build(key, "state")
+        data_key = self.key_builder.build(key, "data")
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.get(data_key)
+            if state is None:
+                pipe.delete(state_key)
+            else:
+                pipe.set(
+                    state_key,
+                    state.state if isinstance(state, State) else state,
+                    ex=self.state_ttl,
+                )
+            raw_data, _ = await pipe.execute()
+
+        current = unpack_data(raw_data) if raw_data is not None else {}
+        current.update(data)
+        await self.redis.set(data_key, pack_data(current), ex=self.data_ttl)
+        return current
+
+
+def get_redis_storage() -> MsgPackRedisStorage:
+    return MsgPackRedisStorage(
+        get_redis(),
+        state_ttl=settings.BOT_FSM_STATE_TTL,
+        data_ttl=settings.BOT_FSM_STATE_TTL,
+    )
+
+
+async def set_state_and_data(state: FSMContext, new_state: StateType, **data: Any) -> Dict[str, Any]:
+    """Аналог state.set_state() + state.update_data() с меньшим числом обращений к хранилищу"""
+    if isinstance(state.storage, MsgPackRedisStorage):
+        return await state.storage.set_state_and_update_data(state.key, new_state, data)
+    await state.set_state(new_state)
+    return await state.update_data(**data)
@@ -0,0 +1,59 @@
+import time
+
+import pytest
+
+from apps.bot.captcha_policy import CaptchaPolicy
+from apps.bot.captcha_policy import CaptchaStats
+from apps.bot.captcha_policy import FixedIntervalPolicy
+from apps.bot.captcha_policy import RiskScorePolicy
+
+
+def test_option_entropy_is_none_until_enough_answers():
+    assert CaptchaStats(option_counts={4: {0: 2, 1: 1}}).option_entropy is None
+
+
+def test_uniform_answers_on_two_option_questions_are_not_a_pattern():
+    stats = CaptchaStats(option_counts={2: {0: 3, 1: 3}})
+
+    assert stats.option_entropy == pytest.approx(1.0)
+
+
+def test_few_answers_on_wide_questions_are_normalized_by_reachable_entropy():
+    # 4 разных ответа на вопросах из 10 вариантов — максимально разнообразно
+    stats = CaptchaStats(option_counts={10: {0: 1, 3: 1, 5: 1, 9: 1}})
+
+    assert stats.option_entropy == pytest.approx(1.0)
+
+
+def test_always_first_option_scores_zero_entropy():
+    stats = CaptchaStats(option_counts={3: {0: 4}, 5: {0: 3}})
+
+    assert stats.option_entropy == pytest.approx(0.0)
+
+
+def test_risk_policy_challenges_fast_patterned_new_account():
+    stats = CaptchaStats(
+        answered=10,
+        since_captcha=10,
+        fast_ratio=0.9,
+        joined_at=time.time(),
+        option_counts={4: {0: 10}},
+    )
+
+    assert RiskScorePolicy(threshold=0.7).should_challenge(stats)
+
+
+def test_risk_policy_leaves_honest_user_on_small_questions_alone():
+    stats = CaptchaStats(answered=10, since_captcha=10, fast_ratio=0.0, option_counts={2: {0: 5, 1: 5}, 3: {0: 1, 1: 1, 2: 1}})
+
+    assert not RiskScorePolicy(threshold=0.3).should_challenge(stats)
+
+
+def test_fixed_interval_policy_uses_answer_number():
+    assert FixedIntervalPolicy().should_challenge(CaptchaStats(answered=5))
+    assert not FixedIntervalPolicy().should_challenge(CaptchaStats(answered=4))
+
+
+def test_policy_base_class_is_abstract():
+    with pytest.raises(TypeError):
+        CaptchaPolicy()
@@ -0,0 +1,67 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from apps.bot.handlers.menu import HISTORY_PAGE_SIZE
+from apps.bot.handlers.menu import build_history_keyboard
+from apps.bot.handlers.menu import decode_history_cursor
+from apps.bot.handlers.menu import encode_history_cursor
+from apps.bot.handlers.menu import fetch_history_page
+from apps.polls.models import Respondent
+from apps.polls.tests.factories import PollFactory
+from apps.users.models import TGUser
+
+# ORM вызывается из asyncio.run в отдельном потоке, поэтому нужны настоящие транзакции
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+@pytest.fixture
+def respondents():
+    tg_user = TGUser.objects.create(id=7001, fullname="Respondent")
+    now = timezone.now().replace(microsecond=123456)
+    for index in range(HISTORY_PAGE_SIZE + 3):
+        # У двух соседних записей одинаковая дата — порядок решает id
+        finished_at = now - timedelta(minutes=index // 2)
+        Respondent.objects.create(tg_user=tg_user, poll=PollFactory(), finished_at=finished_at)
+    return Respondent.objects.filter(tg_user=tg_user)
+
+
+def ordered_ids(queryset):
+    return list(queryset.order_by("-finished_at", "-id").values_list("id", flat=True))
+
+
+def test_cursor_round_trip_keeps_microseconds():
+    moment = timezone.now().replace(microsecond=654321)
+
+    assert decode_history_cursor(encode_history_cursor(moment, 42)) == (moment, 42)
+
+
+def test_pages_forward_and_back(respondents):
+    expected = ordered_ids(respondents)
+
+    first, has_prev, has_next = asyncio.run(fetch_history_page(respondents, "finished_at"))
+    assert [obj.id for obj in first] == expected[:HISTORY_PAGE_SIZE]
+    assert (has_prev, has_next) == (False, True)
+
+    cursor = encode_history_cursor(first[-1].finished_at, first[-1].id)
+    second, has_prev, has_next = asyncio.run(fetch_history_page(respondents, "finished_at", cursor, "next"))
+    assert [obj.id for obj in second] == expected[HISTORY_PAGE_SIZE:]
+    assert (has_prev, has_next) == (True, False)
+
+    cursor = encode_history_cursor(second[0].finished_at, second[0].id)
+    back, has_prev, has_next = asyncio.run(fetch_history_page(respondents, "finished_at", cursor, "prev"))
+    assert [obj.id for obj in back] == expected[:HISTORY_PAGE_SIZE]
+    assert (has_prev, has_next) == (False, True)
+
+
+def test_keyboard_cursors_point_to_page_edges(respondents):
+    items = list(respondents.order_by("-finished_at", "-id")[:3])
+
+    keyboard = build_history_keyboard("polls", items, "finished_at", True, True, "ru")
+
+    prev_button, next_button = keyboard.inline_keyboard[0]
+    assert prev_button.callback_data == f"history:polls:prev:{encode_history_cursor(items[0].finished_at, items[0].id)}"
+    assert next_button.callback_data == f"history:polls:next:{encode_history_cursor(items[-1].finished_at, items[-1].id)}"
+    assert build_history_keyboard("polls", items, "finished_at", False, False, "ru") is None
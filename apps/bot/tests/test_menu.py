@@ -0,0 +1,27 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from apps.bot.handlers.menu import MAIN_MENU_TEXTS
+from apps.bot.handlers.menu import MenuButtonFilter
+
+
+def run_filter(text):
+    return asyncio.run(MenuButtonFilter()(SimpleNamespace(text=text)))
+
+
+@pytest.mark.parametrize("lang", list(MAIN_MENU_TEXTS))
+def test_menu_buttons_pass_with_their_action(lang):
+    assert run_filter(MAIN_MENU_TEXTS[lang]["balance"]) == {"menu_action": "balance"}
+    assert run_filter(MAIN_MENU_TEXTS[lang]["withdrawal_history"]) == {"menu_action": "withdrawal_history"}
+
+
+def test_webapp_button_is_not_a_menu_action():
+    # Кнопка webapp открывает мини-приложение, хендлера для нее нет
+    assert run_filter(MAIN_MENU_TEXTS["ru"]["webapp"]) is False
+
+
+@pytest.mark.parametrize("text", ["Привет", "", None])
+def test_other_messages_are_rejected(text):
+    assert run_filter(text) is False
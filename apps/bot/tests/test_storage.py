@@ -0,0 +1,34 @@
+import asyncio
+from decimal import Decimal
+
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from apps.bot.states import WithdrawalStates
+from apps.bot.storage import pack_data
+from apps.bot.storage import set_state_and_data
+from apps.bot.storage import unpack_data
+
+
+def test_pack_round_trip_keeps_int_keys_and_lists():
+    data = {"poll_id": 7, "answers": {3: [1, 2]}, "history": [10, 11]}
+
+    assert unpack_data(pack_data(data)) == data
+
+
+def test_decimal_is_stored_as_string():
+    assert unpack_data(pack_data({"amount": Decimal("15000.50")})) == {"amount": "15000.50"}
+
+
+def test_set_state_and_data_falls_back_to_plain_storage():
+    state = FSMContext(storage=MemoryStorage(), key=StorageKey(bot_id=1, chat_id=2, user_id=2))
+
+    async def scenario():
+        await state.update_data(lang="ru")
+        data = await set_state_and_data(state, WithdrawalStates.waiting_for_amount, amount="100")
+        return data, await state.get_state()
+
+    data, current = asyncio.run(scenario())
+    assert data == {"lang": "ru", "amount": "100"}
+    assert current == WithdrawalStates.waiting_for_amount.state
@@ -0,0 +1,65 @@
+"""
+Трассировка обработки апдейтов бота.
+
+На время апдейта в ContextVar лежит UpdateTrace. Обертка выполнения запросов
+(ставится на каждое новое соединение с БД) и InstrumentedAiohttpSession пишут
+в него запросы ORM и вызовы Bot API. ContextVar переносится в потоки
+sync_to_async, поэтому учитываются и async-методы ORM.
+"""
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import List, Tuple
+
+# Сколько запросов сохранять в трассировке (для лога медленных апдейтов)
+MAX_TRACED_QUERIES = 200
+MAX_SQL_LENGTH = 500
+
+current_trace: ContextVar["UpdateTrace | None"] = ContextVar("bot_update_trace", default=None)
+
+
+@dataclass
+class UpdateTrace:
+    update_id: int | None
+    event_type: str
+    handler: str = "unhandled"
+    started_at: float = field(default_factory=time.perf_counter)
+    query_count: int = 0
+    db_time: float = 0.0
+    queries: List[Tuple[str, float]] = field(default_factory=list)
+    api_calls: List[Tuple[str, float]] = field(default_factory=list)
+
+    @property
+    def api_time(self) -> float:
+        return sum(duration for _method, duration in self.api_calls)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+
+def trace_db_execute(execute, sql, params, many, context):
+    """Обертка execute_wrappers: учитывает запрос в трассировке текущего апдейта"""
+    trace = current_trace.get()
+    if trace is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - start
+        trace.query_count += 1
+        trace.db_time += duration
+        if len(trace.queries) < MAX_TRACED_QUERIES:
+            trace.queries.append((sql[:MAX_SQL_LENGTH], duration))
+
+
+def install_db_tracing(sender, connection, **kwargs):
+    """Обработчик connection_created: ставит обертку на новое соединение"""
+    if trace_db_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(trace_db_execute)
+
+
+def record_api_call(method: str, duration: float) -> None:
+    trace = current_trace.get()
+    if trace is not None:
+        trace.api_calls.append((method, duration))
@@ -1,21 +1,40 @@
+import logging
 import re
 
 from aiogram import Bot
 from aiogram.fsm.context import FSMContext
 from asgiref.sync import sync_to_async
+from django.core.cache import cache
 from django.db import IntegrityError
-from django.db.models import OuterRef, Exists
+from django.contrib.postgres.fields import ArrayField
+from django.db.models import Exists, F, Func, IntegerField, OuterRef, Value
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from apps.bot.states import PollStates
+from apps.bot.storage import set_state_and_data
 from apps.polls.models import Poll, Respondent, Answer, Question
+from apps.users.ledger import acredit_poll_reward
 from apps.users.models import TGUser
 
 ANOTHER_STR = str(_("Бошқа(ёзинг)__________"))
 BACK_STR = str(_("🔙 Ортга"))
 NEXT_STR = str(_("➡️ Кейинги савол"))
 
+logger = logging.getLogger(__name__)
+
+# Кэш отрисованного списка "Актив сўровномалар" на пользователя
+ACTIVE_POLLS_CACHE_TTL = 60
+
+
+def get_active_polls_cache_key(user_id: int) -> str:
+    return f"bot:active_polls:{user_id}"
+
+
+async def invalidate_active_polls_cache(user_id: int) -> None:
+    """Сбрасывает кэш списка активных опросов (например, после завершения опроса)"""
+    await cache.adelete(get_active_polls_cache_key(user_id))
+
 
 def escape_markdown_v2(text: str) -> str:
     """
@@ -89,9 +108,10 @@ async def send_poll_question(bot: Bot, chat_id: int, state: FSMContext, responde
                 respondent=respondent,
                 question=question
             )
-        await state.set_state(PollStates.waiting_for_answer)
         # Обновляем состояние FSM, чтобы ждать текстовый ответ
-        await state.update_data(
+        await set_state_and_data(
+            state,
+            PollStates.waiting_for_answer,
             question_id=question.id,
             respondent_id=respondent.id,
             answer_id=answer.id
@@ -163,60 +183,73 @@ async def async_get_or_create_user(defaults=None, **kwargs):
     return obj, created
 
 
-async def get_next_question(bot, chat_id, state: FSMContext, respondent, previous_questions, question_id):
-    from apps.bot.captcha_utils import should_show_captcha, generate_math_captcha, generate_text_captcha
-    from apps.polls.models import CaptchaChallenge, Answer
-    from datetime import timedelta
+async def append_respondent_history(respondent: Respondent, question_id: int) -> None:
+    """
+    Дописывает вопрос в историю респондента одним UPDATE с array_append,
+    не перезаписывая всю строку и весь массив.
+    """
+    await Respondent.objects.filter(id=respondent.id).aupdate(
+        history=Func(
+            F("history"),
+            Value(question_id),
+            function="array_append",
+            output_field=ArrayField(IntegerField()),
+        )
+    )
+    respondent.history = [*(respondent.history or []), question_id]
+
+
+async def get_next_question(bot, chat_id, state: FSMContext, respondent, question_id, count_answer=True,
+                            option_index=None, option_count=None):
+    from apps.bot import captcha_state
+    from apps.bot.captcha_utils import generate_math_captcha, generate_text_captcha, get_image_captcha_caption
     import random
-    
-    # Проверяем, нужна ли капча
-    answered_count = await sync_to_async(
-        Answer.objects.filter(respondent=respondent, is_answered=True).count
-    )()
-    
-    user = await sync_to_async(lambda: respondent.tg_user)()
-    
-    # Проверяем, была ли капча показана недавно (в последние 30 секунд)
-    recent_captcha = await sync_to_async(
-        CaptchaChallenge.objects.filter(
-            respondent=respondent,
-            created_at__gte=timezone.now() - timedelta(seconds=30)
-        ).exists
-    )()
-    
+
+    # Решение о капче принимается по состоянию в Redis, без запросов к БД.
+    # count_answer=False — повторный вход без нового ответа (возобновление, решенная капча),
+    # option_index — позиция выбранного варианта из option_count предложенных, для оценки шаблона ответов
+    stats = await captcha_state.register_answer(
+        respondent, 1 if count_answer else 0, option_index, option_count
+    )
+
     # Показываем капчу только если:
-    # 1. Настало время (по answered_count)
+    # 1. Политика (BOT_CAPTCHA_POLICY) считает риск достаточным
     # 2. И не было капчи в последние 30 секунд
-    if should_show_captcha(answered_count) and not recent_captcha:
-        # Генерируем капчу
-        captcha_type = random.choice(['math', 'text'])
-        
-        if captcha_type == 'math':
-            question_text, correct_answer = generate_math_captcha(user.lang)
+    if captcha_state.is_captcha_due(stats):
+        user = await sync_to_async(lambda: respondent.tg_user)()
+
+        # Предпочитаем заранее подготовленную картинку: отправка по file_id без загрузки
+        image_challenge = await captcha_state.pop_image_challenge()
+        if image_challenge:
+            # В аудит (CaptchaChallenge.question) попадает file_id картинки
+            await captcha_state.start_challenge(
+                respondent.id, 'image', image_challenge['file_id'], image_challenge['answer']
+            )
+            await bot.send_photo(chat_id, image_challenge['file_id'], caption=get_image_captcha_caption(user.lang))
         else:
-            question_text, correct_answer = generate_text_captcha(user.lang)
-        
-        # Сохраняем капчу в базу
-        captcha = await sync_to_async(CaptchaChallenge.objects.create)(
-            respondent=respondent,
-            captcha_type=captcha_type,
-            question=question_text,
-            correct_answer=correct_answer
-        )
-        
-        # Отправляем капчу пользователю
-        await bot.send_message(chat_id, question_text, parse_mode="HTML")
-        
+            # Пул пуст — генерируем текстовую капчу
+            captcha_type = random.choice(['math', 'text'])
+
+            if captcha_type == 'math':
+                question_text, correct_answer = generate_math_captcha(user.lang)
+            else:
+                question_text, correct_answer = generate_text_captcha(user.lang)
+
+            # Задача хранится в Redis, в CaptchaChallenge она попадет пачкой после решения
+            await captcha_state.start_challenge(respondent.id, captcha_type, question_text, correct_answer)
+
+            # Отправляем капчу пользователю
+            await bot.send_message(chat_id, question_text, parse_mode="HTML")
+
         # Устанавливаем состояние ожидания капчи
-        await state.set_state(PollStates.waiting_for_captcha)
-        await state.update_data(
-            captcha_id=captcha.id,
+        await set_state_and_data(
+            state,
+            PollStates.waiting_for_captcha,
             respondent_id=respondent.id,
-            previous_questions=previous_questions,
             question_id=question_id
         )
         return
-    
+
     all_questions = await sync_to_async(lambda: respondent.poll.questions.order_by("order"))()
     answered_ids = await sync_to_async(list)(
         Answer.objects.filter(respondent=respondent).values_list('question_id', flat=True)
@@ -225,26 +258,15 @@ async def get_next_question(bot, chat_id, state: FSMContext, respondent, previou
 
     if not next_question:
         respondent.finished_at = timezone.now()
-        await respondent.asave()
+        await respondent.asave(update_fields=["finished_at"])
+        await invalidate_active_polls_cache(respondent.tg_user_id)
         
         # Начисляем вознаграждение за прохождение опроса
         poll = await sync_to_async(lambda: respondent.poll)()
-        user = await sync_to_async(lambda: respondent.tg_user)()
         
         if poll.reward > 0:
-            # Начисляем деньги на баланс
-            user.balance += poll.reward
-            await sync_to_async(user.save)()
-            
-            # Создаем транзакцию
-            from apps.users.models import TransactionHistory
-            await sync_to_async(TransactionHistory.objects.create)(
-                user=user,
-                transaction_type='earned',
-                amount=poll.reward,
-                description=f'Вознаграждение за прохождение опроса "{poll.name}"',
-                related_poll=poll
-            )
+            # Атомарно начисляем деньги на баланс и создаем транзакцию
+            await acredit_poll_reward(respondent.tg_user_id, poll)
             
             completion_message = str(_(
                 "Сиз сўровномани тўлиқ якунладингиз. Раҳмат!\n\n"
@@ -278,14 +300,10 @@ async def get_next_question(bot, chat_id, state: FSMContext, respondent, previou
             parse_mode="Markdown"
         )
 
-    updated_history = previous_questions + [question_id]
-    respondent.history = updated_history
-    await respondent.asave()
+    await append_respondent_history(respondent, question_id)
 
-    await state.update_data(
-        question_id=next_question.id,
-        previous_questions=updated_history
-    )
+    # В FSM храним только указатель на текущий вопрос, история — в строке Respondent
+    await state.update_data(question_id=next_question.id)
     await send_poll_question(bot, chat_id, state, respondent, next_question)
 
 
@@ -348,18 +366,19 @@ async def get_current_question(bot, chat_id, state: FSMContext, user, poll_uuid=
 
     if not next_question:
         respondent.finished_at = timezone.now()
-        await respondent.asave()
+        await respondent.asave(update_fields=["finished_at"])
+        await invalidate_active_polls_cache(respondent.tg_user_id)
         await bot.send_message(chat_id, str(_("Сиз сўровномани тўлиқ якунладингиз. Рахмат!")))
         return
 
     # ✅ Запускаем первый вопрос
     await state.update_data(respondent_id=respondent.id)
-    await get_next_question(bot, chat_id, state, respondent, respondent.history, next_question.id)
+    await get_next_question(bot, chat_id, state, respondent, next_question.id, count_answer=False)
 
 
 async def send_confirmation_text(bot, answer, open_answer=None):
     if not answer.telegram_chat_id:
-        print(f"❌ Ошибка: telegram_chat_id отсутствует для Answer ID={answer.id}")
+        logger.warning("Answer has no telegram_chat_id", extra={"answer_id": answer.id})
         return
     
     # Получаем язык пользователя
@@ -430,4 +449,4 @@ async def send_confirmation_text(bot, answer, open_answer=None):
         if answer.telegram_msg_id is not None:
             await bot.delete_message(chat_id=answer.telegram_chat_id, message_id=answer.telegram_msg_id)
     except Exception as e:
-        print(f"⚠️ Не удалось удалить poll: {e}")
+        logger.debug("Failed to delete poll message: %s", e, extra={"answer_id": answer.id})
@@ -1,5 +1,9 @@
+import logging
+
+from django.conf import settings
 from django.contrib import admin
 from django.http import HttpResponse
+from django.shortcuts import redirect
 from django.template.response import TemplateResponse
 from django.urls import path
 from import_export.admin import ExportMixin
@@ -8,7 +12,9 @@ from markdownx.admin import MarkdownxModelAdmin
 from django.utils import timezone
 
 
-from apps.polls.filters import PollFilterForm
+from apps.polls.admin_pagination import KeysetPaginationMixin
+from apps.polls.filters import PollFilterForm, PollImportForm
+from apps.polls.importer import PollImportError, import_poll_questions, parse_poll_file
 from apps.polls.models import (
     Poll,
     Question,
@@ -24,6 +30,23 @@ from apps.polls.models import (
 )
 from apps.polls.resources import RespondentExportResource
 from apps.polls.tasks import export_respondents_task
+from config.db_router import use_replica
+
+logger = logging.getLogger(__name__)
+
+
+class ReplicaChangeListMixin:
+    """Список объектов (GET) читается с реплики; действия и формы — с основной БД"""
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method != "GET":
+            return super().changelist_view(request, extra_context)
+        with use_replica():
+            response = super().changelist_view(request, extra_context)
+            # TemplateResponse выполняет запросы при рендере — рендерим внутри use_replica()
+            if hasattr(response, "render"):
+                response.render()
+        return response
 
 
 class ChoiceInline(admin.TabularInline):
@@ -43,11 +66,26 @@ class QuestionInline(admin.StackedInline):
     show_change_link = True
 
 
+class PollVersionAdminMixin:
+    """
+    Удаление вопросов и вариантов не вызывает сигналов версии опроса (см. apps.polls.signals),
+    поэтому после удаления строк инлайна версия увеличивается здесь один раз.
+    """
+    poll_id_attr = "poll_id"
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        if change and any(formset.deleted_objects for formset in formsets):
+            Poll.bump_version(getattr(form.instance, self.poll_id_attr))
+
+
 @admin.register(Poll)
-class PollAdmin(admin.ModelAdmin):
+class PollAdmin(PollVersionAdminMixin, admin.ModelAdmin):
     list_display = ('name', 'uuid', 'created_by', 'reward', 'deadline', 'is_active_status')
     inlines = [QuestionInline]
+    poll_id_attr = "pk"
     list_editable = ('reward',)
+    change_list_template = "polls/poll_change_list.html"
     
     fieldsets = (
         ('Основная информация', {
@@ -68,6 +106,37 @@ class PollAdmin(admin.ModelAdmin):
     
     readonly_fields = ('uuid',)
 
+    def get_urls(self):
+        urls = super().get_urls()
+        return [
+            path('import-questions/', self.admin_site.admin_view(self.import_questions_view), name='poll_import_questions'),
+        ] + urls
+
+    def import_questions_view(self, request):
+        """Массовое добавление вопросов в опрос из CSV/XLSX/JSON (см. apps.polls.importer)"""
+        if request.method == "POST":
+            form = PollImportForm(request.POST, request.FILES)
+            if form.is_valid():
+                poll = form.cleaned_data["poll"]
+                try:
+                    created = import_poll_questions(poll, parse_poll_file(form.cleaned_data["file"]))
+                except PollImportError as e:
+                    for error in e.errors:
+                        form.add_error("file", error)
+                else:
+                    self.message_user(request, f"В опрос «{poll.name}» добавлено вопросов: {len(created)}")
+                    return redirect("admin:polls_poll_change", poll.pk)
+        else:
+            form = PollImportForm(initial={"poll": request.GET.get("poll")})
+
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "form": form,
+            "title": "Импорт вопросов",
+        }
+        return TemplateResponse(request, "polls/poll_import_form.html", context)
+
     def is_active_status(self, obj):
         return obj.is_active()
 
@@ -127,7 +196,7 @@ class PollCreationPaymentAdmin(admin.ModelAdmin):
 
 
 @admin.register(Question)
-class QuestionAdmin(admin.ModelAdmin):
+class QuestionAdmin(PollVersionAdminMixin, admin.ModelAdmin):
     list_display = ('text', 'type', 'poll', 'max_choices', 'order')
     list_editable = ('order', 'max_choices')
     inlines = [ChoiceInline]
@@ -150,6 +219,16 @@ class QuestionAdmin(admin.ModelAdmin):
         }),
     )
 
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        Poll.bump_version(obj.poll_id)
+
+    def delete_queryset(self, request, queryset):
+        poll_ids = set(queryset.values_list('poll_id', flat=True))
+        super().delete_queryset(request, queryset)
+        for poll_id in poll_ids:
+            Poll.bump_version(poll_id)
+
 
 class ExportChunkInline(admin.TabularInline):
     model = ExportChunk
@@ -215,9 +294,11 @@ class ExportChunkAdmin(admin.ModelAdmin):
 
 
 @admin.register(Respondent)
-class RespondentAdmin(admin.ModelAdmin):
+class RespondentAdmin(ReplicaChangeListMixin, KeysetPaginationMixin, admin.ModelAdmin):
     list_display = ('tg_user', 'poll', 'started_at', 'finished_at')
     list_filter = ('poll', 'finished_at')
+    list_select_related = ('tg_user', 'poll')
+    raw_id_fields = ('tg_user', 'poll')
     change_list_template = "polls/respondents_export_filter.html"  # шаблон для кнопки (см. ниже)
 
     def get_urls(self):
@@ -234,7 +315,6 @@ class RespondentAdmin(admin.ModelAdmin):
             if form.is_valid():
                 poll = form.cleaned_data["poll"]
                 include_unfinished = form.cleaned_data["include_unfinished"]
-                print(f"📝 Export request received for poll: {poll.id}, include_unfinished={include_unfinished}")
 
                 resource = RespondentExportResource(poll=poll, include_unfinished=include_unfinished)
                 queryset = resource.get_export_queryset(request)
@@ -245,7 +325,10 @@ class RespondentAdmin(admin.ModelAdmin):
                     row = resource.export_resource(respondent)
                     dataset.append([row.get(f.attribute or f.column_name, "") for f in export_fields])
 
-                print(f"✅ Exported {len(dataset)} rows with {len(export_fields)} fields")
+                logger.info(
+                    "Custom export finished",
+                    extra={"poll_id": poll.id, "rows": len(dataset), "fields": len(export_fields)},
+                )
 
                 try:
                     response = HttpResponse(dataset.xlsx,
@@ -253,7 +336,7 @@ class RespondentAdmin(admin.ModelAdmin):
                     response["Content-Disposition"] = f'attachment; filename=respondents_poll_{poll.id}.xlsx'
                     return response
                 except Exception as e:
-                    print("❌ XLSX export error:", e)
+                    logger.exception("XLSX export failed", extra={"poll_id": poll.id})
                     raise
         else:
             form = PollFilterForm()
@@ -347,13 +430,15 @@ class RespondentAdmin(admin.ModelAdmin):
 
 
 @admin.register(Answer)
-class AnswerAdmin(admin.ModelAdmin):
+class AnswerAdmin(ReplicaChangeListMixin, KeysetPaginationMixin, admin.ModelAdmin):
     list_display = ('respondent', 'question')
     list_filter = ('question__poll',)
+    list_select_related = ('respondent__tg_user', 'question')
+    raw_id_fields = ('respondent', 'question')
 
 
 @admin.register(NotificationCampaign)
-class NotificationCampaignAdmin(admin.ModelAdmin):
+class NotificationCampaignAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
     list_display = ['topic', 'total_users', 'sent_users', 'get_blocked_users_count', 'status', 'created_at', 'started_at', 'completed_at']
     list_filter = ['status', 'topic', 'created_at']
     readonly_fields = ['total_users', 'sent_users', 'get_blocked_users_count', 'created_at', 'started_at', 'completed_at', 'get_progress_percentage']
@@ -379,6 +464,7 @@ class NotificationCampaignAdmin(admin.ModelAdmin):
         return f"{obj.get_progress_percentage()}%"
     get_progress_percentage.short_description = 'Прогресс'
     
+    @use_replica()
     def get_blocked_users_count(self, obj):
         """Отобразить количество заблокированных пользователей для данной темы"""
         from apps.users.models import TGUser
@@ -444,7 +530,7 @@ class BroadcastPostAdmin(admin.ModelAdmin):
     search_fields = ['title', 'content']
     readonly_fields = [
         'total_users', 'sent_users', 'failed_users', 'started_at', 
-        'completed_at', 'get_progress_percentage', 'get_success_rate'
+        'completed_at', 'last_progress_at', 'get_progress_percentage', 'get_success_rate'
     ]
     fieldsets = (
         ('Основная информация', {
@@ -461,12 +547,21 @@ class BroadcastPostAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
         ('Время выполнения', {
-            'fields': ('started_at', 'completed_at', 'error_message'),
+            'fields': ('started_at', 'completed_at', 'last_progress_at', 'error_message'),
             'classes': ('collapse',)
         }),
     )
-    actions = ['start_broadcast', 'duplicate_broadcast', 'send_test_broadcast', 'send_test_broadcast_admin']
+    actions = [
+        'start_broadcast', 'resume_broadcast', 'duplicate_broadcast',
+        'send_test_broadcast', 'send_test_broadcast_admin'
+    ]
     
+    def save_model(self, request, obj, form, change):
+        # Новое изображение нужно загрузить в Telegram заново
+        if 'image' in form.changed_data:
+            obj.image_file_id = ''
+        super().save_model(request, obj, form, change)
+
     def get_progress_percentage(self, obj):
         """Отображает процент выполнения"""
         return f"{obj.get_progress_percentage()}%"
@@ -482,15 +577,50 @@ class BroadcastPostAdmin(admin.ModelAdmin):
         from .tasks import start_broadcast_task
         
         for broadcast in queryset:
-            if broadcast.status in ['draft', 'scheduled']:
+            # Условный UPDATE, чтобы пост не запустился дважды вместе с диспетчером расписания
+            claimed = BroadcastPost.objects.filter(
+                id=broadcast.id, status__in=['draft', 'scheduled']
+            ).update(status='sending', started_at=timezone.now())
+            if claimed:
                 start_broadcast_task.delay(broadcast.id)
-                broadcast.status = 'sending'
-                broadcast.started_at = timezone.now()
-                broadcast.save()
         
         self.message_user(request, f"Запущено {queryset.count()} рассылок")
     start_broadcast.short_description = "Запустить рассылку"
     
+    def resume_broadcast(self, request, queryset):
+        """
+        Продолжить прерванную рассылку без повторной отправки уже получившим.
+        Рассылка в статусе "Отправляется" продолжается, только если журнал доставки
+        не пополнялся BROADCAST_STALL_MINUTES минут: иначе ее чанки еще в очереди,
+        и их получатели (без записи в журнале) получили бы пост дважды.
+        """
+        from datetime import timedelta
+        from django.db.models import Q
+        from django.db.models.functions import Coalesce
+        from .tasks import start_broadcast_task
+        
+        stalled_before = timezone.now() - timedelta(minutes=settings.BROADCAST_STALL_MINUTES)
+        resumable = BroadcastPost.objects.annotate(
+            progress_at=Coalesce('last_progress_at', 'started_at')
+        ).filter(
+            Q(status__in=['failed', 'sent'])
+            | (Q(status='sending') & (Q(progress_at__lt=stalled_before) | Q(progress_at__isnull=True)))
+        )
+        resumed = 0
+        for broadcast_id in queryset.values_list('id', flat=True):
+            # Условный UPDATE: двойной клик не запустит два resume одной рассылки
+            claimed = resumable.filter(id=broadcast_id).update(status='sending', last_progress_at=timezone.now())
+            if claimed:
+                start_broadcast_task.delay(broadcast_id, resume=True)
+                resumed += 1
+        
+        skipped = queryset.count() - resumed
+        message = f"Возобновлено {resumed} рассылок"
+        if skipped:
+            message += f"; пропущено {skipped}: рассылка еще идет или не запускалась"
+        self.message_user(request, message)
+    resume_broadcast.short_description = "Продолжить рассылку"
+    
     def duplicate_broadcast(self, request, queryset):
         """Дублировать рассылку"""
         for broadcast in queryset:
@@ -502,6 +632,7 @@ class BroadcastPostAdmin(admin.ModelAdmin):
             broadcast.failed_users = 0
             broadcast.started_at = None
             broadcast.completed_at = None
+            broadcast.last_progress_at = None
             broadcast.error_message = ''
             broadcast.save()
         
@@ -0,0 +1,114 @@
+"""
+Пагинация списков админки для больших таблиц (Respondent, Answer).
+
+- EstimatedCountPaginator: для таблиц больше ADMIN_ESTIMATED_COUNT_THRESHOLD строк
+  вместо COUNT(*) берет оценку планировщика (pg_class.reltuples без фильтров,
+  "Plan Rows" из EXPLAIN с фильтрами);
+- KeysetChangeList: при сортировке по умолчанию (-pk) "следующая страница"
+  строится по курсору ?after=<pk последней строки> вместо OFFSET;
+- KeysetPaginationMixin: подключает оба класса к ModelAdmin.
+"""
+import json
+
+from django.conf import settings
+from django.contrib.admin.views.main import ORDER_VAR, PAGE_VAR, ChangeList
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.utils.functional import cached_property
+
+CURSOR_VAR = "after"
+
+
+def estimate_count(queryset) -> int | None:
+    """
+    Оценка числа строк queryset по статистике Postgres.
+    None, если оценки нет или таблица меньше порога (тогда дешевле точный COUNT).
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [connection.ops.quote_name(queryset.model._meta.db_table)],
+            )
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    # reltuples = -1, пока по таблице не было ANALYZE
+    if row is None or row[0] < settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+        return None
+    if not queryset.query.where:
+        return row[0]
+
+    plan = json.loads(queryset.order_by().explain(format="json"))
+    estimate = int(plan[0]["Plan"]["Plan Rows"])
+    if estimate < settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+        # Фильтр сильно сужает выборку — точный подсчет недорог
+        return None
+    return estimate
+
+
+class EstimatedCountPaginator(Paginator):
+    is_estimated = False
+
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list)
+        if estimate is None:
+            return super().count
+        self.is_estimated = True
+        return estimate
+
+
+class KeysetChangeList(ChangeList):
+    def __init__(self, request, *args, **kwargs):
+        self.keyset_enabled = ORDER_VAR not in request.GET
+        try:
+            self.cursor = int(request.GET[CURSOR_VAR])
+        except (KeyError, ValueError):
+            self.cursor = None
+        self.next_page_url = None
+        self.first_page_url = None
+        super().__init__(request, *args, **kwargs)
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # Ссылки сортировки и фильтров начинают список сначала
+        new_params = new_params or {}
+        remove = list(remove or [])
+        if CURSOR_VAR not in new_params:
+            remove.append(CURSOR_VAR)
+        return super().get_query_string(new_params, remove)
+
+    def get_queryset(self, request, exclude_parameters=None):
+        qs = super().get_queryset(request, exclude_parameters)
+        if self.keyset_enabled and self.cursor is not None:
+            qs = qs.filter(pk__lt=self.cursor)
+        return qs
+
+    def get_results(self, request):
+        super().get_results(request)
+        if not self.keyset_enabled or self.show_all:
+            return
+        page = list(self.result_list)
+        if len(page) >= self.list_per_page:
+            self.next_page_url = self.get_query_string({CURSOR_VAR: page[-1].pk}, [PAGE_VAR])
+        if self.cursor is not None:
+            self.first_page_url = self.get_query_string(remove=[CURSOR_VAR, PAGE_VAR])
+
+
+class KeysetPaginationMixin:
+    """Оценочный счетчик и keyset-навигация для списков больших таблиц"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    ordering = ("-pk",)
+    change_list_template = "polls/keyset_change_list.html"
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PollsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.polls'
+
+    def ready(self):
+        import apps.polls.signals  # noqa: F401
@@ -6,3 +6,8 @@ from apps.polls.models import Poll
 class PollFilterForm(forms.Form):
     poll = forms.ModelChoiceField(queryset=Poll.objects.all(), label="Тема", required=True)
     include_unfinished = forms.BooleanField(label="Ҳаммани олиш (ҳатто якунланмаган)", required=False)
+
+
+class PollImportForm(forms.Form):
+    poll = forms.ModelChoiceField(queryset=Poll.objects.all(), label="Тема", required=True)
+    file = forms.FileField(label="Файл (CSV, XLSX или JSON)", required=True)
@@ -0,0 +1,228 @@
+"""
+Импорт вопросов опроса из CSV/XLSX/JSON.
+
+Таблица (CSV или первый лист XLSX) — колонки:
+    question, question_uz_latn, question_ru, type, max_choices, choice, choice_uz_latn, choice_ru
+Строка с заполненной колонкой question начинает новый вопрос; строки только с
+choice* добавляют варианты к последнему вопросу (вариант можно указать и в строке вопроса).
+
+JSON:
+    {"questions": [{"text": "...", "text_uz_latn": "...", "text_ru": "...",
+                    "type": "closed_single", "max_choices": null,
+                    "choices": ["...", {"text": "...", "text_ru": "..."}]}]}
+
+Проверки совпадают с редактором (_poll_validation_errors) и ботом (poll_checker):
+2–10 вариантов у закрытых вопросов (у смешанных один слот занимает "Бошқа"),
+текст вопроса до 255 символов, варианта — до 100, на каждом языке.
+Дерево создается двумя bulk_create в одной транзакции.
+"""
+import csv
+import io
+import json
+from dataclasses import dataclass, field
+from typing import List
+
+from django.db import transaction
+from django.db.models import Max
+from openpyxl import load_workbook
+
+from apps.polls.models import POLL_MIN_CHOICES, Choice, Poll, Question
+
+MAX_IMPORT_FILE_SIZE = 2 * 1024 * 1024
+MAX_IMPORT_QUESTIONS = 500
+# Ограничения Telegram-опросов (см. apps.bot.utils.poll_checker)
+MAX_QUESTION_LENGTH = 255
+MAX_OPTION_LENGTH = 100
+
+LANG_SUFFIXES = ("", "_uz_latn", "_ru")
+TABLE_COLUMNS = (
+    "question", "question_uz_latn", "question_ru", "type", "max_choices",
+    "choice", "choice_uz_latn", "choice_ru",
+)
+MULTIPLE_TYPES = (Question.QuestionTypeChoices.CLOSED_MULTIPLE, Question.QuestionTypeChoices.MIXED_MULTIPLE)
+
+
+class PollImportError(Exception):
+    """Файл не удалось разобрать или он не прошел проверку; errors — список сообщений"""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        super().__init__("; ".join(self.errors))
+
+
+@dataclass
+class QuestionDefinition:
+    texts: dict
+    type: str = Question.QuestionTypeChoices.CLOSED_SINGLE
+    max_choices: int | None = None
+    choices: List[dict] = field(default_factory=list)
+
+
+def _clean(value) -> str:
+    return "" if value is None else str(value).strip()
+
+
+def _texts(source: dict, prefix: str) -> dict:
+    return {f"text{suffix}": _clean(source.get(f"{prefix}{suffix}")) for suffix in LANG_SUFFIXES}
+
+
+def _parse_max_choices(value):
+    value = _clean(value)
+    if not value:
+        return None
+    try:
+        return int(float(value))
+    except ValueError:
+        raise PollImportError([f"Некорректное значение max_choices: {value}"])
+
+
+def _rows_to_definitions(rows) -> list[QuestionDefinition]:
+    questions: list[QuestionDefinition] = []
+    for line, row in enumerate(rows, start=2):
+        row = {_clean(key).lower(): value for key, value in row.items() if key is not None}
+        if _clean(row.get("question")):
+            questions.append(QuestionDefinition(
+                texts=_texts(row, "question"),
+                type=_clean(row.get("type")) or Question.QuestionTypeChoices.CLOSED_SINGLE,
+                max_choices=_parse_max_choices(row.get("max_choices")),
+            ))
+        choice = _texts(row, "choice")
+        if not any(choice.values()):
+            continue
+        if not questions:
+            raise PollImportError([f"Строка {line}: вариант ответа до первого вопроса."])
+        questions[-1].choices.append(choice)
+    return questions
+
+
+def _parse_csv(content: bytes) -> list[QuestionDefinition]:
+    text = content.decode("utf-8-sig")
+    dialect = csv.Sniffer().sniff(text.splitlines()[0] if text else ",", delimiters=",;\t")
+    return _rows_to_definitions(csv.DictReader(io.StringIO(text), dialect=dialect))
+
+
+def _parse_xlsx(content: bytes) -> list[QuestionDefinition]:
+    workbook = load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        headers = [_clean(header).lower() for header in next(rows, ())]
+        return _rows_to_definitions(dict(zip(headers, row)) for row in rows)
+    finally:
+        workbook.close()
+
+
+def _parse_json(content: bytes) -> list[QuestionDefinition]:
+    payload = json.loads(content.decode("utf-8-sig"))
+    items = payload.get("questions") if isinstance(payload, dict) else payload
+    if not isinstance(items, list):
+        raise PollImportError(["JSON должен содержать список questions."])
+
+    questions = []
+    for number, item in enumerate(items, start=1):
+        if not isinstance(item, dict):
+            raise PollImportError([f"Вопрос #{number}: ожидается объект."])
+        choices = []
+        for choice in item.get("choices") or []:
+            choices.append(_texts(choice, "text") if isinstance(choice, dict) else _texts({"text": choice}, "text"))
+        questions.append(QuestionDefinition(
+            texts=_texts(item, "text"),
+            type=_clean(item.get("type")) or Question.QuestionTypeChoices.CLOSED_SINGLE,
+            max_choices=_parse_max_choices(item.get("max_choices")),
+            choices=choices,
+        ))
+    return questions
+
+
+PARSERS = {
+    "csv": _parse_csv,
+    "xlsx": _parse_xlsx,
+    "json": _parse_json,
+}
+
+
+def parse_poll_file(uploaded_file) -> list[QuestionDefinition]:
+    """Разбирает загруженный файл по расширению; бросает PollImportError"""
+    extension = uploaded_file.name.rsplit(".", 1)[-1].lower() if "." in uploaded_file.name else ""
+    parser = PARSERS.get(extension)
+    if parser is None:
+        raise PollImportError(["Поддерживаются файлы CSV, XLSX и JSON."])
+    if uploaded_file.size > MAX_IMPORT_FILE_SIZE:
+        raise PollImportError(["Файл слишком большой (максимум 2 МБ)."])
+    try:
+        return parser(uploaded_file.read())
+    except PollImportError:
+        raise
+    except Exception as e:
+        raise PollImportError([f"Не удалось прочитать файл: {e}"])
+
+
+def validate_definitions(questions: list[QuestionDefinition]) -> list[str]:
+    errors: list[str] = []
+    if not questions:
+        return ["В файле нет ни одного вопроса."]
+    if len(questions) > MAX_IMPORT_QUESTIONS:
+        return [f"Слишком много вопросов (максимум {MAX_IMPORT_QUESTIONS})."]
+
+    for number, q in enumerate(questions, start=1):
+        prefix = f"Вопрос #{number}"
+        if q.type not in Question.QuestionTypeChoices.values:
+            errors.append(f"{prefix}: неизвестный тип «{q.type}».")
+            continue
+        if not q.texts["text"]:
+            errors.append(f"{prefix}: пустой текст вопроса.")
+        for name, value in q.texts.items():
+            if len(value) > MAX_QUESTION_LENGTH:
+                errors.append(f"{prefix}: текст ({name}) длиннее {MAX_QUESTION_LENGTH} символов.")
+        if q.type in MULTIPLE_TYPES:
+            if not q.max_choices or q.max_choices < 1:
+                errors.append(f"{prefix}: укажите max_choices (>=1) для множественного выбора.")
+            else:
+                # У смешанного вопроса "Бошқа" тоже можно выбрать
+                offered = len(q.choices) + (q.type == Question.QuestionTypeChoices.MIXED_MULTIPLE)
+                if q.max_choices > offered:
+                    errors.append(f"{prefix}: max_choices ({q.max_choices}) больше числа вариантов ({offered}).")
+        else:
+            q.max_choices = None
+
+        if q.type == Question.QuestionTypeChoices.OPEN:
+            if q.choices:
+                errors.append(f"{prefix}: у открытого вопроса не должно быть вариантов.")
+            continue
+        options_limit = Question.choices_limit(q.type)
+        if len(q.choices) < POLL_MIN_CHOICES:
+            errors.append(f"{prefix}: должно быть минимум {POLL_MIN_CHOICES} варианта ответа.")
+        if len(q.choices) > options_limit:
+            errors.append(f"{prefix}: слишком много вариантов (для этого типа вопроса — до {options_limit}).")
+        for choice_number, choice in enumerate(q.choices, start=1):
+            if not choice["text"]:
+                errors.append(f"{prefix}, вариант {choice_number}: пустой текст.")
+            for name, value in choice.items():
+                if len(value) > MAX_OPTION_LENGTH:
+                    errors.append(
+                        f"{prefix}, вариант {choice_number}: текст ({name}) длиннее {MAX_OPTION_LENGTH} символов."
+                    )
+    return errors
+
+
+@transaction.atomic
+def import_poll_questions(poll: Poll, questions: list[QuestionDefinition]) -> list[Question]:
+    """Проверяет определения и добавляет вопросы в конец опроса; бросает PollImportError"""
+    errors = validate_definitions(questions)
+    if errors:
+        raise PollImportError(errors)
+
+    # Блокируем опрос, чтобы параллельный импорт не выдал те же номера order
+    Poll.objects.select_for_update().filter(pk=poll.pk).first()
+    start = poll.questions.aggregate(last=Max("order"))["last"] or 0
+    created = Question.objects.bulk_create([
+        Question(poll=poll, order=start + number, type=q.type, max_choices=q.max_choices, **q.texts)
+        for number, q in enumerate(questions, start=1)
+    ])
+    Choice.objects.bulk_create([
+        Choice(question=question, order=number, **choice)
+        for question, definition in zip(created, questions)
+        for number, choice in enumerate(definition.choices, start=1)
+    ])
+    # bulk_create не вызывает сигналы, которые увеличивают версию опроса
+    Poll.bump_version(poll.pk)
+    return created
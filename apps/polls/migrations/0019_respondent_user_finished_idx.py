@@ -0,0 +1,16 @@
+# Generated manually
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0018_poll_created_by_and_pollcreationpayment'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='respondent',
+            index=models.Index(fields=['tg_user', '-finished_at'], name='respondent_user_finished_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated manually
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0019_respondent_user_finished_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='captchachallenge',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата создания'),
+        ),
+        migrations.AddIndex(
+            model_name='captchachallenge',
+            index=models.Index(fields=['respondent', 'created_at'], name='captcha_respondent_created_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated manually
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0020_captchachallenge_respondent_created_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='captchachallenge',
+            name='captcha_type',
+            field=models.CharField(
+                choices=[('math', 'Математическая задача'), ('text', 'Текстовая задача'), ('image', 'Картинка')],
+                max_length=20,
+                verbose_name='Тип капчи',
+            ),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated manually
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0021_alter_captchachallenge_captcha_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='broadcastpost',
+            name='image_file_id',
+            field=models.CharField(blank=True, editable=False, max_length=255, verbose_name='Telegram file_id изображения'),
+        ),
+    ]
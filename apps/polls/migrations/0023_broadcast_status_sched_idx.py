@@ -0,0 +1,16 @@
+# Generated manually
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0022_broadcastpost_image_file_id'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='broadcastpost',
+            index=models.Index(fields=['status', 'scheduled_at'], name='broadcast_status_sched_idx'),
+        ),
+    ]
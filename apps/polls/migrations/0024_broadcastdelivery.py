@@ -0,0 +1,28 @@
+# Generated manually
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0023_broadcast_status_sched_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BroadcastDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.BigIntegerField(verbose_name='ID пользователя')),
+                ('status', models.CharField(choices=[('sent', 'Отправлено'), ('failed', 'Ошибка'), ('blocked', 'Бот заблокирован')], max_length=10, verbose_name='Статус')),
+                ('message_id', models.BigIntegerField(blank=True, null=True, verbose_name='ID сообщения')),
+                ('broadcast', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='polls.broadcastpost', verbose_name='Рассылка')),
+            ],
+            options={
+                'verbose_name': 'Доставка рассылки',
+                'verbose_name_plural': 'Доставки рассылок',
+                'constraints': [models.UniqueConstraint(fields=('broadcast', 'user_id'), name='broadcast_delivery_unique_user')],
+            },
+        ),
+    ]
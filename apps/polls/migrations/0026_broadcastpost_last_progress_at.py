@@ -0,0 +1,17 @@
+# Generated manually
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0025_poll_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='broadcastpost',
+            name='last_progress_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Последний прогресс'),
+        ),
+    ]
@@ -9,6 +9,10 @@ import os
 
 from apps.users.models import TGUser
 
+# Telegram-опрос вмещает до 10 вариантов (см. apps.bot.utils.poll_checker)
+POLL_MAX_OPTIONS = 10
+POLL_MIN_CHOICES = 2
+
 
 class Poll(models.Model):
     name = models.CharField(max_length=255)
@@ -43,9 +47,20 @@ class Poll(models.Model):
         default=0.00,
         help_text=_("Сумма вознаграждения за прохождение опроса")
     )
+    # Версия содержимого (опрос, вопросы, варианты) для ETag/Last-Modified API конструктора
+    version = models.PositiveIntegerField(default=1, editable=False)
+    content_updated_at = models.DateTimeField(default=timezone.now, editable=False)
 
     def is_active(self):
         return timezone.now() <= self.deadline
+
+    @classmethod
+    def bump_version(cls, poll_id):
+        """Увеличивает версию содержимого опроса (вызывается после изменения вопросов и вариантов)"""
+        cls.objects.filter(pk=poll_id).update(
+            version=models.F("version") + 1,
+            content_updated_at=timezone.now(),
+        )
     
     def get_description(self, lang='uz_cyrl'):
         """Получить описание на нужном языке"""
@@ -90,6 +105,16 @@ class Question(models.Model):
     max_choices = models.PositiveIntegerField(null=True, blank=True, help_text='Только для closed_multiple')
     order = models.PositiveIntegerField(default=0)
 
+    @classmethod
+    def choices_limit(cls, question_type) -> int:
+        """
+        Сколько вариантов можно задать закрытому/смешанному вопросу: у смешанных
+        один слот опроса занимает "Бошқа" (общее правило импорта, редактора и API)
+        """
+        if question_type in (cls.QuestionTypeChoices.MIXED, cls.QuestionTypeChoices.MIXED_MULTIPLE):
+            return POLL_MAX_OPTIONS - 1
+        return POLL_MAX_OPTIONS
+
     def get_text(self, lang='uz_cyrl'):
         """Получить текст вопроса на нужном языке"""
         if lang == 'uz_latn' and self.text_uz_latn:
@@ -154,12 +179,20 @@ class Respondent(models.Model):
     def is_completed(self):
         return self.finished_at is not None
 
+    @property
+    def last_question_id(self):
+        """Последний вопрос из истории — прогресс восстанавливается из строки, а не из FSM"""
+        return self.history[-1] if self.history else None
+
     def __str__(self):
         return f"Респондент: {self.tg_user.id} | TG: {self.tg_user.fullname}"
 
     class Meta:
         verbose_name = _("Респондент")
         verbose_name_plural = _("Респонденты")
+        indexes = [
+            models.Index(fields=["tg_user", "-finished_at"], name="respondent_user_finished_idx"),
+        ]
 
 
 class Answer(models.Model):
@@ -186,6 +219,7 @@ class CaptchaChallenge(models.Model):
     CAPTCHA_TYPES = [
         ('math', _('Математическая задача')),
         ('text', _('Текстовая задача')),
+        ('image', _('Картинка')),
     ]
     
     respondent = models.ForeignKey(
@@ -219,8 +253,9 @@ class CaptchaChallenge(models.Model):
         default=0,
         verbose_name=_("Количество попыток")
     )
+    # Капчи пишутся пачками после решения, поэтому время создания задается явно
     created_at = models.DateTimeField(
-        auto_now_add=True,
+        default=timezone.now,
         verbose_name=_("Дата создания")
     )
     solved_at = models.DateTimeField(
@@ -233,6 +268,9 @@ class CaptchaChallenge(models.Model):
         verbose_name = _("Капча")
         verbose_name_plural = _("Капчи")
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['respondent', 'created_at'], name='captcha_respondent_created_idx'),
+        ]
     
     def __str__(self):
         return f"Капча для {self.respondent.tg_user.fullname} - {self.get_captcha_type_display()}"
@@ -596,6 +634,8 @@ class BroadcastPost(models.Model):
     title = models.CharField(max_length=255, verbose_name='Заголовок поста')
     content = models.TextField(verbose_name='Содержание поста')
     image = models.ImageField(upload_to='broadcasts/', null=True, blank=True, verbose_name='Изображение')
+    # file_id изображения в Telegram: после первой отправки картинка не загружается повторно
+    image_file_id = models.CharField(max_length=255, blank=True, editable=False, verbose_name='Telegram file_id изображения')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
     scheduled_at = models.DateTimeField(null=True, blank=True, verbose_name='Время отправки')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft', verbose_name='Статус')
@@ -608,12 +648,17 @@ class BroadcastPost(models.Model):
     # Время выполнения
     started_at = models.DateTimeField(null=True, blank=True, verbose_name='Время начала отправки')
     completed_at = models.DateTimeField(null=True, blank=True, verbose_name='Время завершения')
+    # Время последней записи в журнал доставки: по нему видно, что рассылка зависла
+    last_progress_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name='Последний прогресс')
     error_message = models.TextField(blank=True, verbose_name='Сообщение об ошибке')
     
     class Meta:
         verbose_name = 'Пост для рассылки'
         verbose_name_plural = 'Посты для рассылки'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'scheduled_at'], name='broadcast_status_sched_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.get_status_display()}"
@@ -632,3 +677,33 @@ class BroadcastPost(models.Model):
         if total_attempts == 0:
             return 0
         return round((self.sent_users / total_attempts) * 100, 1)
+
+
+class BroadcastDelivery(models.Model):
+    """Журнал доставки рассылки: по строке на получателя, пишется пачками из чанков"""
+
+    STATUS_CHOICES = [
+        ('sent', 'Отправлено'),
+        ('failed', 'Ошибка'),
+        ('blocked', 'Бот заблокирован'),
+    ]
+
+    broadcast = models.ForeignKey(
+        BroadcastPost,
+        on_delete=models.CASCADE,
+        related_name='deliveries',
+        verbose_name='Рассылка'
+    )
+    user_id = models.BigIntegerField(verbose_name='ID пользователя')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, verbose_name='Статус')
+    message_id = models.BigIntegerField(null=True, blank=True, verbose_name='ID сообщения')
+
+    class Meta:
+        verbose_name = 'Доставка рассылки'
+        verbose_name_plural = 'Доставки рассылок'
+        constraints = [
+            models.UniqueConstraint(fields=['broadcast', 'user_id'], name='broadcast_delivery_unique_user'),
+        ]
+
+    def __str__(self):
+        return f"{self.broadcast_id} → {self.user_id}: {self.status}"
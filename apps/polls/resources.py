@@ -1,25 +1,26 @@
+import logging
+
 from django.utils import timezone
 from import_export.fields import Field
 from import_export.resources import ModelResource
 
 from apps.polls.models import Respondent, Question
 
+logger = logging.getLogger(__name__)
+
 
 class RespondentExportResource(ModelResource):
     def __init__(self, poll=None, include_unfinished=False):
         super().__init__()
-        print("🔄 RespondentExportResource init called")
         self._poll = poll
         self._include_unfinished = include_unfinished
         self._dynamic_fields = []
 
         if self._poll:
-            print(f"📌 Poll selected: {poll}")
             for question in self._poll.questions.all().order_by("order"):
                 field_name = f"Q{question.order}"
                 self._dynamic_fields.append((field_name, question.id))
                 self.fields[field_name] = Field(column_name=field_name)
-                print(f"➕ Added dynamic field: {field_name}")
 
         self.fields['tg_user_id'] = Field(attribute='tg_user_id', column_name='TG ID')
         self.fields['fullname'] = Field(attribute='fullname', column_name='ФИО')
@@ -28,7 +29,7 @@ class RespondentExportResource(ModelResource):
 
         dynamic_fields = [f for f, _ in self._dynamic_fields]
         self.export_order = ['tg_user_id', 'fullname', 'started_at', 'finished_at'] + dynamic_fields
-        print("✅ Export order:", self.export_order)
+        logger.debug("Export resource prepared", extra={"poll_id": getattr(poll, "id", None), "fields": len(self.export_order)})
 
     def get_export_queryset(self, request):
         qs = Respondent.objects.all()
@@ -37,7 +38,6 @@ class RespondentExportResource(ModelResource):
         if not self._include_unfinished:
             qs = qs.filter(finished_at__isnull=False)
 
-        print(f"📊 Queryset count: {qs.count()}")
         return qs.prefetch_related(
             'answers__question__choices',
             'answers__selected_choices',
@@ -45,7 +45,6 @@ class RespondentExportResource(ModelResource):
         )
 
     def get_export_fields(self, resource=None):
-        print("🔍 Getting export fields")
         base_fields = [
             self.fields['tg_user_id'],
             self.fields['fullname'],
@@ -53,8 +52,6 @@ class RespondentExportResource(ModelResource):
             self.fields['finished_at'],
         ]
         dynamic_fields = [self.fields[name] for name, _ in self._dynamic_fields]
-        print("📋 Base fields:", [f.column_name for f in base_fields])
-        print("📋 Dynamic fields:", [f.column_name for f in dynamic_fields])
         return base_fields + dynamic_fields
 
     def dehydrate_tg_user_id(self, respondent):
@@ -0,0 +1,32 @@
+"""
+Версия содержимого опроса (Poll.version) для ETag API конструктора.
+
+Сохранение опроса, вопроса или варианта увеличивает версию. На удаление сигналы
+не вешаются: любой receiver post_delete отключает быстрое каскадное удаление
+(каждый вариант грузился бы и обновлял опрос отдельным UPDATE), поэтому удаление
+увеличивает версию один раз там, где оно происходит (админка, webapp, API).
+bulk_create/bulk_update сигналы тоже не вызывают — там Poll.bump_version() зовется
+явно (apps.polls.importer, apps.polls_webapp.editor).
+"""
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from apps.polls.models import Choice, Poll, Question
+
+
+@receiver(post_save, sender=Poll, dispatch_uid="poll_version_poll_saved")
+def poll_saved(sender, instance: Poll, created, **kwargs):
+    if created:
+        return
+    Poll.bump_version(instance.pk)
+
+
+@receiver(post_save, sender=Question, dispatch_uid="poll_version_question")
+def question_changed(sender, instance: Question, **kwargs):
+    Poll.bump_version(instance.poll_id)
+
+
+@receiver(post_save, sender=Choice, dispatch_uid="poll_version_choice")
+def choice_changed(sender, instance: Choice, **kwargs):
+    # Вопрос обычно уже загружен (формы, инлайны, API), лишнего SELECT нет
+    Poll.bump_version(instance.question.poll_id)
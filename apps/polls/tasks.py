@@ -1,10 +1,14 @@
+import logging
 import os
 from celery import shared_task
 from celery.exceptions import SoftTimeLimitExceeded
+from django.conf import settings
 from django.utils import timezone
 from django.core.files.base import ContentFile
 from tablib import Dataset
 
+from config import metrics
+from config.db_router import read_alias
 from .models import ExportFile, ExportChunk, Respondent
 from .resources import RespondentExportResource
 
@@ -13,6 +17,8 @@ from django.core.files.base import File
 from tempfile import NamedTemporaryFile
 from openpyxl import Workbook
 
+logger = logging.getLogger(__name__)
+
 
 @shared_task(bind=True, soft_time_limit=1800, time_limit=2100)
 def export_respondents_task(self, export_file_id):
@@ -26,7 +32,9 @@ def export_respondents_task(self, export_file_id):
             poll=export_file.poll,
             include_unfinished=export_file.include_unfinished,
         )
-        queryset = resource.get_export_queryset(None)
+        # Долгий курсор читаем с реплики или через прямое соединение с Postgres: через
+        # PgBouncer серверные курсоры отключены и iterator() выбрал бы всю выборку сразу
+        queryset = resource.get_export_queryset(None).using(read_alias(settings.EXPORT_DB_ALIAS))
         export_fields = resource.get_export_fields()
 
         # создаем Excel-файл
@@ -53,6 +61,7 @@ def export_respondents_task(self, export_file_id):
             wb.save(tmp.name)
             tmp.seek(0)
             export_file.file.save(filename, File(tmp), save=False)
+        metrics.record_export("respondents", rows_exported, os.path.getsize(tmp.name))
 
         export_file.filename = filename
         export_file.status = "completed"
@@ -239,6 +248,7 @@ def send_notifications_chunk_task(self, campaign_id, user_ids, chunk_index):
                     loop.close()
                 
                 sent_count += 1
+                metrics.record_sent('notification')
                 
                 # Обновляем счетчик в кампании
                 campaign.sent_users += 1
@@ -250,8 +260,9 @@ def send_notifications_chunk_task(self, campaign_id, user_ids, chunk_index):
                 
             except Exception as e:
                 failed_count += 1
+                metrics.record_failed('notification', e)
                 # Логируем ошибку, но продолжаем с другими пользователями
-                print(f"Failed to send notification to user {user.id}: {e}")
+                logger.warning("Notification send failed: %s", e, extra={"user_id": user.id, "campaign_id": campaign_id})
                 
                 # Проверяем, является ли ошибка связанной с блокировкой бота
                 error_message = str(e).lower()
@@ -262,7 +273,7 @@ def send_notifications_chunk_task(self, campaign_id, user_ids, chunk_index):
                     # Помечаем пользователя как заблокировавшего бота
                     user.blocked_bot = True
                     user.save()
-                    print(f"Marked user {user.id} as blocked_bot=True due to error: {e}")
+                    logger.info("User marked as blocked_bot", extra={"user_id": user.id})
                 
                 continue
         
@@ -320,27 +331,276 @@ def cleanup_old_exports():
     }
 
 
+@shared_task
+def flush_captcha_audit_task(batch_size=500):
+    """
+    Переносит завершенные капчи из Redis (bot:captcha:audit) в CaptchaChallenge пачками.
+    Пачка сначала переезжает в bot:captcha:audit:processing и удаляется оттуда только
+    после коммита; если запись не удалась, она возвращается в начало очереди.
+    """
+    from datetime import datetime, timezone as dt_timezone
+
+    from django.db import transaction
+    from redis import Redis
+
+    from apps.bot.captcha_state import CAPTCHA_AUDIT_KEY, CAPTCHA_AUDIT_PROCESSING_KEY
+    from apps.bot.storage import unpack_data
+    from .models import CaptchaChallenge
+
+    def to_datetime(value):
+        return datetime.fromtimestamp(value, tz=dt_timezone.utc) if value else None
+
+    redis = Redis.from_url(settings.REDIS_URL)
+    saved = 0
+    while True:
+        # Пачка, оставшаяся от упавшего воркера, записывается раньше новых записей
+        if not redis.exists(CAPTCHA_AUDIT_PROCESSING_KEY):
+            with redis.pipeline() as pipe:
+                for _ in range(batch_size):
+                    pipe.lmove(CAPTCHA_AUDIT_KEY, CAPTCHA_AUDIT_PROCESSING_KEY, 'LEFT', 'RIGHT')
+                pipe.execute()
+        raw_records = redis.lrange(CAPTCHA_AUDIT_PROCESSING_KEY, 0, -1)
+        if not raw_records:
+            break
+
+        records = [unpack_data(raw) for raw in raw_records]
+        # Респондент мог быть удален (например, после проваленной капчи)
+        existing_ids = set(
+            Respondent.objects.filter(
+                id__in={record['respondent_id'] for record in records}
+            ).values_list('id', flat=True)
+        )
+        challenges = [
+            CaptchaChallenge(
+                respondent_id=record['respondent_id'],
+                captcha_type=record['captcha_type'],
+                question=record['question'],
+                correct_answer=record['correct_answer'],
+                user_answer=record.get('user_answer', ''),
+                is_correct=record.get('is_correct', False),
+                attempts=record.get('attempts', 0),
+                created_at=to_datetime(record['created_at']),
+                solved_at=to_datetime(record.get('solved_at')),
+            )
+            for record in records
+            if record['respondent_id'] in existing_ids
+        ]
+        try:
+            with transaction.atomic():
+                CaptchaChallenge.objects.bulk_create(challenges, batch_size=batch_size)
+        except Exception:
+            # Возвращаем пачку в начало очереди в прежнем порядке — ее запишет следующий запуск
+            with redis.pipeline() as pipe:
+                for _ in raw_records:
+                    pipe.lmove(CAPTCHA_AUDIT_PROCESSING_KEY, CAPTCHA_AUDIT_KEY, 'RIGHT', 'LEFT')
+                pipe.execute()
+            raise
+        redis.delete(CAPTCHA_AUDIT_PROCESSING_KEY)
+        saved += len(challenges)
+
+    return {
+        'status': 'success',
+        'saved_count': saved
+    }
+
+
+@shared_task(bind=True, soft_time_limit=600, time_limit=660)  # 10 min soft, 11 min hard
+def refill_captcha_image_pool_task(self, pool_size=None):
+    """
+    Дополняет пул капч-картинок до BOT_CAPTCHA_IMAGE_POOL_SIZE.
+    PNG рисуются здесь и один раз загружаются в служебный чат прямо из памяти, чтобы
+    бот отправлял их по file_id без генерации и загрузки на горячем пути. В хранилище
+    картинки не пишутся: записи пула одноразовые, а для аудита достаточно file_id.
+    """
+    import asyncio
+
+    from aiogram.types import BufferedInputFile
+    from redis import Redis
+
+    from apps.bot.captcha_state import CAPTCHA_IMAGE_POOL_KEY
+    from apps.bot.captcha_utils import generate_image_captcha
+    from apps.bot.misc import get_bot_instance
+    from apps.bot.storage import pack_data
+
+    if not settings.BOT_CAPTCHA_UPLOAD_CHAT_ID:
+        return {
+            'status': 'error',
+            'message': 'BOT_CAPTCHA_UPLOAD_CHAT_ID is not configured'
+        }
+
+    redis = Redis.from_url(settings.REDIS_URL)
+    missing = (pool_size or settings.BOT_CAPTCHA_IMAGE_POOL_SIZE) - redis.llen(CAPTCHA_IMAGE_POOL_KEY)
+    if missing <= 0:
+        return {
+            'status': 'success',
+            'added_count': 0
+        }
+
+    async def upload(png):
+        message = await bot.send_photo(
+            chat_id=settings.BOT_CAPTCHA_UPLOAD_CHAT_ID,
+            photo=BufferedInputFile(png, filename='captcha.png'),
+            disable_notification=True,
+        )
+        return message.photo[-1].file_id
+
+    bot = get_bot_instance()
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    added = 0
+    try:
+        for _ in range(missing):
+            png, answer = generate_image_captcha()
+            file_id = loop.run_until_complete(upload(png))
+            redis.rpush(CAPTCHA_IMAGE_POOL_KEY, pack_data({'file_id': file_id, 'answer': answer}))
+            added += 1
+    except SoftTimeLimitExceeded:
+        pass
+    finally:
+        loop.run_until_complete(bot.session.close())
+        loop.close()
+
+    return {
+        'status': 'success',
+        'added_count': added
+    }
+
+
+def is_broadcast_quiet_hours(now=None):
+    """
+    Попадает ли момент в окно "тихих часов" BROADCAST_QUIET_HOURS (формат "HH-HH",
+    локальное время, окно может переходить через полночь). Пустая настройка — окна нет.
+    """
+
+    if not settings.BROADCAST_QUIET_HOURS:
+        return False
+    start, end = (int(hour) for hour in settings.BROADCAST_QUIET_HOURS.split('-'))
+    hour = timezone.localtime(now).hour
+    if start <= end:
+        return start <= hour < end
+    return hour >= start or hour < end
+
+
+@shared_task
+def dispatch_scheduled_broadcasts_task():
+    """
+    Запускает запланированные рассылки, время которых наступило.
+    Выборка идет по индексу (status, scheduled_at). Крупные рассылки
+    (больше BROADCAST_QUIET_HOURS_MIN_USERS получателей) при заданном окне
+    "тихих часов" откладываются до него, чтобы не конкурировать с живыми опросами.
+    """
+
+    from apps.users.models import TGUser
+    from .models import BroadcastPost
+
+    now = timezone.now()
+    due_ids = list(
+        BroadcastPost.objects.filter(status='scheduled', scheduled_at__lte=now)
+        .order_by('scheduled_at')
+        .values_list('id', flat=True)
+    )
+    if not due_ids:
+        return {
+            'status': 'success',
+            'started_count': 0
+        }
+
+    if settings.BROADCAST_QUIET_HOURS and not is_broadcast_quiet_hours(now):
+        recipients = TGUser.objects.filter(is_active=True, blocked_bot=False).count()
+        if recipients > settings.BROADCAST_QUIET_HOURS_MIN_USERS:
+            return {
+                'status': 'success',
+                'started_count': 0,
+                'deferred_count': len(due_ids)
+            }
+
+    started = 0
+    for broadcast_id in due_ids:
+        # Условный UPDATE: пост запустит только один экземпляр диспетчера
+        claimed = BroadcastPost.objects.filter(id=broadcast_id, status='scheduled').update(
+            status='sending', started_at=now
+        )
+        if claimed:
+            start_broadcast_task.delay(broadcast_id)
+            started += 1
+
+    return {
+        'status': 'success',
+        'started_count': started
+    }
+
+
+def _send_broadcast_photo(loop, bot, broadcast, chat_id):
+    """
+    Отправляет пост с изображением. Пока file_id нет, загрузка идет под блокировкой
+    строки поста: параллельные чанки ждут первую загрузку и перечитывают file_id,
+    поэтому изображение загружается в Telegram один раз на рассылку, а не на чанк.
+    """
+    from aiogram.types import FSInputFile
+    from django.db import transaction
+
+    def send(photo):
+        return loop.run_until_complete(
+            bot.send_photo(
+                chat_id=chat_id,
+                photo=photo,
+                caption=f"<b>{broadcast.title}</b>\n\n{broadcast.content}",
+                parse_mode="HTML"
+            )
+        )
+
+    if not broadcast.image_file_id:
+        with transaction.atomic():
+            broadcast.image_file_id = type(broadcast).objects.select_for_update().values_list(
+                'image_file_id', flat=True
+            ).get(id=broadcast.id)
+            if not broadcast.image_file_id:
+                message = send(FSInputFile(broadcast.image.path))
+                if message.photo:
+                    broadcast.image_file_id = message.photo[-1].file_id
+                    type(broadcast).objects.filter(id=broadcast.id).update(image_file_id=broadcast.image_file_id)
+                return message
+    return send(broadcast.image_file_id)
+
+
 @shared_task(bind=True, soft_time_limit=1800, time_limit=2100)  # 30 min soft, 35 min hard
-def start_broadcast_task(self, broadcast_id):
+def start_broadcast_task(self, broadcast_id, resume=False):
     """
     Основная задача для запуска рассылки поста.
     Разбивает пользователей на группы по 100 и запускает дочерние задачи.
+    resume=True — продолжение прерванной рассылки: получатели из журнала
+    доставки (отправлено или бот заблокирован) исключаются прямо в запросе.
     """
     try:
-        from .models import BroadcastPost
+        from django.db.models import Exists, OuterRef
+        from .models import BroadcastPost, BroadcastDelivery
         from apps.users.models import TGUser
         
         broadcast = BroadcastPost.objects.get(id=broadcast_id)
         broadcast.status = 'sending'
-        broadcast.started_at = timezone.now()
+        if not resume:
+            broadcast.started_at = timezone.now()
+        broadcast.last_progress_at = timezone.now()
+        broadcast.completed_at = None
         broadcast.save()
         
         # Получаем всех активных пользователей, которые не заблокировали бота
         all_users = TGUser.objects.filter(is_active=True, blocked_bot=False)
-        broadcast.total_users = all_users.count()
+        if resume:
+            done = BroadcastDelivery.objects.filter(
+                broadcast_id=broadcast_id, user_id=OuterRef('pk'), status__in=['sent', 'blocked']
+            )
+            all_users = all_users.exclude(Exists(done))
+            # Счетчики пересчитываются по журналу: старые ошибки будут отправлены повторно
+            broadcast.sent_users = broadcast.deliveries.filter(status='sent').count()
+            broadcast.failed_users = broadcast.deliveries.filter(status='blocked').count()
+            pending_users = all_users.count()
+            broadcast.total_users = broadcast.sent_users + broadcast.failed_users + pending_users
+        else:
+            pending_users = broadcast.total_users = all_users.count()
         broadcast.save()
         
-        if broadcast.total_users == 0:
+        if pending_users == 0:
             broadcast.status = 'sent'
             broadcast.completed_at = timezone.now()
             broadcast.save()
@@ -354,17 +614,23 @@ def start_broadcast_task(self, broadcast_id):
         chunk_size = 100
         user_chunks = [user_ids[i:i + chunk_size] for i in range(0, len(user_ids), chunk_size)]
         
+        # В "тихие часы" живого трафика мало, поэтому чанки запускаются плотнее
+        chunk_interval = (
+            settings.BROADCAST_QUIET_CHUNK_INTERVAL if is_broadcast_quiet_hours()
+            else settings.BROADCAST_CHUNK_INTERVAL
+        )
+        
         # Запускаем дочерние задачи последовательно
         for i, chunk in enumerate(user_chunks):
             # Запускаем задачу с задержкой для последовательности
             send_broadcast_chunk_task.apply_async(
                 args=[broadcast_id, chunk, i],
-                countdown=i * 2  # 2 секунды между запусками
+                countdown=i * chunk_interval
             )
         
         return {
             'status': 'success',
-            'message': f'Started broadcast for {broadcast.total_users} users in {len(user_chunks)} chunks'
+            'message': f'Started broadcast for {pending_users} users in {len(user_chunks)} chunks'
         }
         
     except BroadcastPost.DoesNotExist:
@@ -402,26 +668,58 @@ def start_broadcast_task(self, broadcast_id):
         }
 
 
+# Сколько записей журнала доставки копится в чанке перед вставкой
+BROADCAST_DELIVERY_BATCH_SIZE = 25
+
+
+def _flush_broadcast_deliveries(deliveries):
+    """Пишет накопленные записи журнала доставки одной вставкой и отмечает прогресс рассылки"""
+    from .models import BroadcastDelivery, BroadcastPost
+
+    if not deliveries:
+        return
+    BroadcastDelivery.objects.bulk_create(
+        deliveries,
+        update_conflicts=True,
+        unique_fields=['broadcast', 'user_id'],
+        update_fields=['status', 'message_id'],
+    )
+    BroadcastPost.objects.filter(id=deliveries[0].broadcast_id).update(last_progress_at=timezone.now())
+    deliveries.clear()
+
+
 @shared_task(bind=True, soft_time_limit=300, time_limit=360)  # 5 min soft, 6 min hard
 def send_broadcast_chunk_task(self, broadcast_id, user_ids, chunk_index):
     """
     Отправляет пост группе пользователей (до 100 человек).
     Учитывает интервал отправки для избежания блокировки.
+    Доставка пишется в BroadcastDelivery пачками; уже получившие пост пользователи
+    пропускаются, поэтому повторный запуск чанка (resume) не шлет дубликаты.
     """
+    from .models import BroadcastDelivery
+
+    deliveries = []
     try:
         from .models import BroadcastPost
         from apps.users.models import TGUser
         from apps.bot.misc import get_bot_instance
-        from aiogram.types import InputFile
         import time
         
         broadcast = BroadcastPost.objects.get(id=broadcast_id)
         
+        already_done = BroadcastDelivery.objects.filter(
+            broadcast_id=broadcast_id,
+            user_id__in=user_ids,
+            status__in=['sent', 'blocked'],
+        ).values_list('user_id', flat=True)
+        
         # Получаем пользователей для рассылки (только активных и не заблокировавших бота)
-        users = TGUser.objects.filter(
-            id__in=user_ids, 
-            is_active=True, 
-            blocked_bot=False
+        users = list(
+            TGUser.objects.filter(
+                id__in=user_ids, 
+                is_active=True, 
+                blocked_bot=False
+            ).exclude(id__in=already_done)
         )
         
         sent_count = 0
@@ -437,19 +735,11 @@ def send_broadcast_chunk_task(self, broadcast_id, user_ids, chunk_index):
                 asyncio.set_event_loop(loop)
                 try:
                     if broadcast.image:
-                        # Отправляем с изображением
-                        photo = InputFile(broadcast.image.path)
-                        loop.run_until_complete(
-                            bot.send_photo(
-                                chat_id=user.id,
-                                photo=photo,
-                                caption=f"<b>{broadcast.title}</b>\n\n{broadcast.content}",
-                                parse_mode="HTML"
-                            )
-                        )
+                        # Отправляем с изображением (после первой загрузки — по file_id)
+                        message = _send_broadcast_photo(loop, bot, broadcast, user.id)
                     else:
                         # Отправляем только текст
-                        loop.run_until_complete(
+                        message = loop.run_until_complete(
                             bot.send_message(
                                 chat_id=user.id,
                                 text=f"<b>{broadcast.title}</b>\n\n{broadcast.content}",
@@ -462,20 +752,27 @@ def send_broadcast_chunk_task(self, broadcast_id, user_ids, chunk_index):
                     loop.close()
                 
                 sent_count += 1
+                metrics.record_sent('broadcast')
+                deliveries.append(BroadcastDelivery(
+                    broadcast_id=broadcast_id, user_id=user.id, status='sent', message_id=message.message_id
+                ))
                 
                 # Обновляем счетчик в рассылке
                 broadcast.sent_users += 1
-                broadcast.save()
+                broadcast.save(update_fields=['sent_users'])
                 
                 # Пауза между отправками (1 секунда)
                 if i < len(users) - 1:  # Не ждем после последнего пользователя
                     time.sleep(1)
                 
+            except SoftTimeLimitExceeded:
+                raise
             except Exception as e:
                 failed_count += 1
+                metrics.record_failed('broadcast', e)
                 # Обновляем счетчик ошибок в рассылке
                 broadcast.failed_users += 1
-                broadcast.save()
+                broadcast.save(update_fields=['failed_users'])
                 
                 # Проверяем, заблокировал ли пользователь бота
                 error_message = str(e).lower()
@@ -484,11 +781,17 @@ def send_broadcast_chunk_task(self, broadcast_id, user_ids, chunk_index):
                     user.blocked_bot = True
                     user.is_active = False
                     user.save()
-                    print(f"User {user.id} ({user.fullname}) blocked the bot during broadcast")
+                    deliveries.append(BroadcastDelivery(broadcast_id=broadcast_id, user_id=user.id, status='blocked'))
+                    logger.info("User blocked the bot during broadcast", extra={"user_id": user.id, "broadcast_id": broadcast_id})
                 else:
-                    print(f"Failed to send broadcast to user {user.id}: {e}")
+                    deliveries.append(BroadcastDelivery(broadcast_id=broadcast_id, user_id=user.id, status='failed'))
+                    logger.warning("Broadcast send failed: %s", e, extra={"user_id": user.id, "broadcast_id": broadcast_id})
                 continue
+            finally:
+                if len(deliveries) >= BROADCAST_DELIVERY_BATCH_SIZE:
+                    _flush_broadcast_deliveries(deliveries)
         
+        _flush_broadcast_deliveries(deliveries)
         # Счетчики ошибок уже обновлены в цикле
         
         # Проверяем, завершена ли вся рассылка
@@ -511,11 +814,14 @@ def send_broadcast_chunk_task(self, broadcast_id, user_ids, chunk_index):
             'message': f'BroadcastPost with id {broadcast_id} not found'
         }
     except SoftTimeLimitExceeded:
+        # Сохраняем доставленное, остаток дошлет resume_broadcast
+        _flush_broadcast_deliveries(deliveries)
         return {
             'status': 'error',
             'message': f'Chunk {chunk_index} timed out'
         }
     except Exception as e:
+        _flush_broadcast_deliveries(deliveries)
         return {
             'status': 'error',
             'chunk_index': chunk_index,
@@ -533,7 +839,6 @@ def send_test_broadcast_task(self, broadcast_id, test_user_id):
         from .models import BroadcastPost
         from apps.users.models import TGUser
         from apps.bot.misc import get_bot_instance
-        from aiogram.types import InputFile
         import asyncio
         
         broadcast = BroadcastPost.objects.get(id=broadcast_id)
@@ -554,16 +859,8 @@ def send_test_broadcast_task(self, broadcast_id, test_user_id):
         
         try:
             if broadcast.image:
-                # Отправляем с изображением
-                photo = InputFile(broadcast.image.path)
-                loop.run_until_complete(
-                    bot.send_photo(
-                        chat_id=test_user_id,
-                        photo=photo,
-                        caption=f"<b>{broadcast.title}</b>\n\n{broadcast.content}",
-                        parse_mode="HTML"
-                    )
-                )
+                # Отправляем с изображением (после первой загрузки — по file_id)
+                _send_broadcast_photo(loop, bot, broadcast, test_user_id)
             else:
                 # Отправляем только текст
                 loop.run_until_complete(
@@ -573,10 +870,14 @@ def send_test_broadcast_task(self, broadcast_id, test_user_id):
                         parse_mode="HTML"
                     )
                 )
+        except Exception as e:
+            metrics.record_failed('test_broadcast', e)
+            raise
         finally:
             # Правильно закрываем сессию бота
             loop.run_until_complete(bot.session.close())
             loop.close()
+        metrics.record_sent('test_broadcast')
         
         return {
             'status': 'success',
@@ -679,7 +980,7 @@ def export_chunk_task(self, chunk_id):
             poll=export_file.poll,
             include_unfinished=export_file.include_unfinished,
         )
-        queryset = resource.get_export_queryset(None)
+        queryset = resource.get_export_queryset(None).using(read_alias(settings.EXPORT_DB_ALIAS))
         export_fields = resource.get_export_fields()
 
         # Вычисляем offset и limit для этого chunk
@@ -712,6 +1013,7 @@ def export_chunk_task(self, chunk_id):
             wb.save(tmp.name)
             tmp.seek(0)
             chunk.file.save(filename, File(tmp), save=False)
+        metrics.record_export("respondents_chunk", rows_exported, os.path.getsize(tmp.name))
 
         # Обновляем chunk
         chunk.filename = filename
@@ -888,6 +1190,7 @@ def send_update_notification_task(self, user_ids, chunk_index, custom_message=No
                     loop.close()
                 
                 sent_count += 1
+                metrics.record_sent('update')
                 
                 # Пауза между отправками (1 секунда)
                 if i < len(users) - 1:  # Не ждем после последнего пользователя
@@ -895,8 +1198,9 @@ def send_update_notification_task(self, user_ids, chunk_index, custom_message=No
                 
             except Exception as e:
                 failed_count += 1
+                metrics.record_failed('update', e)
                 # Логируем ошибку, но продолжаем с другими пользователями
-                print(f"Failed to send update notification to user {user.id}: {e}")
+                logger.warning("Update notification send failed: %s", e, extra={"user_id": user.id})
                 
                 # Проверяем, является ли ошибка связанной с блокировкой бота
                 error_message = str(e).lower()
@@ -907,7 +1211,7 @@ def send_update_notification_task(self, user_ids, chunk_index, custom_message=No
                     # Помечаем пользователя как заблокировавшего бота
                     user.blocked_bot = True
                     user.save()
-                    print(f"Marked user {user.id} as blocked_bot=True due to error: {e}")
+                    logger.info("User marked as blocked_bot", extra={"user_id": user.id})
                 
                 continue
         
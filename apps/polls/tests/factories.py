@@ -0,0 +1,38 @@
+from datetime import timedelta
+
+from django.utils import timezone
+from factory import Sequence
+from factory import SubFactory
+from factory.django import DjangoModelFactory
+
+from apps.polls.models import Choice
+from apps.polls.models import Poll
+from apps.polls.models import Question
+
+
+class PollFactory(DjangoModelFactory[Poll]):
+    name = Sequence(lambda n: f"Poll {n}")
+    description = "Description"
+    deadline = Sequence(lambda n: timezone.now() + timedelta(days=7))
+
+    class Meta:
+        model = Poll
+
+
+class QuestionFactory(DjangoModelFactory[Question]):
+    poll = SubFactory(PollFactory)
+    text = Sequence(lambda n: f"Question {n}")
+    type = Question.QuestionTypeChoices.CLOSED_SINGLE
+    order = Sequence(lambda n: n + 1)
+
+    class Meta:
+        model = Question
+
+
+class ChoiceFactory(DjangoModelFactory[Choice]):
+    question = SubFactory(QuestionFactory)
+    text = Sequence(lambda n: f"Choice {n}")
+    order = Sequence(lambda n: n + 1)
+
+    class Meta:
+        model = Choice
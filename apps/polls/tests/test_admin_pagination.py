@@ -0,0 +1,60 @@
+from http import HTTPStatus
+
+import pytest
+from django.contrib import admin
+from django.urls import reverse
+
+from apps.polls.admin_pagination import EstimatedCountPaginator
+from apps.polls.admin_pagination import estimate_count
+from apps.polls.models import Respondent
+from apps.polls.tests.factories import PollFactory
+from apps.users.models import TGUser
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def respondents(monkeypatch):
+    monkeypatch.setattr(admin.site._registry[Respondent], "list_per_page", 2)
+    tg_user = TGUser.objects.create(id=8001, fullname="Respondent")
+    poll = PollFactory()
+    created = [Respondent.objects.create(tg_user=tg_user, poll=poll) for _ in range(3)]
+    return sorted(created, key=lambda respondent: respondent.pk, reverse=True)
+
+
+def changelist(admin_client, **params):
+    response = admin_client.get(reverse("admin:polls_respondent_changelist"), data=params)
+    assert response.status_code == HTTPStatus.OK
+    return response.context["cl"]
+
+
+def test_next_page_uses_cursor_after_last_row(admin_client, respondents):
+    cl = changelist(admin_client)
+
+    assert list(cl.result_list) == respondents[:2]
+    assert f"after={respondents[1].pk}" in cl.next_page_url
+    assert cl.first_page_url is None
+
+    cl = changelist(admin_client, after=respondents[1].pk)
+
+    assert list(cl.result_list) == respondents[2:]
+    assert cl.next_page_url is None
+    assert "after" not in cl.first_page_url
+
+
+def test_custom_ordering_falls_back_to_offset_pages(admin_client, respondents):
+    cl = changelist(admin_client, o="3", after=respondents[1].pk)
+
+    assert not cl.keyset_enabled
+    assert cl.next_page_url is None
+    assert len(cl.result_list) == 2
+
+
+def test_small_tables_get_exact_count(settings, respondents):
+    settings.ADMIN_ESTIMATED_COUNT_THRESHOLD = 50000
+    queryset = Respondent.objects.all()
+
+    assert estimate_count(queryset) is None
+    paginator = EstimatedCountPaginator(queryset.order_by("-pk"), 2)
+    assert paginator.count == 3
+    assert not paginator.is_estimated
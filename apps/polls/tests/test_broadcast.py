@@ -0,0 +1,120 @@
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+from django.contrib import admin
+from django.utils import timezone
+
+from apps.polls.admin import BroadcastPostAdmin
+from apps.polls.models import BroadcastDelivery
+from apps.polls.models import BroadcastPost
+from apps.polls.tasks import _send_broadcast_photo
+from apps.polls.tasks import send_broadcast_chunk_task
+from apps.users.models import TGUser
+
+pytestmark = pytest.mark.django_db
+
+
+class FakeBot:
+    def __init__(self, sent):
+        self.sent = sent
+        self.session = SimpleNamespace(close=self._close)
+
+    async def _close(self):
+        return None
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        self.sent.append(chat_id)
+        return SimpleNamespace(message_id=len(self.sent), photo=None)
+
+    async def send_photo(self, chat_id, photo, caption=None, parse_mode=None):
+        self.sent.append(photo)
+        return SimpleNamespace(message_id=len(self.sent), photo=[SimpleNamespace(file_id="file-1")])
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    sent = []
+    monkeypatch.setattr("apps.bot.misc.get_bot_instance", lambda: FakeBot(sent))
+    monkeypatch.setattr("time.sleep", lambda seconds: None)
+    return sent
+
+
+@pytest.fixture
+def resumed(monkeypatch, rf):
+    resumed = []
+    monkeypatch.setattr(
+        "apps.polls.tasks.start_broadcast_task.delay",
+        lambda broadcast_id, resume=False: resumed.append((broadcast_id, resume)),
+    )
+    model_admin = BroadcastPostAdmin(BroadcastPost, admin.site)
+    monkeypatch.setattr(model_admin, "message_user", lambda request, message: None)
+
+    def resume(*broadcasts):
+        model_admin.resume_broadcast(rf.post("/"), BroadcastPost.objects.filter(id__in=[b.id for b in broadcasts]))
+        return resumed
+
+    return resume
+
+
+def make_broadcast(**kwargs) -> BroadcastPost:
+    return BroadcastPost.objects.create(title="News", content="Text", **kwargs)
+
+
+def test_chunk_skips_users_already_in_delivery_log(sent):
+    users = [TGUser.objects.create(id=user_id, fullname=f"User {user_id}") for user_id in (1, 2, 3)]
+    broadcast = make_broadcast(status="sending", total_users=3)
+    BroadcastDelivery.objects.create(broadcast=broadcast, user_id=1, status="sent", message_id=10)
+
+    send_broadcast_chunk_task.apply(args=[broadcast.id, [u.id for u in users], 0])
+
+    assert sorted(sent) == [2, 3]
+    assert set(broadcast.deliveries.values_list("user_id", "status")) == {(1, "sent"), (2, "sent"), (3, "sent")}
+    broadcast.refresh_from_db()
+    assert broadcast.last_progress_at is not None
+
+
+def test_resume_skips_sending_broadcast_with_recent_progress(resumed):
+    broadcast = make_broadcast(status="sending", started_at=timezone.now(), last_progress_at=timezone.now())
+
+    assert resumed(broadcast) == []
+
+
+def test_resume_restarts_stalled_and_failed_broadcasts(resumed, settings):
+    long_ago = timezone.now() - timedelta(minutes=settings.BROADCAST_STALL_MINUTES + 1)
+    stalled = make_broadcast(status="sending", started_at=long_ago, last_progress_at=long_ago)
+    failed = make_broadcast(status="failed", started_at=timezone.now())
+    draft = make_broadcast(status="draft")
+
+    assert sorted(resumed(stalled, failed, draft)) == sorted([(stalled.id, True), (failed.id, True)])
+    stalled.refresh_from_db()
+    assert stalled.last_progress_at > long_ago
+
+
+def test_resume_is_claimed_once(resumed):
+    failed = make_broadcast(status="failed")
+
+    resumed(failed)
+    # Второй клик: рассылка уже "Отправляется" и только что продолжена
+    assert resumed(failed) == [(failed.id, True)]
+
+
+def test_broadcast_image_is_uploaded_once_across_chunks():
+    import asyncio
+
+    broadcast = make_broadcast(status="sending", image="broadcasts/post.png")
+    # Каждый чанк держит свою копию поста, загруженную до первой отправки
+    first_chunk = BroadcastPost.objects.get(id=broadcast.id)
+    second_chunk = BroadcastPost.objects.get(id=broadcast.id)
+    sent = []
+    loop = asyncio.new_event_loop()
+    try:
+        _send_broadcast_photo(loop, FakeBot(sent), first_chunk, 1)
+        _send_broadcast_photo(loop, FakeBot(sent), second_chunk, 2)
+    finally:
+        loop.close()
+
+    assert not isinstance(sent[0], str)
+    assert sent[1] == "file-1"
+    broadcast.refresh_from_db()
+    assert broadcast.image_file_id == "file-1"
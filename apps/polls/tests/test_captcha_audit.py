@@ -0,0 +1,83 @@
+import time
+
+import pytest
+from django.conf import settings
+from django.db import DatabaseError
+from redis import Redis
+
+from apps.bot.captcha_state import CAPTCHA_AUDIT_KEY
+from apps.bot.captcha_state import CAPTCHA_AUDIT_PROCESSING_KEY
+from apps.bot.storage import pack_data
+from apps.polls.models import CaptchaChallenge
+from apps.polls.models import Respondent
+from apps.polls.tasks import flush_captcha_audit_task
+from apps.polls.tests.factories import PollFactory
+from apps.users.models import TGUser
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def redis():
+    client = Redis.from_url(settings.REDIS_URL)
+    client.delete(CAPTCHA_AUDIT_KEY, CAPTCHA_AUDIT_PROCESSING_KEY)
+    yield client
+    client.delete(CAPTCHA_AUDIT_KEY, CAPTCHA_AUDIT_PROCESSING_KEY)
+
+
+@pytest.fixture
+def respondent():
+    tg_user = TGUser.objects.create(id=9501, fullname="Respondent")
+    return Respondent.objects.create(tg_user=tg_user, poll=PollFactory())
+
+
+def audit_record(respondent_id, answer):
+    return pack_data({
+        "respondent_id": respondent_id,
+        "captcha_type": "math",
+        "question": "2 + 2",
+        "correct_answer": "4",
+        "user_answer": answer,
+        "is_correct": answer == "4",
+        "attempts": 1,
+        "created_at": time.time(),
+        "solved_at": None,
+    })
+
+
+def test_flush_writes_all_batches(redis, respondent):
+    redis.rpush(CAPTCHA_AUDIT_KEY, *(audit_record(respondent.id, str(n)) for n in range(5)))
+
+    result = flush_captcha_audit_task(batch_size=2)
+
+    assert result["saved_count"] == 5
+    assert CaptchaChallenge.objects.filter(respondent=respondent).count() == 5
+    assert not redis.exists(CAPTCHA_AUDIT_KEY, CAPTCHA_AUDIT_PROCESSING_KEY)
+
+
+def test_failed_insert_keeps_records_in_queue(redis, respondent, monkeypatch):
+    records = [audit_record(respondent.id, str(n)) for n in range(3)]
+    redis.rpush(CAPTCHA_AUDIT_KEY, *records)
+
+    def fail(*args, **kwargs):
+        raise DatabaseError("database is unavailable")
+
+    monkeypatch.setattr(CaptchaChallenge.objects, "bulk_create", fail)
+    with pytest.raises(DatabaseError):
+        flush_captcha_audit_task(batch_size=2)
+
+    assert redis.lrange(CAPTCHA_AUDIT_KEY, 0, -1) == records
+    assert not redis.exists(CAPTCHA_AUDIT_PROCESSING_KEY)
+    assert not CaptchaChallenge.objects.exists()
+
+
+def test_leftover_processing_batch_is_written_first(redis, respondent):
+    # Пачка воркера, упавшего до коммита
+    redis.rpush(CAPTCHA_AUDIT_PROCESSING_KEY, audit_record(respondent.id, "4"))
+    redis.rpush(CAPTCHA_AUDIT_KEY, audit_record(respondent.id, "5"))
+
+    flush_captcha_audit_task(batch_size=10)
+
+    answers = CaptchaChallenge.objects.order_by("id").values_list("user_answer", flat=True)
+    assert list(answers) == ["4", "5"]
+    assert not redis.exists(CAPTCHA_AUDIT_KEY, CAPTCHA_AUDIT_PROCESSING_KEY)
@@ -0,0 +1,54 @@
+import time
+
+import pytest
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from apps.polls.models import Poll
+from config import db_router
+from config.db_router import REPLICA_ALIAS
+from config.db_router import PrimaryReplicaRouter
+from config.db_router import read_alias
+from config.db_router import use_replica
+
+
+@pytest.fixture
+def replica(monkeypatch):
+    """Алиас replica настроен, а проверка отставания уже прошла"""
+    monkeypatch.setitem(settings.DATABASES, REPLICA_ALIAS, settings.DATABASES[DEFAULT_DB_ALIAS])
+    monkeypatch.setattr(db_router, "_replica_state", {"checked_at": time.monotonic(), "fresh": True})
+
+
+def test_reads_stay_on_primary_without_replica_alias(monkeypatch):
+    monkeypatch.delitem(settings.DATABASES, REPLICA_ALIAS, raising=False)
+
+    with use_replica():
+        assert PrimaryReplicaRouter().db_for_read(Poll) is None
+    assert read_alias() == DEFAULT_DB_ALIAS
+
+
+@pytest.mark.usefixtures("replica")
+def test_reads_go_to_replica_only_inside_use_replica():
+    router = PrimaryReplicaRouter()
+
+    assert router.db_for_read(Poll) is None
+    with use_replica():
+        assert router.db_for_read(Poll) == REPLICA_ALIAS
+        assert router.db_for_write(Poll) == DEFAULT_DB_ALIAS
+    assert read_alias() == REPLICA_ALIAS
+
+
+@pytest.mark.usefixtures("replica")
+def test_lagging_replica_falls_back_to_primary(monkeypatch):
+    monkeypatch.setattr(db_router, "_replica_state", {"checked_at": time.monotonic(), "fresh": False})
+
+    with use_replica():
+        assert PrimaryReplicaRouter().db_for_read(Poll) is None
+    assert read_alias("reports") == "reports"
+
+
+def test_replica_is_never_migrated():
+    router = PrimaryReplicaRouter()
+
+    assert router.allow_migrate(REPLICA_ALIAS, "polls") is False
+    assert router.allow_migrate(DEFAULT_DB_ALIAS, "polls") is None
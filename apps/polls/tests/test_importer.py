@@ -0,0 +1,70 @@
+import json
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from apps.polls.importer import PollImportError
+from apps.polls.importer import import_poll_questions
+from apps.polls.importer import parse_poll_file
+from apps.polls.importer import validate_definitions
+from apps.polls.tests.factories import PollFactory
+from apps.polls.tests.factories import QuestionFactory
+
+
+def json_file(questions) -> SimpleUploadedFile:
+    return SimpleUploadedFile("poll.json", json.dumps({"questions": questions}).encode())
+
+
+def test_parse_csv_groups_choice_rows_under_question():
+    content = "question,type,choice\nColour?,closed_single,Red\n,,Green\nWhy?,open,\n".encode()
+
+    questions = parse_poll_file(SimpleUploadedFile("poll.csv", content))
+
+    assert [q.texts["text"] for q in questions] == ["Colour?", "Why?"]
+    assert [c["text"] for c in questions[0].choices] == ["Red", "Green"]
+
+
+def test_validate_rejects_question_without_text():
+    questions = parse_poll_file(json_file([{"choices": ["A", "B"]}]))
+
+    assert validate_definitions(questions) == ["Вопрос #1: пустой текст вопроса."]
+
+
+def test_validate_rejects_max_choices_above_choice_count():
+    questions = parse_poll_file(json_file([{"text": "Q", "type": "closed_multiple", "max_choices": 3, "choices": ["A", "B"]}]))
+
+    assert validate_definitions(questions) == ["Вопрос #1: max_choices (3) больше числа вариантов (2)."]
+
+
+def test_validate_keeps_a_slot_for_the_other_option_on_mixed_questions():
+    choices = [f"Option {n}" for n in range(10)]
+    questions = parse_poll_file(json_file([{"text": "Q", "type": "mixed", "choices": choices}]))
+
+    assert len(validate_definitions(questions)) == 1
+
+
+@pytest.mark.django_db
+def test_import_appends_questions_after_existing_ones():
+    poll = PollFactory()
+    QuestionFactory(poll=poll, order=3)
+    version = poll.version
+
+    created = import_poll_questions(poll, parse_poll_file(json_file([
+        {"text": "Q1", "choices": ["A", "B"]},
+        {"text": "Q2", "type": "open"},
+    ])))
+
+    assert [q.order for q in created] == [4, 5]
+    assert poll.questions.get(text="Q1").choices.count() == 2
+    poll.refresh_from_db()
+    assert poll.version > version
+
+
+@pytest.mark.django_db
+def test_import_is_all_or_nothing():
+    poll = PollFactory()
+
+    with pytest.raises(PollImportError):
+        import_poll_questions(poll, parse_poll_file(json_file([{"text": "Q1", "choices": ["A", "B"]}, {"text": "Q2"}])))
+
+    assert not poll.questions.exists()
@@ -0,0 +1,47 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from apps.polls.models import Poll
+from apps.polls.tests.factories import ChoiceFactory
+from apps.polls.tests.factories import PollFactory
+from apps.polls.tests.factories import QuestionFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def _version(poll: Poll) -> int:
+    return Poll.objects.values_list("version", flat=True).get(pk=poll.pk)
+
+
+def test_saving_question_and_choice_bumps_poll_version():
+    poll = PollFactory()
+    question = QuestionFactory(poll=poll)
+    after_question = _version(poll)
+
+    ChoiceFactory(question=question)
+
+    assert after_question > 1
+    assert _version(poll) == after_question + 1
+
+
+def test_choice_save_reads_poll_id_from_cached_question(django_assert_num_queries):
+    question = QuestionFactory()
+    choice = ChoiceFactory(question=question)
+    choice.text = "Edited"
+
+    # UPDATE варианта + UPDATE версии опроса, без SELECT вопроса
+    with django_assert_num_queries(2):
+        choice.save()
+
+
+def _delete_queries(choices_count: int) -> int:
+    question = QuestionFactory()
+    ChoiceFactory.create_batch(choices_count, question=question)
+    with CaptureQueriesContext(connection) as queries:
+        question.delete()
+    return len(queries)
+
+
+def test_question_delete_cascades_choices_without_per_row_queries():
+    assert _delete_queries(2) == _delete_queries(10)
@@ -0,0 +1,49 @@
+from dataclasses import dataclass
+
+from django.db.models import Count
+
+from apps.polls.models import Choice
+from apps.polls.models import Poll
+from apps.polls.models import Question
+from apps.polls.models import Respondent
+from config.db_router import use_replica
+
+
+@dataclass(frozen=True)
+class PollSummary:
+    started_count: int
+    completed_count: int
+    completion_rate: float
+    questions: list[Question]
+    choice_counts_by_question: dict[int, list[dict]]
+
+
+def poll_summary(poll: Poll) -> PollSummary:
+    """Answer aggregates for a poll, read from the replica (four queries regardless of size)."""
+    with use_replica():
+        respondents = Respondent.objects.filter(poll=poll)
+        started_count = respondents.count()
+        completed_count = respondents.filter(finished_at__isnull=False).count()
+
+        questions = list(poll.questions.all().order_by("order", "id"))
+        choice_counts_by_question: dict[int, list[dict]] = {
+            q.id: [] for q in questions if q.type != Question.QuestionTypeChoices.OPEN
+        }
+        counts = (
+            Choice.objects.filter(question_id__in=choice_counts_by_question)
+            .annotate(selected_count=Count("answer", distinct=True))
+            .values("id", "question_id", "text", "selected_count")
+            .order_by("order", "id")
+        )
+        for row in counts:
+            question_id = row.pop("question_id")
+            choice_counts_by_question[question_id].append(row)
+
+    completion_rate = (completed_count / started_count * 100) if started_count else 0
+    return PollSummary(
+        started_count=started_count,
+        completed_count=completed_count,
+        completion_rate=round(completion_rate, 1),
+        questions=questions,
+        choice_counts_by_question=choice_counts_by_question,
+    )
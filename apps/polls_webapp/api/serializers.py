@@ -0,0 +1,136 @@
+from django.utils import timezone
+from rest_framework import serializers
+
+from apps.polls.models import Choice
+from apps.polls.models import Poll
+from apps.polls.models import Question
+
+MULTIPLE_TYPES = (
+    Question.QuestionTypeChoices.CLOSED_MULTIPLE,
+    Question.QuestionTypeChoices.MIXED_MULTIPLE,
+)
+
+
+class ChoiceSerializer(serializers.ModelSerializer[Choice]):
+    class Meta:
+        model = Choice
+        fields = ["id", "question", "text", "text_uz_latn", "text_ru", "order"]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get("request")
+        if request is not None:
+            self.fields["question"].queryset = Question.objects.filter(poll__created_by=request.user)
+
+    def validate(self, attrs):
+        question = attrs.get("question")
+        moved = self.instance is None or (question is not None and question.pk != self.instance.question_id)
+        if moved and question is not None:
+            limit = Question.choices_limit(question.type)
+            if question.choices.count() >= limit:
+                raise serializers.ValidationError(f"Для этого типа вопроса можно задать до {limit} вариантов ответа.")
+        return attrs
+
+
+class QuestionSerializer(serializers.ModelSerializer[Question]):
+    poll = serializers.SlugRelatedField(slug_field="uuid", queryset=Poll.objects.none())
+
+    class Meta:
+        model = Question
+        fields = ["id", "poll", "text", "text_uz_latn", "text_ru", "type", "max_choices", "order"]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get("request")
+        if request is not None:
+            self.fields["poll"].queryset = Poll.objects.filter(created_by=request.user)
+
+    def validate(self, attrs):
+        if self.instance is not None and "poll" in attrs and attrs["poll"].pk != self.instance.poll_id:
+            raise serializers.ValidationError({"poll": "Вопрос нельзя перенести в другой опрос."})
+        # Same rules as QuestionForm.clean
+        qtype = attrs.get("type", getattr(self.instance, "type", None))
+        max_choices = attrs.get("max_choices", getattr(self.instance, "max_choices", None))
+        if qtype in MULTIPLE_TYPES:
+            if not max_choices or max_choices < 1:
+                raise serializers.ValidationError(
+                    {"max_choices": "Укажите max_choices (>=1) для множественного выбора."}
+                )
+        else:
+            attrs["max_choices"] = None
+        if self.instance is not None and qtype != Question.QuestionTypeChoices.OPEN:
+            limit = Question.choices_limit(qtype)
+            if self.instance.choices.count() > limit:
+                raise serializers.ValidationError({"type": f"Для этого типа вопроса можно задать до {limit} вариантов ответа."})
+        return attrs
+
+
+class PollSerializer(serializers.ModelSerializer[Poll]):
+    class Meta:
+        model = Poll
+        fields = [
+            "uuid",
+            "name",
+            "deadline",
+            "reward",
+            "description",
+            "description_uz_latn",
+            "description_ru",
+            "version",
+            "content_updated_at",
+        ]
+        read_only_fields = ["uuid", "version", "content_updated_at"]
+
+    def validate_deadline(self, deadline):
+        if deadline <= timezone.now():
+            raise serializers.ValidationError("Дедлайн должен быть в будущем.")
+        return deadline
+
+
+class ChoiceTreeSerializer(serializers.ModelSerializer[Choice]):
+    class Meta:
+        model = Choice
+        fields = ["id", "text", "text_uz_latn", "text_ru", "order"]
+        read_only_fields = fields
+
+
+class QuestionTreeSerializer(serializers.ModelSerializer[Question]):
+    choices = ChoiceTreeSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Question
+        fields = ["id", "text", "text_uz_latn", "text_ru", "type", "max_choices", "order", "choices"]
+        read_only_fields = fields
+
+
+class PollTreeSerializer(PollSerializer):
+    questions = serializers.SerializerMethodField()
+
+    class Meta(PollSerializer.Meta):
+        fields = [*PollSerializer.Meta.fields, "questions"]
+
+    def get_questions(self, poll: Poll) -> list[dict]:
+        return QuestionTreeSerializer(self.context["questions"], many=True).data
+
+
+class ChoiceCountSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    text = serializers.CharField()
+    selected_count = serializers.IntegerField()
+
+
+class PollAnalyticsSerializer(serializers.Serializer):
+    started_count = serializers.IntegerField()
+    completed_count = serializers.IntegerField()
+    completion_rate = serializers.FloatField()
+    questions = serializers.SerializerMethodField()
+
+    def get_questions(self, summary) -> list[dict]:
+        return [
+            {
+                "id": q.id,
+                "type": q.type,
+                "choices": ChoiceCountSerializer(summary.choice_counts_by_question.get(q.id, []), many=True).data,
+            }
+            for q in summary.questions
+        ]
@@ -0,0 +1,208 @@
+import hashlib
+import json
+
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils.cache import get_conditional_response
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date
+from django.utils.http import quote_etag
+from rest_framework import status
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.decorators import action
+from rest_framework.exceptions import APIException
+from rest_framework.mixins import CreateModelMixin
+from rest_framework.mixins import DestroyModelMixin
+from rest_framework.mixins import ListModelMixin
+from rest_framework.mixins import UpdateModelMixin
+from rest_framework.permissions import BasePermission
+from rest_framework.response import Response
+from rest_framework.viewsets import GenericViewSet
+
+from apps.polls.models import Choice
+from apps.polls.models import Poll
+from apps.polls.models import Question
+from apps.polls_webapp.analytics import poll_summary
+from apps.polls_webapp.middleware import get_tg_user
+from apps.users.models import TGUser
+
+from .serializers import ChoiceSerializer
+from .serializers import PollAnalyticsSerializer
+from .serializers import PollSerializer
+from .serializers import PollTreeSerializer
+from .serializers import QuestionSerializer
+
+
+class TelegramSessionAuthentication(SessionAuthentication):
+    """Webapp user (TGUser from the session, see TGUserMiddleware); CSRF is enforced as for sessions."""
+
+    def authenticate(self, request):
+        tg_user = get_tg_user(request._request)
+        if tg_user is None:
+            return None
+        self.enforce_csrf(request)
+        return (tg_user, None)
+
+
+class IsTGUser(BasePermission):
+    def has_permission(self, request, view):
+        return isinstance(request.user, TGUser)
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = "The poll has been changed, reload it."
+    default_code = "precondition_failed"
+
+
+def poll_etag(poll: Poll) -> str:
+    return quote_etag(f"poll-{poll.pk}-v{poll.version}")
+
+
+def content_etag(data) -> str:
+    digest = hashlib.md5(json.dumps(data, sort_keys=True, default=str).encode("utf-8"), usedforsecurity=False).hexdigest()
+    return quote_etag(digest)
+
+
+def _with_validators(response, etag: str, last_modified=None):
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+    # The client must revalidate, but may keep the body for a 304
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+class PollBuilderMixin:
+    authentication_classes = [TelegramSessionAuthentication]
+    permission_classes = [IsTGUser]
+
+    def conditional(self, etag: str, last_modified=None):
+        """304 for matching If-None-Match/If-Modified-Since, 412 for a stale If-Match."""
+        response = get_conditional_response(
+            self.request,
+            etag=etag,
+            last_modified=int(last_modified.timestamp()) if last_modified else None,
+        )
+        if response is not None and response.status_code == status.HTTP_412_PRECONDITION_FAILED:
+            raise PreconditionFailed
+        return response
+
+    def check_poll_precondition(self, poll: Poll) -> Poll:
+        """
+        Optimistic locking for writes: If-Match must carry the current poll ETag.
+
+        Call inside the write's transaction: the poll row stays locked until commit,
+        so a concurrent write with the same ETag waits and then gets 412.
+        """
+        locked = Poll.objects.select_for_update().only("pk", "version").get(pk=poll.pk)
+        if "HTTP_IF_MATCH" in self.request.META:
+            self.conditional(poll_etag(locked))
+        return locked
+
+
+class PollViewSet(PollBuilderMixin, ListModelMixin, UpdateModelMixin, GenericViewSet):
+    """
+    Poll builder API. Creation stays in the webapp (poll_create), because it consumes payments.
+
+    GET /polls/<uuid>/ returns the whole tree; ETag/Last-Modified come from Poll.version,
+    so a revalidation costs one query and returns 304 without a body.
+    """
+    serializer_class = PollSerializer
+    lookup_field = "uuid"
+
+    def get_queryset(self):
+        return Poll.objects.filter(created_by=self.request.user).order_by("-id")
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.get_queryset()
+        etag = content_etag(list(queryset.values_list("uuid", "version")))
+        not_modified = self.conditional(etag)
+        if not_modified is not None:
+            return not_modified
+        return _with_validators(super().list(request, *args, **kwargs), etag)
+
+    def retrieve(self, request, *args, **kwargs):
+        poll = self.get_object()
+        etag = poll_etag(poll)
+        not_modified = self.conditional(etag, poll.content_updated_at)
+        if not_modified is not None:
+            return not_modified
+
+        questions = poll.questions.order_by("order", "id").prefetch_related(
+            Prefetch("choices", queryset=Choice.objects.order_by("order", "id")),
+        )
+        serializer = PollTreeSerializer(poll, context={**self.get_serializer_context(), "questions": questions})
+        return _with_validators(Response(serializer.data), etag, poll.content_updated_at)
+
+    def perform_update(self, serializer):
+        poll = serializer.instance
+        with transaction.atomic():
+            # save() writes every field: keep the locked version, not the one read before the lock
+            poll.version = self.check_poll_precondition(poll).version
+            serializer.save()
+        poll.refresh_from_db(fields=["version", "content_updated_at"])
+        self._updated_poll = poll
+
+    def update(self, request, *args, **kwargs):
+        response = super().update(request, *args, **kwargs)
+        poll = self._updated_poll
+        return _with_validators(response, poll_etag(poll), poll.content_updated_at)
+
+    @action(detail=True)
+    def analytics(self, request, uuid=None):
+        poll = self.get_object()
+        data = PollAnalyticsSerializer(poll_summary(poll)).data
+        # Answers are not part of Poll.version, so the validator is a hash of the payload
+        etag = content_etag(data)
+        not_modified = self.conditional(etag)
+        if not_modified is not None:
+            return not_modified
+        return _with_validators(Response(data), etag)
+
+
+class PollTreeItemViewSet(PollBuilderMixin, CreateModelMixin, UpdateModelMixin, DestroyModelMixin, GenericViewSet):
+    """Writes to questions/choices; If-Match with the poll ETag guards against concurrent edits."""
+
+    # Relation path from the written object (or its validated data) to the poll
+    poll_lookup: tuple[str, ...] = ("poll",)
+
+    def get_poll(self, instance=None, validated_data=None) -> Poll:
+        first, *rest = self.poll_lookup
+        obj = getattr(instance, first) if instance is not None else validated_data[first]
+        for name in rest:
+            obj = getattr(obj, name)
+        return obj
+
+    @transaction.atomic
+    def perform_create(self, serializer):
+        self.check_poll_precondition(self.get_poll(validated_data=serializer.validated_data))
+        serializer.save()
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        self.check_poll_precondition(self.get_poll(instance=serializer.instance))
+        serializer.save()
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        poll = self.get_poll(instance=instance)
+        self.check_poll_precondition(poll)
+        instance.delete()
+        # Deletes don't fire version signals (they would disable fast cascade deletes)
+        Poll.bump_version(poll.pk)
+
+
+class QuestionViewSet(PollTreeItemViewSet):
+    serializer_class = QuestionSerializer
+
+    def get_queryset(self):
+        return Question.objects.filter(poll__created_by=self.request.user).select_related("poll")
+
+
+class ChoiceViewSet(PollTreeItemViewSet):
+    serializer_class = ChoiceSerializer
+    poll_lookup = ("question", "poll")
+
+    def get_queryset(self):
+        return Choice.objects.filter(question__poll__created_by=self.request.user).select_related("question__poll")
@@ -6,3 +6,6 @@ class PollsWebappConfig(AppConfig):
     name = "apps.polls_webapp"
     verbose_name = "Webapp (опросы)"
 
+
+    def ready(self):
+        from . import signals  # noqa: F401
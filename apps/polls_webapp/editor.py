@@ -0,0 +1,125 @@
+from django.db.models import Count
+from django.db.models import Prefetch
+
+from apps.polls.models import Choice
+from apps.polls.models import Poll
+from apps.polls.models import Question
+
+CHOICE_TEXT_FIELDS = ("text", "text_uz_latn", "text_ru")
+
+
+class PollStructureError(Exception):
+    pass
+
+
+def poll_questions(poll: Poll):
+    """Questions in editor order with `choices_count` annotated (one query)."""
+    return poll.questions.annotate(choices_count=Count("choices")).order_by("order", "id")
+
+
+def load_poll_tree(poll: Poll) -> list[Question]:
+    """Whole poll for the editor: questions + ordered choices in two queries."""
+    return list(
+        poll_questions(poll).prefetch_related(
+            Prefetch("choices", queryset=Choice.objects.order_by("order", "id")),
+        )
+    )
+
+
+def _as_id(value) -> int:
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise PollStructureError(f"Некорректный id: {value!r}")
+    return value
+
+
+def _choice_texts(item: dict) -> dict[str, str]:
+    texts = {}
+    for field in CHOICE_TEXT_FIELDS:
+        if field not in item:
+            continue
+        value = item[field]
+        if not isinstance(value, str) or len(value) > Choice._meta.get_field(field).max_length:
+            raise PollStructureError(f"Некорректное поле {field} варианта.")
+        texts[field] = value.strip()
+    return texts
+
+
+def apply_poll_structure(poll: Poll, payload: dict) -> None:
+    """
+    Bulk reorder/upsert of the poll tree.
+
+    payload = {"questions": [{"id": 1, "choices": [{"id": 5}, {"text": "New"}, ...]}, ...]}
+
+    Position in the lists defines `order` (1-based). Every question of the poll
+    must be listed; `choices` is optional per question and, when given, must list
+    every existing choice of that question. Choices with `id` may change their
+    texts, choices without `id` are created. All writes are one bulk_update per
+    model plus one bulk_create.
+    """
+    items = payload.get("questions") if isinstance(payload, dict) else None
+    if not isinstance(items, list):
+        raise PollStructureError("Ожидается список questions.")
+
+    questions = {q.id: q for q in poll.questions.all()}
+    question_ids = [_as_id(item.get("id")) if isinstance(item, dict) else _as_id(item) for item in items]
+    if len(set(question_ids)) != len(question_ids) or set(question_ids) != set(questions):
+        raise PollStructureError("Список должен содержать все вопросы опроса ровно по одному разу.")
+
+    choices_by_question: dict[int, dict[int, Choice]] = {question_id: {} for question_id in questions}
+    for choice in Choice.objects.filter(question__poll=poll):
+        choices_by_question[choice.question_id][choice.id] = choice
+
+    changed_questions: list[Question] = []
+    changed_choices: list[Choice] = []
+    new_choices: list[Choice] = []
+    for position, (question_id, item) in enumerate(zip(question_ids, items), start=1):
+        question = questions[question_id]
+        if question.order != position:
+            question.order = position
+            changed_questions.append(question)
+
+        choice_items = item.get("choices") if isinstance(item, dict) else None
+        if choice_items is None:
+            continue
+        if not isinstance(choice_items, list):
+            raise PollStructureError(f"choices вопроса {question_id} должен быть списком.")
+
+        existing = choices_by_question[question_id]
+        seen: set[int] = set()
+        for choice_position, choice_item in enumerate(choice_items, start=1):
+            if not isinstance(choice_item, dict):
+                raise PollStructureError(f"Некорректный вариант в вопросе {question_id}.")
+            texts = _choice_texts(choice_item)
+            if "id" not in choice_item:
+                if not texts.get("text"):
+                    raise PollStructureError(f"У нового варианта в вопросе {question_id} нет текста.")
+                new_choices.append(Choice(question=question, order=choice_position, **texts))
+                continue
+
+            choice = existing.get(_as_id(choice_item["id"]))
+            if choice is None or choice.id in seen:
+                raise PollStructureError(f"Вариант {choice_item['id']} не относится к вопросу {question_id}.")
+            seen.add(choice.id)
+            if texts.get("text") == "":
+                raise PollStructureError(f"Текст варианта {choice.id} не может быть пустым.")
+            updates = {"order": choice_position, **texts}
+            if any(getattr(choice, field) != value for field, value in updates.items()):
+                for field, value in updates.items():
+                    setattr(choice, field, value)
+                changed_choices.append(choice)
+
+        if seen != set(existing):
+            raise PollStructureError(f"choices вопроса {question_id} должен содержать все его варианты.")
+        limit = Question.choices_limit(question.type)
+        if question.type != Question.QuestionTypeChoices.OPEN and len(choice_items) > limit:
+            raise PollStructureError(f"В вопросе #{position} слишком много вариантов (для этого типа вопроса — до {limit}).")
+
+    if changed_questions:
+        Question.objects.bulk_update(changed_questions, ["order"])
+    if changed_choices:
+        Choice.objects.bulk_update(changed_choices, ["order", *CHOICE_TEXT_FIELDS])
+    if new_choices:
+        Choice.objects.bulk_create(new_choices)
+    if changed_questions or changed_choices or new_choices:
+        # bulk_* bypass the signals that bump the poll version
+        Poll.bump_version(poll.pk)
@@ -0,0 +1,70 @@
+from dataclasses import dataclass
+
+from django.core.cache import cache
+from django.db import transaction
+
+from apps.polls.models import Poll
+from apps.polls.models import PollCreationPayment
+from apps.users.models import TGUser
+
+# Cached eligibility is only for display (poll_list); poll_create re-checks it uncached
+ELIGIBILITY_CACHE_TTL = 300
+
+
+@dataclass(frozen=True)
+class PollCreateEligibility:
+    allowed: bool
+    reason: str | None = None
+    payment: PollCreationPayment | None = None
+
+
+def has_free_slot(tg_user: TGUser) -> bool:
+    return not Poll.objects.filter(created_by=tg_user).exists()
+
+
+def get_available_payment(tg_user: TGUser) -> PollCreationPayment | None:
+    return (
+        PollCreationPayment.objects.filter(
+            tg_user=tg_user,
+            status=PollCreationPayment.Status.APPROVED,
+            consumed_at__isnull=True,
+            consumed_poll__isnull=True,
+        )
+        .order_by("created_at")
+        .first()
+    )
+
+
+def can_create_poll(tg_user: TGUser) -> PollCreateEligibility:
+    if has_free_slot(tg_user):
+        return PollCreateEligibility(allowed=True)
+
+    payment = get_available_payment(tg_user)
+    if payment:
+        return PollCreateEligibility(allowed=True, payment=payment)
+
+    return PollCreateEligibility(
+        allowed=False,
+        reason="paywall",
+    )
+
+
+def get_eligibility_cache_key(tg_user_id: int) -> str:
+    return f"webapp:poll_eligibility:{tg_user_id}"
+
+
+def get_cached_eligibility(tg_user: TGUser) -> PollCreateEligibility:
+    key = get_eligibility_cache_key(tg_user.id)
+    eligibility = cache.get(key)
+    if eligibility is None:
+        eligibility = can_create_poll(tg_user)
+        cache.set(key, eligibility, ELIGIBILITY_CACHE_TTL)
+    return eligibility
+
+
+def invalidate_poll_eligibility(tg_user_id: int | None) -> None:
+    """Drops cached eligibility after the surrounding transaction commits."""
+    if tg_user_id is None:
+        return
+    key = get_eligibility_cache_key(tg_user_id)
+    transaction.on_commit(lambda: cache.delete(key))
@@ -0,0 +1,46 @@
+from django.core.cache import cache
+from django.http import HttpRequest
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.functional import SimpleLazyObject
+
+from apps.users.models import TGUser
+
+# Short TTL: TGUser fields shown in the webapp (name, balance) may change from the bot
+TG_USER_CACHE_TTL = 60
+SESSION_KEY = "tg_user_id"
+
+_MISSING = object()
+
+
+def get_tg_user_cache_key(tg_user_id: int) -> str:
+    return f"webapp:tg_user:{tg_user_id}"
+
+
+def get_tg_user(request: HttpRequest) -> TGUser | None:
+    """TGUser of the webapp session, memoized on the request and cached for TG_USER_CACHE_TTL."""
+    tg_user = getattr(request, "_cached_tg_user", _MISSING)
+    if tg_user is not _MISSING:
+        return tg_user
+
+    tg_user_id = request.session.get(SESSION_KEY)
+    tg_user = None
+    if tg_user_id:
+        key = get_tg_user_cache_key(tg_user_id)
+        tg_user = cache.get(key)
+        if tg_user is None:
+            tg_user = TGUser.objects.filter(id=tg_user_id).first()
+            if tg_user is not None:
+                cache.set(key, tg_user, TG_USER_CACHE_TTL)
+    request._cached_tg_user = tg_user
+    return tg_user
+
+
+def invalidate_tg_user(tg_user_id: int) -> None:
+    cache.delete(get_tg_user_cache_key(tg_user_id))
+
+
+class TGUserMiddleware(MiddlewareMixin):
+    """Sets lazy `request.tg_user` (None when the session has no Telegram login)."""
+
+    def process_request(self, request: HttpRequest):
+        request.tg_user = SimpleLazyObject(lambda: get_tg_user(request))
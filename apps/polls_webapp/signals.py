@@ -0,0 +1,18 @@
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from apps.polls.models import Poll
+from apps.polls.models import PollCreationPayment
+
+from .eligibility import invalidate_poll_eligibility
+
+
+@receiver([post_save, post_delete], sender=Poll, dispatch_uid="webapp_eligibility_poll")
+def poll_changed(sender, instance: Poll, **kwargs):
+    invalidate_poll_eligibility(instance.created_by_id)
+
+
+@receiver([post_save, post_delete], sender=PollCreationPayment, dispatch_uid="webapp_eligibility_payment")
+def payment_changed(sender, instance: PollCreationPayment, **kwargs):
+    invalidate_poll_eligibility(instance.tg_user_id)
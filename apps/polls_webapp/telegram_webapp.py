@@ -1,45 +1,136 @@
 import hashlib
 import hmac
-from urllib.parse import parse_qsl
+import json
+import threading
 import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from urllib.parse import parse_qsl
+
+# How many initData strings each process remembers (verified and rejected separately)
+VERIFY_CACHE_SIZE = 10000
 
 
 class TelegramInitDataError(Exception):
+    """initData is malformed."""
+
+
+class InitDataRejected(TelegramInitDataError):
+    """initData is well-formed but must not be trusted (signature or age)."""
+
+
+class InitDataSignatureError(InitDataRejected):
     pass
 
 
-def _build_data_check_string(init_data: str) -> tuple[str, str, dict[str, str]]:
-    pairs = parse_qsl(init_data, keep_blank_values=True)
-    data = dict(pairs)
-    received_hash = data.pop("hash", "")
-    if not received_hash:
-        raise TelegramInitDataError("initData missing hash")
+@dataclass(frozen=True)
+class InitData:
+    user: dict
+    auth_date: int
+    hash: str
+    fields: dict[str, str]
+
+
+class _BoundedCache:
+    """Thread-safe LRU of init_data string -> value."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value) -> None:
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+    def discard(self, key) -> None:
+        with self._lock:
+            self._items.pop(key, None)
+
+
+class InitDataVerifier:
+    """
+    Telegram WebApp initData verifier.
+
+    The secret key is derived from the bot token once. Telegram sends the same
+    initData for the whole Mini App session, so a valid, unexpired initData may be
+    presented many times (reload of /login, logout, lost session cookie). Each
+    process memoizes verified initData until it expires and remembers initData
+    with a bad signature, so repeats of either skip the HMAC. Both caches are keyed
+    by the full initData string: a forged copy of a valid hash never matches.
+    https://core.telegram.org/bots/webapps#validating-data-received-via-the-web-app
+    """
+
+    def __init__(self, bot_token: str, *, max_age_seconds: int = 86400, cache_size: int = VERIFY_CACHE_SIZE):
+        # secret_key = HMAC_SHA256(key="WebAppData", msg=bot_token)
+        self._secret_key = hmac.new(b"WebAppData", bot_token.encode("utf-8"), hashlib.sha256).digest()
+        self.max_age_seconds = max_age_seconds
+        self._verified = _BoundedCache(cache_size)
+        self._bad_signatures = _BoundedCache(cache_size)
+
+    def _parse(self, init_data: str) -> tuple[str, dict[str, str]]:
+        data = dict(parse_qsl(init_data, keep_blank_values=True))
+        received_hash = data.pop("hash", "")
+        if not received_hash:
+            raise TelegramInitDataError("initData missing hash")
+        return received_hash, data
+
+    def _check_age(self, auth_date: int, now: int) -> None:
+        if auth_date > now or now - auth_date > self.max_age_seconds:
+            raise InitDataRejected("initData expired")
 
-    data_check_string = "\n".join(f"{k}={v}" for k, v in sorted(data.items()))
-    return data_check_string, received_hash, data
+    def verify(self, init_data: str) -> InitData:
+        now = int(time.time())
+        cached = self._verified.get(init_data)
+        if cached is not None:
+            try:
+                self._check_age(cached.auth_date, now)
+            except InitDataRejected:
+                self._verified.discard(init_data)
+                raise
+            return cached
+        if self._bad_signatures.get(init_data):
+            raise InitDataSignatureError("invalid signature")
 
+        received_hash, data = self._parse(init_data)
+        data_check_string = "\n".join(f"{k}={v}" for k, v in sorted(data.items()))
+        calculated = hmac.new(self._secret_key, data_check_string.encode("utf-8"), hashlib.sha256).hexdigest()
+        if not hmac.compare_digest(calculated, received_hash):
+            self._bad_signatures.set(init_data, True)
+            raise InitDataSignatureError("invalid signature")
 
-def verify_init_data(init_data: str, bot_token: str, *, max_age_seconds: int = 86400) -> bool:
-    data_check_string, received_hash, data = _build_data_check_string(init_data)
+        try:
+            auth_date = int(data.get("auth_date") or "")
+        except ValueError:
+            raise InitDataRejected("invalid auth_date")
+        self._check_age(auth_date, now)
 
-    # Telegram WebApp validation uses a derived secret key:
-    # secret_key = HMAC_SHA256(key="WebAppData", msg=bot_token)
-    # https://core.telegram.org/bots/webapps#validating-data-received-via-the-web-app
-    secret_key = hmac.new(b"WebAppData", bot_token.encode("utf-8"), hashlib.sha256).digest()
-    calculated = hmac.new(secret_key, data_check_string.encode("utf-8"), hashlib.sha256).hexdigest()
-    if not hmac.compare_digest(calculated, received_hash):
-        return False
+        user_raw = data.get("user")
+        if not user_raw:
+            raise TelegramInitDataError("initData missing user")
+        try:
+            user = json.loads(user_raw)
+        except json.JSONDecodeError:
+            raise TelegramInitDataError("invalid user json")
+        if not isinstance(user, dict) or not user.get("id"):
+            raise TelegramInitDataError("user.id missing")
 
-    auth_date_raw = data.get("auth_date")
-    if not auth_date_raw:
-        return False
-    try:
-        auth_date = int(auth_date_raw)
-    except ValueError:
-        return False
+        verified = InitData(user=user, auth_date=auth_date, hash=received_hash, fields=data)
+        self._verified.set(init_data, verified)
+        return verified
 
-    now = int(time.time())
-    if auth_date > now:
-        return False
-    return (now - auth_date) <= max_age_seconds
 
+@lru_cache(maxsize=4)
+def get_init_data_verifier(bot_token: str) -> InitDataVerifier:
+    return InitDataVerifier(bot_token)
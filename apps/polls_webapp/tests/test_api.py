@@ -0,0 +1,106 @@
+from http import HTTPStatus
+
+import pytest
+from django.urls import reverse
+
+from apps.polls.tests.factories import ChoiceFactory
+from apps.polls.tests.factories import PollFactory
+from apps.polls.tests.factories import QuestionFactory
+from apps.users.models import TGUser
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def tg_user() -> TGUser:
+    return TGUser.objects.create(id=5001, fullname="Poll Owner")
+
+
+@pytest.fixture
+def api_client(client, tg_user):
+    session = client.session
+    session["tg_user_id"] = tg_user.id
+    session.save()
+    return client
+
+
+@pytest.fixture
+def poll(tg_user):
+    poll = PollFactory(created_by=tg_user)
+    question = QuestionFactory(poll=poll)
+    ChoiceFactory.create_batch(2, question=question)
+    return poll
+
+
+def poll_url(poll) -> str:
+    return reverse("api:poll-detail", kwargs={"uuid": poll.uuid})
+
+
+def test_retrieve_returns_tree_and_304_for_current_etag(api_client, poll):
+    response = api_client.get(poll_url(poll))
+
+    assert response.status_code == HTTPStatus.OK
+    assert len(response.json()["questions"][0]["choices"]) == 2
+
+    cached = api_client.get(poll_url(poll), HTTP_IF_NONE_MATCH=response["ETag"])
+    assert cached.status_code == HTTPStatus.NOT_MODIFIED
+
+
+def test_write_changes_etag(api_client, poll):
+    etag = api_client.get(poll_url(poll))["ETag"]
+    question = poll.questions.get()
+
+    response = api_client.patch(
+        reverse("api:poll-question-detail", kwargs={"pk": question.pk}),
+        {"text": "Edited"},
+        content_type="application/json",
+        HTTP_IF_MATCH=etag,
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert api_client.get(poll_url(poll), HTTP_IF_NONE_MATCH=etag).status_code == HTTPStatus.OK
+
+
+def test_second_write_with_the_same_etag_gets_412(api_client, poll):
+    etag = api_client.get(poll_url(poll))["ETag"]
+    url = reverse("api:poll-choice-list")
+    question = poll.questions.get()
+
+    first = api_client.post(url, {"question": question.pk, "text": "A"}, content_type="application/json", HTTP_IF_MATCH=etag)
+    second = api_client.post(url, {"question": question.pk, "text": "B"}, content_type="application/json", HTTP_IF_MATCH=etag)
+
+    assert first.status_code == HTTPStatus.CREATED
+    assert second.status_code == HTTPStatus.PRECONDITION_FAILED
+    assert question.choices.count() == 3
+
+
+def test_poll_update_keeps_version_increasing(api_client, poll):
+    etag = api_client.get(poll_url(poll))["ETag"]
+    version = poll.version
+
+    response = api_client.patch(poll_url(poll), {"name": "Renamed"}, content_type="application/json", HTTP_IF_MATCH=etag)
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()["version"] > version
+    assert response["ETag"] != etag
+
+
+def test_other_users_poll_is_not_found(client, poll):
+    other = TGUser.objects.create(id=5002, fullname="Other")
+    session = client.session
+    session["tg_user_id"] = other.id
+    session.save()
+
+    assert client.get(poll_url(poll)).status_code == HTTPStatus.NOT_FOUND
+
+
+def test_mixed_question_keeps_a_slot_for_the_other_option(api_client, tg_user):
+    question = QuestionFactory(poll=PollFactory(created_by=tg_user), type="mixed")
+    ChoiceFactory.create_batch(9, question=question)
+
+    response = api_client.post(
+        reverse("api:poll-choice-list"), {"question": question.pk, "text": "Tenth"}, content_type="application/json"
+    )
+
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert question.choices.count() == 9
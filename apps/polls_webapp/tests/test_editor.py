@@ -0,0 +1,78 @@
+import pytest
+
+from apps.polls.models import Question
+from apps.polls.tests.factories import ChoiceFactory
+from apps.polls.tests.factories import PollFactory
+from apps.polls.tests.factories import QuestionFactory
+from apps.polls_webapp.editor import PollStructureError
+from apps.polls_webapp.editor import apply_poll_structure
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def poll():
+    poll = PollFactory()
+    for order in (1, 2):
+        question = QuestionFactory(poll=poll, order=order)
+        ChoiceFactory(question=question, order=1)
+        ChoiceFactory(question=question, order=2)
+    return poll
+
+
+def current_version(poll) -> int:
+    poll.refresh_from_db(fields=["version"])
+    return poll.version
+
+
+def test_reorders_questions_and_choices(poll):
+    first, second = poll.questions.order_by("order")
+    choice_a, choice_b = first.choices.order_by("order")
+    version = current_version(poll)
+
+    apply_poll_structure(poll, {"questions": [
+        {"id": second.id},
+        {"id": first.id, "choices": [{"id": choice_b.id, "text": "Edited"}, {"id": choice_a.id}, {"text": "New"}]},
+    ]})
+
+    assert list(poll.questions.order_by("order").values_list("id", flat=True)) == [second.id, first.id]
+    assert list(first.choices.order_by("order").values_list("text", flat=True)) == ["Edited", choice_a.text, "New"]
+    assert current_version(poll) == version + 1
+
+
+def test_noop_payload_keeps_version(poll):
+    version = current_version(poll)
+
+    apply_poll_structure(poll, {"questions": [{"id": q.id} for q in poll.questions.order_by("order")]})
+
+    assert current_version(poll) == version
+
+
+def test_every_question_must_be_listed(poll):
+    question = poll.questions.order_by("order").first()
+
+    with pytest.raises(PollStructureError):
+        apply_poll_structure(poll, {"questions": [{"id": question.id}]})
+
+
+def test_choices_of_another_question_are_rejected(poll):
+    first, second = poll.questions.order_by("order")
+    foreign = second.choices.first()
+
+    with pytest.raises(PollStructureError):
+        apply_poll_structure(poll, {"questions": [
+            {"id": first.id, "choices": [{"id": foreign.id}, *({"id": c.id} for c in first.choices.all())]},
+            {"id": second.id},
+        ]})
+
+
+def test_choice_limit_follows_question_type(poll):
+    first, second = poll.questions.order_by("order")
+    Question.objects.filter(pk=first.pk).update(type=Question.QuestionTypeChoices.MIXED)
+    limit = Question.choices_limit(Question.QuestionTypeChoices.MIXED)
+    choices = [{"id": c.id} for c in first.choices.all()]
+    choices += [{"text": f"Extra {n}"} for n in range(limit - len(choices) + 1)]
+
+    with pytest.raises(PollStructureError):
+        apply_poll_structure(poll, {"questions": [{"id": first.id, "choices": choices}, {"id": second.id}]})
+    assert first.choices.count() == 2
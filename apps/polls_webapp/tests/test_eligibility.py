@@ -0,0 +1,71 @@
+import pytest
+from django.test import RequestFactory
+
+from apps.polls.models import PollCreationPayment
+from apps.polls.tests.factories import PollFactory
+from apps.polls_webapp.eligibility import get_cached_eligibility
+from apps.polls_webapp.middleware import SESSION_KEY
+from apps.polls_webapp.middleware import get_tg_user
+from apps.polls_webapp.middleware import invalidate_tg_user
+from apps.users.models import TGUser
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def locmem_cache(settings):
+    settings.CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+@pytest.fixture
+def tg_user() -> TGUser:
+    return TGUser.objects.create(id=9001, fullname="Creator")
+
+
+def session_request(rf: RequestFactory, tg_user_id):
+    request = rf.get("/webapp/")
+    request.session = {SESSION_KEY: tg_user_id}
+    return request
+
+
+def test_eligibility_is_cached_until_poll_is_created(tg_user, django_assert_num_queries, django_capture_on_commit_callbacks):
+    assert get_cached_eligibility(tg_user).allowed
+    with django_assert_num_queries(0):
+        assert get_cached_eligibility(tg_user).allowed
+
+    with django_capture_on_commit_callbacks(execute=True):
+        PollFactory(created_by=tg_user)
+
+    eligibility = get_cached_eligibility(tg_user)
+    assert not eligibility.allowed
+    assert eligibility.reason == "paywall"
+
+
+def test_approved_payment_invalidates_paywall(tg_user, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        PollFactory(created_by=tg_user)
+    assert not get_cached_eligibility(tg_user).allowed
+
+    with django_capture_on_commit_callbacks(execute=True):
+        payment = PollCreationPayment.objects.create(tg_user=tg_user, status=PollCreationPayment.Status.APPROVED)
+
+    assert get_cached_eligibility(tg_user).payment == payment
+
+
+def test_tg_user_is_memoized_per_request_and_cached(rf, tg_user, django_assert_num_queries):
+    request = session_request(rf, tg_user.id)
+    with django_assert_num_queries(1):
+        assert get_tg_user(request) == tg_user
+        assert get_tg_user(request) == tg_user
+
+    with django_assert_num_queries(0):
+        assert get_tg_user(session_request(rf, tg_user.id)) == tg_user
+
+    invalidate_tg_user(tg_user.id)
+    with django_assert_num_queries(1):
+        get_tg_user(session_request(rf, tg_user.id))
+
+
+def test_request_without_login_has_no_tg_user(rf, django_assert_num_queries):
+    with django_assert_num_queries(0):
+        assert get_tg_user(session_request(rf, None)) is None
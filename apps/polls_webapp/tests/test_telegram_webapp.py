@@ -0,0 +1,87 @@
+import hashlib
+import hmac
+import json
+import time
+from http import HTTPStatus
+from urllib.parse import urlencode
+
+import pytest
+from django.urls import reverse
+
+from apps.polls_webapp.telegram_webapp import InitDataRejected
+from apps.polls_webapp.telegram_webapp import InitDataSignatureError
+from apps.polls_webapp.telegram_webapp import InitDataVerifier
+from apps.users.models import TGUser
+
+BOT_TOKEN = "123456:TEST-TOKEN"
+
+
+def make_init_data(bot_token: str = BOT_TOKEN, *, user_id: int = 777, auth_date: int | None = None) -> str:
+    fields = {
+        "auth_date": str(auth_date or int(time.time())),
+        "query_id": "AAF-test",
+        "user": json.dumps({"id": user_id, "first_name": "Ali", "username": "ali"}),
+    }
+    secret_key = hmac.new(b"WebAppData", bot_token.encode(), hashlib.sha256).digest()
+    data_check_string = "\n".join(f"{k}={v}" for k, v in sorted(fields.items()))
+    fields["hash"] = hmac.new(secret_key, data_check_string.encode(), hashlib.sha256).hexdigest()
+    return urlencode(fields)
+
+
+def test_verify_accepts_the_same_init_data_twice():
+    verifier = InitDataVerifier(BOT_TOKEN)
+    init_data = make_init_data()
+
+    first = verifier.verify(init_data)
+    second = verifier.verify(init_data)
+
+    assert first.user["id"] == 777
+    assert second == first
+
+
+def test_verify_rejects_bad_signature_again_without_hmac(monkeypatch):
+    verifier = InitDataVerifier(BOT_TOKEN)
+    init_data = make_init_data("654321:OTHER-TOKEN")
+
+    with pytest.raises(InitDataSignatureError):
+        verifier.verify(init_data)
+
+    monkeypatch.setattr("apps.polls_webapp.telegram_webapp.hmac.new", None)
+    with pytest.raises(InitDataSignatureError):
+        verifier.verify(init_data)
+
+
+def test_verify_rejects_tampered_copy_of_valid_init_data():
+    verifier = InitDataVerifier(BOT_TOKEN)
+    init_data = make_init_data()
+    verifier.verify(init_data)
+
+    with pytest.raises(InitDataSignatureError):
+        verifier.verify(init_data.replace("query_id=AAF-test", "query_id=AAF-other"))
+
+
+def test_verify_rejects_cached_init_data_once_expired(monkeypatch):
+    verifier = InitDataVerifier(BOT_TOKEN, max_age_seconds=60)
+    now = int(time.time())
+    init_data = make_init_data(auth_date=now)
+    verifier.verify(init_data)
+
+    monkeypatch.setattr("apps.polls_webapp.telegram_webapp.time.time", lambda: now + 61)
+    with pytest.raises(InitDataRejected):
+        verifier.verify(init_data)
+
+
+@pytest.mark.django_db
+def test_telegram_auth_logs_in_twice_with_the_same_init_data(client, settings):
+    settings.BOT_TOKEN = BOT_TOKEN
+    init_data = make_init_data(user_id=778)
+    url = reverse("polls_webapp:telegram_auth")
+
+    first = client.post(url, {"initData": init_data})
+    client.get(reverse("polls_webapp:logout"))
+    second = client.post(url, {"initData": init_data})
+
+    assert first.status_code == HTTPStatus.FOUND
+    assert second.status_code == HTTPStatus.FOUND
+    assert client.session["tg_user_id"] == 778
+    assert TGUser.objects.filter(id=778).exists()
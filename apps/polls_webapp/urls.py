@@ -15,6 +15,8 @@ urlpatterns = [
     path("polls/", views.poll_list, name="poll_list"),
     path("polls/new/", views.poll_create, name="poll_create"),
     path("polls/<uuid:poll_uuid>/edit/", views.poll_edit, name="poll_edit"),
+    path("polls/<uuid:poll_uuid>/reorder/", views.poll_reorder, name="poll_reorder"),
+    path("polls/<uuid:poll_uuid>/import/", views.poll_import, name="poll_import"),
     path("polls/<uuid:poll_uuid>/preview/", views.poll_preview, name="poll_preview"),
     path("polls/<uuid:poll_uuid>/publish/", views.poll_publish, name="poll_publish"),
     path("polls/<uuid:poll_uuid>/analytics/", views.poll_analytics, name="poll_analytics"),
@@ -1,98 +1,78 @@
 import json
-from dataclasses import dataclass
-from urllib.parse import parse_qsl
 
 from django.conf import settings
 from django.db import transaction
-from django.db.models import Count
+from django.http import Http404
 from django.http import HttpRequest
 from django.http import HttpResponse
 from django.http import HttpResponseBadRequest
 from django.http import HttpResponseForbidden
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
 from django.shortcuts import redirect
 from django.shortcuts import render
 from django.utils import timezone
 
+from apps.polls.importer import PollImportError
+from apps.polls.importer import import_poll_questions
+from apps.polls.importer import parse_poll_file
 from apps.polls.models import Choice
 from apps.polls.models import ExportFile
+from apps.polls.models import POLL_MIN_CHOICES
 from apps.polls.models import Poll
 from apps.polls.models import PollCreationPayment
 from apps.polls.models import Question
-from apps.polls.models import Respondent
 from apps.users.models import TGUser
 
+from .analytics import poll_summary
 from .decorators import require_tg_user
+from .eligibility import can_create_poll
+from .eligibility import get_cached_eligibility
+from .eligibility import has_free_slot
+from .editor import PollStructureError
+from .editor import apply_poll_structure
+from .editor import load_poll_tree
+from .editor import poll_questions
 from .forms import ChoiceForm
 from .forms import PollForm
 from .forms import QuestionForm
+from .middleware import get_tg_user
+from .middleware import invalidate_tg_user
+from .telegram_webapp import InitDataRejected
+from .telegram_webapp import InitDataSignatureError
 from .telegram_webapp import TelegramInitDataError
-from .telegram_webapp import verify_init_data
+from .telegram_webapp import get_init_data_verifier
 
 from apps.polls.tasks import export_respondents_task
 
-@dataclass(frozen=True)
-class PollCreateEligibility:
-    allowed: bool
-    reason: str | None = None
-    payment: PollCreationPayment | None = None
-
-
 def _get_tg_user(request: HttpRequest) -> TGUser:
-    tg_user_id = request.session.get("tg_user_id")
-    return get_object_or_404(TGUser, id=tg_user_id)
-
-
-def _has_free_slot(tg_user: TGUser) -> bool:
-    return not Poll.objects.filter(created_by=tg_user).exists()
-
-
-def _get_available_payment(tg_user: TGUser) -> PollCreationPayment | None:
-    return (
-        PollCreationPayment.objects.filter(
-            tg_user=tg_user,
-            status=PollCreationPayment.Status.APPROVED,
-            consumed_at__isnull=True,
-            consumed_poll__isnull=True,
-        )
-        .order_by("created_at")
-        .first()
-    )
-
-
-def _can_create_poll(tg_user: TGUser) -> PollCreateEligibility:
-    if _has_free_slot(tg_user):
-        return PollCreateEligibility(allowed=True)
-
-    payment = _get_available_payment(tg_user)
-    if payment:
-        return PollCreateEligibility(allowed=True, payment=payment)
-
-    return PollCreateEligibility(
-        allowed=False,
-        reason="paywall",
-    )
+    tg_user = get_tg_user(request)
+    if tg_user is None:
+        raise Http404("TGUser not found")
+    return tg_user
 
 
 def _is_htmx(request: HttpRequest) -> bool:
     return request.headers.get("HX-Request") == "true"
 
 
-def _poll_validation_errors(poll: Poll) -> list[str]:
+def _poll_validation_errors(poll: Poll, questions: list[Question] | None = None) -> list[str]:
     errors: list[str] = []
-    questions = poll.questions.all().order_by("order", "id")
-    if not questions.exists():
+    if questions is None:
+        questions = list(poll_questions(poll))
+    if not questions:
         errors.append("Добавьте хотя бы один вопрос.")
         return errors
 
     for q in questions:
         if q.type == Question.QuestionTypeChoices.OPEN:
             continue
-        choices_count = q.choices.count()
-        if choices_count < 2:
-            errors.append(f"В вопросе #{q.order} должно быть минимум 2 варианта ответа.")
-        if choices_count > 10:
-            errors.append(f"В вопросе #{q.order} слишком много вариантов (Telegram поддерживает до 10).")
+        choices_count = q.choices_count
+        limit = Question.choices_limit(q.type)
+        if choices_count < POLL_MIN_CHOICES:
+            errors.append(f"В вопросе #{q.order} должно быть минимум {POLL_MIN_CHOICES} варианта ответа.")
+        if choices_count > limit:
+            errors.append(f"В вопросе #{q.order} слишком много вариантов (для этого типа вопроса — до {limit}).")
     return errors
 
 
@@ -119,30 +99,19 @@ def telegram_auth(request: HttpRequest) -> HttpResponse:
         return HttpResponseBadRequest("initData is required")
 
     try:
-        ok = verify_init_data(init_data, settings.BOT_TOKEN)
-    except TelegramInitDataError as e:
-        return HttpResponseBadRequest(str(e))
-
-    if not ok:
+        verified = get_init_data_verifier(settings.BOT_TOKEN).verify(init_data)
+    except InitDataSignatureError:
         return HttpResponseForbidden(
             "Invalid initData signature. "
             "Usually this means the server BOT_TOKEN does not match the bot that opened the WebApp."
         )
+    except InitDataRejected as e:
+        return HttpResponseForbidden(str(e))
+    except TelegramInitDataError as e:
+        return HttpResponseBadRequest(str(e))
 
-    # Extract user JSON from initData
-    # initData contains `user` as JSON string.
-    user_raw = dict(parse_qsl(init_data, keep_blank_values=True)).get("user")
-    if not user_raw:
-        return HttpResponseBadRequest("initData missing user")
-
-    try:
-        tg_payload = json.loads(user_raw)
-    except json.JSONDecodeError:
-        return HttpResponseBadRequest("invalid user json")
-
-    tg_id = tg_payload.get("id")
-    if not tg_id:
-        return HttpResponseBadRequest("user.id missing")
+    tg_payload = verified.user
+    tg_id = tg_payload["id"]
 
     username = tg_payload.get("username") or None
     first_name = tg_payload.get("first_name") or ""
@@ -158,6 +127,7 @@ def telegram_auth(request: HttpRequest) -> HttpResponse:
         },
     )
 
+    invalidate_tg_user(tg_user.id)
     request.session["tg_user_id"] = tg_user.id
     request.session.modified = True
 
@@ -200,7 +170,7 @@ def billing(request: HttpRequest) -> HttpResponse:
 def poll_list(request: HttpRequest) -> HttpResponse:
     tg_user = _get_tg_user(request)
     polls = Poll.objects.filter(created_by=tg_user).order_by("-id")
-    eligibility = _can_create_poll(tg_user)
+    eligibility = get_cached_eligibility(tg_user)
     return render(
         request,
         "polls_webapp/poll_list.html",
@@ -216,7 +186,8 @@ def poll_list(request: HttpRequest) -> HttpResponse:
 @transaction.atomic
 def poll_create(request: HttpRequest) -> HttpResponse:
     tg_user = _get_tg_user(request)
-    eligibility = _can_create_poll(tg_user)
+    # Uncached: the payment below is consumed, a stale cache entry could point at a used one
+    eligibility = can_create_poll(tg_user)
     if not eligibility.allowed:
         return redirect("polls_webapp:billing")
 
@@ -228,7 +199,7 @@ def poll_create(request: HttpRequest) -> HttpResponse:
             poll.save()
 
             # consume credit if this is not the first poll
-            if not _has_free_slot(tg_user) and eligibility.payment:
+            if not has_free_slot(tg_user) and eligibility.payment:
                 eligibility.payment.consumed_poll = poll
                 eligibility.payment.consumed_at = timezone.now()
                 eligibility.payment.save(update_fields=["consumed_poll", "consumed_at", "updated_at"])
@@ -259,7 +230,7 @@ def poll_edit(request: HttpRequest, poll_uuid) -> HttpResponse:
     else:
         form = PollForm(instance=poll)
 
-    questions = poll.questions.all().order_by("order", "id")
+    questions = load_poll_tree(poll)
     return render(
         request,
         "polls_webapp/poll_edit.html",
@@ -268,11 +239,32 @@ def poll_edit(request: HttpRequest, poll_uuid) -> HttpResponse:
             "poll": poll,
             "form": form,
             "questions": questions,
-            "question_form": QuestionForm(initial={"order": questions.count() + 1}),
+            "question_form": QuestionForm(initial={"order": len(questions) + 1}),
         },
     )
 
 
+@require_tg_user
+@transaction.atomic
+def poll_reorder(request: HttpRequest, poll_uuid) -> HttpResponse:
+    poll = _get_owned_poll(request, poll_uuid)
+    if request.method != "POST":
+        return HttpResponseBadRequest("POST required")
+
+    try:
+        payload = json.loads(request.body or b"{}")
+        apply_poll_structure(poll, payload)
+    except json.JSONDecodeError:
+        return HttpResponseBadRequest("invalid json")
+    except PollStructureError as e:
+        return JsonResponse({"ok": False, "error": str(e)}, status=400)
+
+    questions = load_poll_tree(poll)
+    if _is_htmx(request):
+        return render(request, "polls_webapp/partials/question_list.html", {"poll": poll, "questions": questions})
+    return JsonResponse({"ok": True, "errors": _poll_validation_errors(poll, questions)})
+
+
 @require_tg_user
 @transaction.atomic
 def question_create(request: HttpRequest, poll_uuid) -> HttpResponse:
@@ -299,6 +291,34 @@ def question_create(request: HttpRequest, poll_uuid) -> HttpResponse:
     return render(request, "polls_webapp/partials/question_list.html", {"poll": poll, "questions": questions})
 
 
+@require_tg_user
+def poll_import(request: HttpRequest, poll_uuid) -> HttpResponse:
+    poll = _get_owned_poll(request, poll_uuid)
+    if request.method != "POST":
+        return HttpResponseBadRequest("POST required")
+
+    uploaded = request.FILES.get("file")
+    errors: list[str] = []
+    created: list[Question] = []
+    if not uploaded:
+        errors.append("Выберите файл.")
+    else:
+        try:
+            created = import_poll_questions(poll, parse_poll_file(uploaded))
+        except PollImportError as e:
+            errors = e.errors
+
+    if not _is_htmx(request):
+        if errors:
+            return HttpResponseBadRequest("\n".join(errors))
+        return redirect("polls_webapp:poll_edit", poll_uuid=poll.uuid)
+
+    context = {"poll": poll, "errors": errors, "created_count": len(created)}
+    if created:
+        context["questions"] = poll_questions(poll)
+    return render(request, "polls_webapp/partials/poll_import_result.html", context)
+
+
 @require_tg_user
 @transaction.atomic
 def question_edit(request: HttpRequest, poll_uuid, question_id: int) -> HttpResponse:
@@ -313,7 +333,7 @@ def question_edit(request: HttpRequest, poll_uuid, question_id: int) -> HttpResp
     else:
         form = QuestionForm(instance=question)
 
-    choices = question.choices.all().order_by("order", "id")
+    choices = list(question.choices.all().order_by("order", "id"))
     return render(
         request,
         "polls_webapp/question_edit.html",
@@ -322,7 +342,7 @@ def question_edit(request: HttpRequest, poll_uuid, question_id: int) -> HttpResp
             "question": question,
             "form": form,
             "choices": choices,
-            "choice_form": ChoiceForm(initial={"order": choices.count() + 1}),
+            "choice_form": ChoiceForm(initial={"order": len(choices) + 1}),
         },
     )
 
@@ -361,6 +381,7 @@ def choice_delete(request: HttpRequest, poll_uuid, question_id: int, choice_id:
     if request.method != "POST":
         return HttpResponseBadRequest("POST required")
     choice.delete()
+    Poll.bump_version(poll.pk)
 
     choices = question.choices.all().order_by("order", "id")
     return render(request, "polls_webapp/partials/choice_list.html", {"poll": poll, "question": question, "choices": choices})
@@ -391,24 +412,9 @@ def poll_publish(request: HttpRequest, poll_uuid) -> HttpResponse:
 @require_tg_user
 def poll_analytics(request: HttpRequest, poll_uuid) -> HttpResponse:
     poll = _get_owned_poll(request, poll_uuid)
-    respondents = Respondent.objects.filter(poll=poll)
-    started_count = respondents.count()
-    completed_count = respondents.filter(finished_at__isnull=False).count()
-    completion_rate = (completed_count / started_count * 100) if started_count else 0
-
-    questions = poll.questions.all().order_by("order", "id")
-    choice_counts_by_question: dict[int, list[dict]] = {}
-    for q in questions:
-        if q.type == Question.QuestionTypeChoices.OPEN:
-            continue
-        counts = (
-            Choice.objects.filter(question=q)
-            .annotate(selected_count=Count("answer", distinct=True))
-            .values("id", "text", "selected_count")
-            .order_by("order", "id")
-        )
-        choice_counts_by_question[q.id] = list(counts)
-
+    # Агрегаты читаются с реплики; список экспортов — с основной БД,
+    # чтобы только что запущенный экспорт сразу был виден
+    summary = poll_summary(poll)
     exports = ExportFile.objects.filter(poll=poll).order_by("-created_at")[:5]
 
     return render(
@@ -416,11 +422,11 @@ def poll_analytics(request: HttpRequest, poll_uuid) -> HttpResponse:
         "polls_webapp/poll_analytics.html",
         {
             "poll": poll,
-            "started_count": started_count,
-            "completed_count": completed_count,
-            "completion_rate": round(completion_rate, 1),
-            "questions": questions,
-            "choice_counts_by_question": choice_counts_by_question,
+            "started_count": summary.started_count,
+            "completed_count": summary.completed_count,
+            "completion_rate": summary.completion_rate,
+            "questions": summary.questions,
+            "choice_counts_by_question": summary.choice_counts_by_question,
             "exports": exports,
         },
     )
@@ -440,5 +446,6 @@ def poll_export_start(request: HttpRequest, poll_uuid) -> HttpResponse:
         filename="respondents.xlsx",
         status="pending",
     )
-    export_respondents_task.delay(export_file.id)
+    # Экспорт одного опроса для автора ждут в интерфейсе — не ставим его за админскими выгрузками
+    export_respondents_task.apply_async(args=[export_file.id], queue="interactive")
     return redirect("polls_webapp:poll_analytics", poll_uuid=poll.uuid)
@@ -1,8 +1,10 @@
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth import admin as auth_admin
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
 
+from . import ledger
 from .forms import UserAdminChangeForm
 from .forms import UserAdminCreationForm
 from .models import User, TGUser, WithdrawalRequest, TransactionHistory
@@ -110,54 +112,42 @@ class WithdrawalRequestAdmin(admin.ModelAdmin):
         self.message_user(request, f'Одобрено {updated} запросов на вывод.')
     approve_withdrawal.short_description = "Одобрить запросы"
     
+    def _process_withdrawals(self, request, queryset, action):
+        """Выполняет массовое действие сразу или, для больших выборок, в Celery"""
+        from .tasks import process_withdrawals_task
+        
+        ids = list(queryset.values_list('id', flat=True))
+        threshold = getattr(settings, 'WITHDRAWAL_BULK_ASYNC_THRESHOLD', 200)
+        if len(ids) > threshold:
+            task = process_withdrawals_task.delay(action, ids, request.user.id)
+            self.message_user(
+                request,
+                f'Обработка {len(ids)} запросов запущена в фоне. Задача ID: {task.id}'
+            )
+            return None
+        
+        if action == 'reject':
+            return ledger.bulk_reject_withdrawals(ids, request.user.id)
+        return ledger.bulk_complete_withdrawals(ids, request.user.id)
+    
     def reject_withdrawal(self, request, queryset):
         """Отклонить запросы на вывод"""
         queryset = queryset.filter(status__in=['pending', 'approved'])
         
-        # Возвращаем деньги на баланс для отклоненных запросов
-        for withdrawal in queryset:
-            user = withdrawal.user
-            user.balance += withdrawal.amount
-            user.save()
-            
-            # Создаем транзакцию возврата
-            TransactionHistory.objects.create(
-                user=user,
-                transaction_type='refund',
-                amount=withdrawal.amount,
-                description=f'Возврат отклоненного запроса на вывод #{withdrawal.id}',
-                withdrawal_request=withdrawal
-            )
-        
-        updated = queryset.update(
-            status='rejected',
-            processed_by=request.user,
-            processed_at=timezone.now()
-        )
-        self.message_user(request, f'Отклонено {updated} запросов. Средства возвращены на баланс пользователей.')
+        # Возвращаем деньги на баланс одним сгруппированным UPDATE
+        updated = self._process_withdrawals(request, queryset, 'reject')
+        if updated is not None:
+            self.message_user(request, f'Отклонено {updated} запросов. Средства возвращены на баланс пользователей.')
     reject_withdrawal.short_description = "Отклонить запросы"
     
     def complete_withdrawal(self, request, queryset):
         """Завершить выполнение запросов на вывод"""
         queryset = queryset.filter(status='approved')
         
-        # Списываем деньги и создаем транзакции
-        for withdrawal in queryset:
-            # Создаем транзакцию вывода
-            TransactionHistory.objects.create(
-                user=withdrawal.user,
-                transaction_type='withdrawal',
-                amount=-withdrawal.amount,  # отрицательная сумма для вывода
-                description=f'Вывод средств #{withdrawal.id}',
-                withdrawal_request=withdrawal
-            )
-        
-        updated = queryset.update(
-            status='completed',
-            processed_by=request.user,
-            processed_at=timezone.now()
-        )
-        self.message_user(request, f'Завершено {updated} выводов средств.')
+        # Создаем транзакции вывода через bulk_create
+        updated = self._process_withdrawals(request, queryset, 'complete')
+        if updated is not None:
+            self.message_user(request, f'Завершено {updated} выводов средств.')
     complete_withdrawal.short_description = "Завершить вывод"
 
 
@@ -0,0 +1,161 @@
+"""
+Атомарные операции с балансом пользователя.
+
+Баланс меняется одним `UPDATE ... SET balance = balance + %s ... RETURNING`
+вместе с записью в TransactionHistory в одной транзакции, поэтому
+корректность не зависит от устаревшего экземпляра TGUser и блокировок строки.
+"""
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import TGUser, TransactionHistory, WithdrawalRequest
+
+
+class InsufficientBalanceError(Exception):
+    """Недостаточно средств для списания"""
+
+
+def _update_balance(user_id: int, amount: Decimal, *, allow_negative: bool = True) -> Decimal:
+    """Меняет баланс на amount и возвращает новое значение"""
+    table = connection.ops.quote_name(TGUser._meta.db_table)
+    sql = f"UPDATE {table} SET balance = balance + %s WHERE id = %s"
+    params = [amount, user_id]
+    if not allow_negative:
+        sql += " AND balance + %s >= 0"
+        params.append(amount)
+    sql += " RETURNING balance"
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+
+    if row is None:
+        if not allow_negative and TGUser.objects.filter(id=user_id).exists():
+            raise InsufficientBalanceError(f"User {user_id} has insufficient balance for {amount}")
+        raise TGUser.DoesNotExist(f"TGUser {user_id} not found")
+    return row[0]
+
+
+@transaction.atomic
+def apply_balance_change(
+    user_id: int,
+    amount: Decimal,
+    transaction_type: str,
+    description: str = "",
+    *,
+    related_poll=None,
+    withdrawal_request: WithdrawalRequest | None = None,
+    allow_negative: bool = True,
+) -> Decimal:
+    """Меняет баланс и пишет соответствующую транзакцию. Возвращает новый баланс"""
+    new_balance = _update_balance(user_id, Decimal(amount), allow_negative=allow_negative)
+    TransactionHistory.objects.create(
+        user_id=user_id,
+        transaction_type=transaction_type,
+        amount=amount,
+        description=description,
+        related_poll=related_poll,
+        withdrawal_request=withdrawal_request,
+    )
+    return new_balance
+
+
+def credit_poll_reward(user_id: int, poll) -> Decimal:
+    """Начисляет вознаграждение за прохождение опроса"""
+    return apply_balance_change(
+        user_id,
+        poll.reward,
+        "earned",
+        f'Вознаграждение за прохождение опроса "{poll.name}"',
+        related_poll=poll,
+    )
+
+
+@transaction.atomic
+def reserve_withdrawal(user_id: int, amount: Decimal, payment_details: str) -> WithdrawalRequest:
+    """
+    Создает запрос на вывод и резервирует сумму на балансе.
+    Бросает InsufficientBalanceError, если средств уже не хватает.
+    """
+    _update_balance(user_id, -Decimal(amount), allow_negative=False)
+    return WithdrawalRequest.objects.create(
+        user_id=user_id,
+        amount=amount,
+        payment_details=payment_details,
+        status="pending",
+    )
+
+
+def _claim_withdrawals(withdrawal_ids, from_statuses, to_status, processed_by_id) -> list[tuple]:
+    """
+    Переводит запросы в новый статус одним UPDATE и возвращает (id, user_id, amount)
+    только тех строк, которые действительно сменили статус.
+    """
+    table = connection.ops.quote_name(WithdrawalRequest._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {table} SET status = %s, processed_by_id = %s, processed_at = %s "
+            f"WHERE id = ANY(%s) AND status = ANY(%s) "
+            f"RETURNING id, user_id, amount",
+            [to_status, processed_by_id, timezone.now(), list(withdrawal_ids), list(from_statuses)],
+        )
+        return cursor.fetchall()
+
+
+@transaction.atomic
+def bulk_reject_withdrawals(withdrawal_ids, processed_by_id: int | None = None) -> int:
+    """
+    Отклоняет запросы на вывод и возвращает средства.
+    Транзакции создаются через bulk_create, балансы меняются одним сгруппированным UPDATE.
+    Повторный вызов не вернет деньги дважды: учитываются только строки, сменившие статус.
+    """
+    rows = _claim_withdrawals(withdrawal_ids, ["pending", "approved"], "rejected", processed_by_id)
+    if not rows:
+        return 0
+
+    TransactionHistory.objects.bulk_create([
+        TransactionHistory(
+            user_id=user_id,
+            transaction_type="refund",
+            amount=amount,
+            description=f"Возврат отклоненного запроса на вывод #{withdrawal_id}",
+            withdrawal_request_id=withdrawal_id,
+        )
+        for withdrawal_id, user_id, amount in rows
+    ])
+
+    users_table = connection.ops.quote_name(TGUser._meta.db_table)
+    withdrawals_table = connection.ops.quote_name(WithdrawalRequest._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {users_table} AS u SET balance = u.balance + w.total "
+            f"FROM (SELECT user_id, SUM(amount) AS total FROM {withdrawals_table} "
+            f"WHERE id = ANY(%s) GROUP BY user_id) AS w "
+            f"WHERE u.id = w.user_id",
+            [[withdrawal_id for withdrawal_id, _user_id, _amount in rows]],
+        )
+    return len(rows)
+
+
+@transaction.atomic
+def bulk_complete_withdrawals(withdrawal_ids, processed_by_id: int | None = None) -> int:
+    """Завершает одобренные запросы и пишет транзакции вывода (сумма уже зарезервирована)"""
+    rows = _claim_withdrawals(withdrawal_ids, ["approved"], "completed", processed_by_id)
+    TransactionHistory.objects.bulk_create([
+        TransactionHistory(
+            user_id=user_id,
+            transaction_type="withdrawal",
+            amount=-amount,  # отрицательная сумма для вывода
+            description=f"Вывод средств #{withdrawal_id}",
+            withdrawal_request_id=withdrawal_id,
+        )
+        for withdrawal_id, user_id, amount in rows
+    ])
+    return len(rows)
+
+
+acredit_poll_reward = sync_to_async(credit_poll_reward)
+areserve_withdrawal = sync_to_async(reserve_withdrawal)
@@ -0,0 +1,16 @@
+# Generated manually
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0012_add_balance_and_language_features'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='withdrawalrequest',
+            index=models.Index(fields=['user', '-created_at'], name='withdrawal_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated manually
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0013_withdrawal_user_created_idx'),
+    ]
+
+    operations = [
+        # Сначала без auto_now_add, чтобы у существующих пользователей осталась пустая дата,
+        # а не время миграции (иначе все они будут считаться новыми аккаунтами)
+        migrations.AddField(
+            model_name='tguser',
+            name='created_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Дата регистрации'),
+        ),
+        migrations.AlterField(
+            model_name='tguser',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, blank=True, null=True, verbose_name='Дата регистрации'),
+        ),
+    ]
@@ -3,7 +3,7 @@ from django.db.models import (
     CharField, Model, BigIntegerField,
     BooleanField, ForeignKey, FloatField,
     CASCADE, DateTimeField, TextField,
-    DecimalField, PROTECT
+    DecimalField, PROTECT, Index
 )
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
@@ -55,6 +55,7 @@ class TGUser(Model):
     is_active = BooleanField(verbose_name=_("Активен?"), default=True)
     last_activity = DateTimeField(verbose_name=_("Последняя активность"), auto_now=True, null=True, blank=True)
     blocked_bot = BooleanField(verbose_name=_("Заблокировал бота?"), default=False)
+    created_at = DateTimeField(verbose_name=_("Дата регистрации"), auto_now_add=True, null=True, blank=True)
     
     # Языковые настройки
     lang = CharField(
@@ -139,6 +140,9 @@ class WithdrawalRequest(Model):
         verbose_name = _("Запрос на вывод")
         verbose_name_plural = _("Запросы на вывод")
         ordering = ['-created_at']
+        indexes = [
+            Index(fields=['user', '-created_at'], name='withdrawal_user_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.fullname} - {self.amount} - {self.get_status_display()}"
@@ -1,5 +1,6 @@
 from celery import shared_task
 
+from . import ledger
 from .models import User
 
 
@@ -7,3 +8,21 @@ from .models import User
 def get_users_count():
     """A pointless Celery task to demonstrate usage."""
     return User.objects.count()
+
+
+@shared_task(bind=True)
+def process_withdrawals_task(self, action, withdrawal_ids, processed_by_id=None, batch_size=200):
+    """
+    Массово отклоняет или завершает запросы на вывод пачками.
+    Прогресс публикуется в состоянии задачи (PROGRESS: processed/total).
+    """
+    handler = ledger.bulk_reject_withdrawals if action == "reject" else ledger.bulk_complete_withdrawals
+    total = len(withdrawal_ids)
+    processed = 0
+    updated = 0
+    for start in range(0, total, batch_size):
+        batch = withdrawal_ids[start:start + batch_size]
+        updated += handler(batch, processed_by_id)
+        processed += len(batch)
+        self.update_state(state="PROGRESS", meta={"processed": processed, "total": total, "updated": updated})
+    return {"status": "success", "action": action, "total": total, "updated": updated}
@@ -0,0 +1,69 @@
+from decimal import Decimal
+
+import pytest
+
+from apps.users.ledger import InsufficientBalanceError
+from apps.users.ledger import apply_balance_change
+from apps.users.ledger import bulk_complete_withdrawals
+from apps.users.ledger import bulk_reject_withdrawals
+from apps.users.ledger import reserve_withdrawal
+from apps.users.models import TGUser
+from apps.users.models import TransactionHistory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def tg_user() -> TGUser:
+    return TGUser.objects.create(id=1001, fullname="Test User", balance=Decimal("20000.00"))
+
+
+def test_apply_balance_change_returns_new_balance(tg_user):
+    new_balance = apply_balance_change(tg_user.id, Decimal("500.00"), "bonus", "test")
+
+    assert new_balance == Decimal("20500.00")
+    tg_user.refresh_from_db()
+    assert tg_user.balance == Decimal("20500.00")
+    assert TransactionHistory.objects.filter(user=tg_user, transaction_type="bonus").count() == 1
+
+
+def test_reserve_withdrawal_rejects_overdraft(tg_user):
+    with pytest.raises(InsufficientBalanceError):
+        reserve_withdrawal(tg_user.id, Decimal("30000.00"), "8600 0000 0000 0000")
+
+    tg_user.refresh_from_db()
+    assert tg_user.balance == Decimal("20000.00")
+    assert not tg_user.withdrawal_requests.exists()
+
+
+def test_bulk_reject_refunds_once(tg_user):
+    withdrawal = reserve_withdrawal(tg_user.id, Decimal("15000.00"), "8600 0000 0000 0000")
+
+    assert bulk_reject_withdrawals([withdrawal.id]) == 1
+    assert bulk_reject_withdrawals([withdrawal.id]) == 0
+
+    tg_user.refresh_from_db()
+    assert tg_user.balance == Decimal("20000.00")
+    assert TransactionHistory.objects.filter(withdrawal_request=withdrawal, transaction_type="refund").count() == 1
+
+
+def test_bulk_reject_groups_refunds_per_user(tg_user):
+    first = reserve_withdrawal(tg_user.id, Decimal("10000.00"), "card")
+    second = reserve_withdrawal(tg_user.id, Decimal("10000.00"), "card")
+
+    assert bulk_reject_withdrawals([first.id, second.id]) == 2
+
+    tg_user.refresh_from_db()
+    assert tg_user.balance == Decimal("20000.00")
+    assert TransactionHistory.objects.filter(user=tg_user, transaction_type="refund").count() == 2
+
+
+def test_bulk_complete_only_touches_approved(tg_user):
+    withdrawal = reserve_withdrawal(tg_user.id, Decimal("10000.00"), "card")
+
+    assert bulk_complete_withdrawals([withdrawal.id]) == 0
+
+    withdrawal.status = "approved"
+    withdrawal.save()
+    assert bulk_complete_withdrawals([withdrawal.id]) == 1
+    assert TransactionHistory.objects.get(withdrawal_request=withdrawal).amount == Decimal("-10000.00")
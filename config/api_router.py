@@ -2,11 +2,17 @@ from django.conf import settings
 from rest_framework.routers import DefaultRouter
 from rest_framework.routers import SimpleRouter
 
+from apps.polls_webapp.api.views import ChoiceViewSet
+from apps.polls_webapp.api.views import PollViewSet
+from apps.polls_webapp.api.views import QuestionViewSet
 from apps.users.api.views import UserViewSet
 
 router = DefaultRouter() if settings.DEBUG else SimpleRouter()
 
 router.register("users", UserViewSet)
+router.register("polls", PollViewSet, basename="poll")
+router.register("poll-questions", QuestionViewSet, basename="poll-question")
+router.register("poll-choices", ChoiceViewSet, basename="poll-choice")
 
 
 app_name = "api"
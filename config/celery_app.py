@@ -1,6 +1,8 @@
 import os
 
 from celery import Celery
+from celery import signals
+from kombu import Queue
 
 # set the default Django settings module for the 'celery' program.
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings.local")
@@ -13,5 +15,61 @@ app = Celery("apps")
 #   should have a `CELERY_` prefix.
 app.config_from_object("django.conf:settings", namespace="CELERY")
 
+# Queues: short interactive tasks must not wait behind long exports or mass sends.
+# Each queue is consumed by its own worker pool (see compose/production/django/celery/worker/start).
+QUEUE_INTERACTIVE = "interactive"
+QUEUE_BULK_SEND = "bulk_send"
+QUEUE_EXPORT = "export"
+
+app.conf.task_queues = (
+    Queue(QUEUE_INTERACTIVE),
+    Queue(QUEUE_BULK_SEND),
+    Queue(QUEUE_EXPORT),
+)
+# Everything not routed explicitly (test sends, withdrawals, beat housekeeping) is interactive
+app.conf.task_default_queue = QUEUE_INTERACTIVE
+app.conf.task_routes = {
+    "apps.polls.tasks.start_broadcast_task": {"queue": QUEUE_BULK_SEND},
+    "apps.polls.tasks.send_broadcast_chunk_task": {"queue": QUEUE_BULK_SEND},
+    "apps.polls.tasks.start_notification_campaign_task": {"queue": QUEUE_BULK_SEND},
+    "apps.polls.tasks.send_notifications_chunk_task": {"queue": QUEUE_BULK_SEND},
+    "apps.polls.tasks.send_update_notification_task": {"queue": QUEUE_BULK_SEND},
+    "apps.polls.tasks.refill_captcha_image_pool_task": {"queue": QUEUE_BULK_SEND},
+    "apps.polls.tasks.export_respondents_task": {"queue": QUEUE_EXPORT},
+    "apps.polls.tasks.export_respondents_chunked_task": {"queue": QUEUE_EXPORT},
+    "apps.polls.tasks.export_chunk_task": {"queue": QUEUE_EXPORT},
+    "apps.polls.tasks.check_export_completion": {"queue": QUEUE_EXPORT},
+    "apps.polls.tasks.cleanup_old_exports": {"queue": QUEUE_EXPORT},
+}
+
 # Load task modules from all registered Django app configs.
 app.autodiscover_tasks()
+
+
+# Metrics: task duration and DB time per task, exporter in the worker main process
+@signals.worker_ready.connect
+def start_metrics_exporter(**kwargs):
+    from config import metrics
+
+    metrics.start_metrics_server()
+
+
+@signals.task_prerun.connect
+def start_task_metrics(**kwargs):
+    from config import metrics
+
+    metrics.task_started()
+
+
+@signals.task_postrun.connect
+def finish_task_metrics(task=None, state=None, **kwargs):
+    from config import metrics
+
+    metrics.task_finished(task.name if task else "unknown", state)
+
+
+@signals.worker_process_shutdown.connect
+def cleanup_task_metrics(pid=None, **kwargs):
+    from config import metrics
+
+    metrics.mark_process_dead(pid or os.getpid())
@@ -0,0 +1,101 @@
+"""
+Чтение с реплики для тяжелых отчетных запросов.
+
+По умолчанию все запросы идут в основную БД. Чтение уходит на реплику только
+внутри явно помеченного участка кода:
+
+    with use_replica():
+        ...
+
+или для запросов с явным .using(read_alias(...)). Если алиас replica не задан
+(нет DATABASE_REPLICA_URL), недоступен или отстает больше DATABASE_REPLICA_MAX_LAG
+секунд, чтение молча возвращается в основную БД. Отставание проверяется не чаще
+раза в DATABASE_REPLICA_CHECK_INTERVAL секунд на процесс.
+"""
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+REPLICA_ALIAS = "replica"
+
+# Отставание реплики в секундах; 0, если все полученные WAL уже применены
+# или алиас указывает не на реплику (pg_is_in_recovery() = false)
+REPLICA_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+_replica_reads: ContextVar[bool] = ContextVar("replica_reads", default=False)
+_replica_state = {"checked_at": None, "fresh": False}
+
+
+@contextmanager
+def use_replica():
+    """Помечает участок кода как только читающий: ORM-чтения уходят на реплику"""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def is_replica_fresh() -> bool:
+    """Реплика настроена, доступна и отстает не больше DATABASE_REPLICA_MAX_LAG"""
+    if REPLICA_ALIAS not in settings.DATABASES:
+        return False
+    now = time.monotonic()
+    checked_at = _replica_state["checked_at"]
+    if checked_at is not None and now - checked_at < settings.DATABASE_REPLICA_CHECK_INTERVAL:
+        return _replica_state["fresh"]
+
+    try:
+        with connections[REPLICA_ALIAS].cursor() as cursor:
+            cursor.execute(REPLICA_LAG_SQL)
+            lag = float(cursor.fetchone()[0])
+    except DatabaseError:
+        logger.warning("Replica is unavailable, reading from primary", exc_info=True)
+        fresh = False
+    else:
+        fresh = lag <= settings.DATABASE_REPLICA_MAX_LAG
+        if not fresh:
+            logger.warning("Replica lags behind, reading from primary", extra={"lag_seconds": round(lag, 1)})
+    _replica_state.update(checked_at=now, fresh=fresh)
+    return fresh
+
+
+def read_alias(fallback: str = DEFAULT_DB_ALIAS) -> str:
+    """Алиас для явного .using(): реплика, если она в порядке, иначе fallback"""
+    return REPLICA_ALIAS if is_replica_fresh() else fallback
+
+
+class PrimaryReplicaRouter:
+    """
+    Запись — всегда в основную БД (в том числе объектов, прочитанных с реплики),
+    чтение — на реплику только внутри use_replica().
+    """
+
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get() and is_replica_fresh():
+            return REPLICA_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Все алиасы смотрят на одни и те же данные
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == REPLICA_ALIAS:
+            return False
+        return None
@@ -0,0 +1,121 @@
+"""
+Структурированное логирование.
+
+- JsonFormatter: одна JSON-строка на запись, поля из extra попадают в вывод;
+- SampledFilter: DEBUG/INFO пишутся с вероятностью LOG_SAMPLE_RATE и не чаще
+  LOG_RATE_LIMIT раз в секунду на шаблон сообщения; WARNING и выше проходят всегда;
+- setup_queue_logging(): для процесса бота — все обработчики корневого и
+  настроенных логгеров (в том числе "apps" с propagate=False) пишут через
+  QueueHandler в один фоновый поток и не блокируют event loop.
+"""
+import atexit
+import json
+import logging
+import queue
+import random
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+# Атрибуты LogRecord, которые не являются пользовательскими полями extra
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class SampledFilter(logging.Filter):
+    """Сэмплирование и ограничение частоты для DEBUG/INFO"""
+
+    def __init__(self, sample_rate: float = 1.0, rate_limit: int = 0):
+        super().__init__()
+        self.sample_rate = sample_rate
+        self.rate_limit = rate_limit
+        self._lock = threading.Lock()
+        self._window = 0
+        self._counts: dict = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return False
+        if not self.rate_limit:
+            return True
+        window = int(time.monotonic())
+        key = (record.name, record.msg)
+        with self._lock:
+            if window != self._window:
+                self._window = window
+                self._counts.clear()
+            self._counts[key] = self._counts.get(key, 0) + 1
+            return self._counts[key] <= self.rate_limit
+
+
+class _TargetQueueHandler(QueueHandler):
+    """QueueHandler, который помнит исходный обработчик записи"""
+
+    def __init__(self, log_queue, target: logging.Handler):
+        super().__init__(log_queue)
+        self.target = target
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = super().prepare(record)
+        record._target = self.target
+        return record
+
+
+class _DispatchingQueueListener(QueueListener):
+    """Отдает запись только тому обработчику, вместо которого она попала в очередь"""
+
+    def handle(self, record: logging.LogRecord) -> None:
+        target = record.__dict__.pop("_target", None)
+        if target is not None and record.levelno >= target.level:
+            target.handle(record)
+
+
+_listener: QueueListener | None = None
+
+
+def _configured_loggers() -> list[logging.Logger]:
+    loggers = [logging.getLogger()]
+    loggers += [
+        logger for logger in logging.Logger.manager.loggerDict.values()
+        if isinstance(logger, logging.Logger) and logger.handlers
+    ]
+    return loggers
+
+
+def setup_queue_logging() -> None:
+    """Переводит обработчики всех настроенных логгеров на фоновый поток (идемпотентно)"""
+    global _listener
+    if _listener is not None:
+        return
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handlers: dict[logging.Handler, QueueHandler] = {}
+    for logger in _configured_loggers():
+        for handler in list(logger.handlers):
+            if isinstance(handler, QueueHandler):
+                continue
+            if handler not in queue_handlers:
+                queue_handlers[handler] = _TargetQueueHandler(log_queue, handler)
+            logger.removeHandler(handler)
+            logger.addHandler(queue_handlers[handler])
+    if not queue_handlers:
+        return
+    _listener = _DispatchingQueueListener(log_queue)
+    _listener.start()
+    atexit.register(_listener.stop)
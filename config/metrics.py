@@ -0,0 +1,191 @@
+"""
+Метрики Prometheus для бота и задач Celery.
+
+- задержка Bot API по методам (InstrumentedAiohttpSession в apps.bot.session);
+- отправленные/неотправленные сообщения по виду рассылки и классу ошибки;
+- строки и байты экспортов;
+- длительность задач Celery и время в БД на задачу;
+- время, число и длительность запросов к БД на апдейт бота (TracingMiddleware).
+
+Метрики отдаются HTTP-сервером на METRICS_PORT (0 — выключено), а в ASGI-процессе
+(вебхук бота под gunicorn) — view metrics_view по /metrics/. Для prefork-воркеров
+Celery и нескольких воркеров gunicorn нужно задать PROMETHEUS_MULTIPROC_DIR: тогда
+процессы пишут значения в файлы, а сервер или view их агрегирует. Вместо порта можно указать METRICS_TEXTFILE —
+путь для textfile collector node_exporter, файл перезаписывается после каждой задачи.
+"""
+import hmac
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import start_http_server, write_to_textfile
+from prometheus_client import multiprocess
+
+BOT_API_LATENCY = Histogram(
+    "bot_api_request_seconds",
+    "Задержка запросов к Bot API",
+    ["method"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+BOT_API_ERRORS = Counter(
+    "bot_api_errors_total",
+    "Ошибки запросов к Bot API",
+    ["method", "error"],
+)
+MESSAGES_SENT = Counter(
+    "bot_messages_sent_total",
+    "Отправленные сообщения рассылок",
+    ["kind"],
+)
+MESSAGES_FAILED = Counter(
+    "bot_messages_failed_total",
+    "Неотправленные сообщения рассылок по классу ошибки",
+    ["kind", "error"],
+)
+EXPORT_ROWS = Counter(
+    "export_rows_total",
+    "Выгруженные строки экспортов",
+    ["kind"],
+)
+EXPORT_BYTES = Counter(
+    "export_bytes_total",
+    "Размер файлов экспортов",
+    ["kind"],
+)
+TASK_DURATION = Histogram(
+    "celery_task_seconds",
+    "Длительность задач Celery",
+    ["task", "state"],
+    buckets=(0.1, 0.5, 1, 5, 15, 60, 300, 900, 1800),
+)
+TASK_DB_TIME = Histogram(
+    "celery_task_db_seconds",
+    "Время запросов к БД за задачу Celery",
+    ["task"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 15, 60, 300),
+)
+
+BOT_UPDATE_DURATION = Histogram(
+    "bot_update_seconds",
+    "Время обработки апдейта бота",
+    ["handler"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+BOT_UPDATE_QUERIES = Histogram(
+    "bot_update_db_queries",
+    "Количество запросов к БД на апдейт",
+    ["handler"],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100),
+)
+BOT_UPDATE_DB_TIME = Histogram(
+    "bot_update_db_seconds",
+    "Время запросов к БД на апдейт",
+    ["handler"],
+    buckets=(0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 5),
+)
+
+
+def record_sent(kind: str) -> None:
+    MESSAGES_SENT.labels(kind).inc()
+
+
+def record_failed(kind: str, error: BaseException) -> None:
+    MESSAGES_FAILED.labels(kind, type(error).__name__).inc()
+
+
+def record_export(kind: str, rows: int, size: int = 0) -> None:
+    EXPORT_ROWS.labels(kind).inc(rows)
+    if size:
+        EXPORT_BYTES.labels(kind).inc(size)
+
+
+@contextmanager
+def bot_api_timer(method: str):
+    """Замеряет вызов Bot API; ошибки считаются по классу исключения"""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as exc:
+        BOT_API_ERRORS.labels(method, type(exc).__name__).inc()
+        raise
+    finally:
+        BOT_API_LATENCY.labels(method).observe(time.perf_counter() - start)
+
+
+# Учет времени БД текущей задачи (prefork: одна задача на процесс; threads: на поток)
+_task_state = threading.local()
+
+
+def _db_time_wrapper(execute, sql, params, many, context):
+    if getattr(_task_state, "started_at", None) is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        _task_state.db_time += time.perf_counter() - start
+
+
+def task_started() -> None:
+    from django.db import connections
+
+    # Обертка ставится на все алиасы (default, direct, replica) и остается на них:
+    # вне задачи она ничего не считает
+    for connection in connections.all():
+        if _db_time_wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(_db_time_wrapper)
+    _task_state.db_time = 0.0
+    _task_state.started_at = time.perf_counter()
+
+
+def task_finished(task_name: str, state: str) -> None:
+    started_at = getattr(_task_state, "started_at", None)
+    if started_at is None:
+        return
+    TASK_DURATION.labels(task_name, state or "UNKNOWN").observe(time.perf_counter() - started_at)
+    TASK_DB_TIME.labels(task_name).observe(_task_state.db_time)
+    _task_state.started_at = None
+    write_textfile()
+
+
+def _registry():
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    from prometheus_client import REGISTRY
+
+    return REGISTRY
+
+
+def start_metrics_server(port: int | None = None) -> None:
+    from django.conf import settings
+
+    port = settings.METRICS_PORT if port is None else port
+    if port:
+        start_http_server(port, registry=_registry())
+
+
+def metrics_view(request):
+    """Метрики процесса (всех воркеров gunicorn в multiprocess-режиме) для Prometheus"""
+    from django.conf import settings
+    from django.http import HttpResponse, HttpResponseForbidden
+
+    token = settings.METRICS_TOKEN
+    if token and not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return HttpResponseForbidden()
+    return HttpResponse(generate_latest(_registry()), content_type=CONTENT_TYPE_LATEST)
+
+
+def write_textfile() -> None:
+    from django.conf import settings
+
+    if settings.METRICS_TEXTFILE:
+        write_to_textfile(settings.METRICS_TEXTFILE, _registry())
+
+
+def mark_process_dead(pid: int) -> None:
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid)
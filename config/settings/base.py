@@ -61,6 +61,34 @@ except:
         }
     }
 DATABASES["default"]["ATOMIC_REQUESTS"] = False
+# Проверка соединения перед повторным использованием (имеет смысл при CONN_MAX_AGE > 0)
+DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+# Отдельный алиас для долгих курсоров экспорта. В production указывает напрямую
+# на Postgres в обход PgBouncer (DATABASE_DIRECT_URL), локально совпадает с default
+_database_direct_url = env("DATABASE_DIRECT_URL", default="")
+DATABASES["direct"] = {
+    **DATABASES["default"],
+    **(env.db_url_config(_database_direct_url) if _database_direct_url else {}),
+    "TEST": {"MIRROR": "default"},
+}
+# Алиас БД, через который экспорты читают данные iterator()
+EXPORT_DB_ALIAS = env("EXPORT_DB_ALIAS", default="direct")
+# Реплика для отчетов (экспорты, аналитика, списки в админке), см. config/db_router.py.
+# Без DATABASE_REPLICA_URL все запросы идут в default
+_database_replica_url = env("DATABASE_REPLICA_URL", default="")
+if _database_replica_url:
+    DATABASES["replica"] = {
+        **env.db_url_config(_database_replica_url),
+        "CONN_HEALTH_CHECKS": True,
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_ROUTERS = ["config.db_router.PrimaryReplicaRouter"]
+# Допустимое отставание реплики (сек); при большем чтение возвращается на основную БД
+DATABASE_REPLICA_MAX_LAG = env.int("DATABASE_REPLICA_MAX_LAG", default=5)
+# Как часто (сек) процесс перепроверяет отставание реплики
+DATABASE_REPLICA_CHECK_INTERVAL = env.int("DATABASE_REPLICA_CHECK_INTERVAL", default=5)
+# С какого числа строк списки админки (Respondent, Answer) показывают оценку вместо COUNT(*)
+ADMIN_ESTIMATED_COUNT_THRESHOLD = env.int("ADMIN_ESTIMATED_COUNT_THRESHOLD", default=50000)
 # https://docs.djangoproject.com/en/stable/ref/settings/#std:setting-DEFAULT_AUTO_FIELD
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
@@ -159,6 +187,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "apps.polls_webapp.middleware.TGUserMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -259,6 +288,10 @@ DJANGO_ADMIN_FORCE_ALLAUTH = env.bool("DJANGO_ADMIN_FORCE_ALLAUTH", default=Fals
 # https://docs.djangoproject.com/en/dev/ref/settings/#logging
 # See https://docs.djangoproject.com/en/dev/topics/logging for
 # more details on how to customize your logging configuration.
+# Уровень логов кода проекта, доля и лимит (в секунду на шаблон) DEBUG/INFO сообщений
+LOG_LEVEL = env("LOG_LEVEL", default="INFO")
+LOG_SAMPLE_RATE = env.float("LOG_SAMPLE_RATE", default=1.0)
+LOG_RATE_LIMIT = env.int("LOG_RATE_LIMIT", default=20)
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
@@ -266,6 +299,14 @@ LOGGING = {
         "verbose": {
             "format": "%(levelname)s %(asctime)s %(module)s %(process)d %(thread)d %(message)s",
         },
+        "json": {"()": "config.log.JsonFormatter"},
+    },
+    "filters": {
+        "sampled": {
+            "()": "config.log.SampledFilter",
+            "sample_rate": LOG_SAMPLE_RATE,
+            "rate_limit": LOG_RATE_LIMIT,
+        },
     },
     "handlers": {
         "console": {
@@ -273,8 +314,18 @@ LOGGING = {
             "class": "logging.StreamHandler",
             "formatter": "verbose",
         },
+        "structured": {
+            "level": "DEBUG",
+            "class": "logging.StreamHandler",
+            "formatter": "json",
+            "filters": ["sampled"],
+        },
     },
     "root": {"level": "INFO", "handlers": ["console"]},
+    "loggers": {
+        # Код проекта: JSON-строки с полями extra, DEBUG/INFO сэмплируются
+        "apps": {"level": LOG_LEVEL, "handlers": ["structured"], "propagate": False},
+    },
 }
 
 REDIS_URL = env("REDIS_URL", default="redis://redis:6379/0")
@@ -314,11 +365,33 @@ CELERY_TASK_TIME_LIMIT = 30 * 60  # 30 minutes for export tasks
 CELERY_TASK_SOFT_TIME_LIMIT = 25 * 60  # 25 minutes soft limit for export tasks
 # https://docs.celeryq.dev/en/stable/userguide/configuration.html#beat-scheduler
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
+# https://docs.celeryq.dev/en/stable/userguide/periodic-tasks.html#beat-entries
+CELERY_BEAT_SCHEDULE = {
+    "flush-captcha-audit": {
+        "task": "apps.polls.tasks.flush_captcha_audit_task",
+        "schedule": 60.0,
+    },
+    "refill-captcha-image-pool": {
+        "task": "apps.polls.tasks.refill_captcha_image_pool_task",
+        "schedule": 5 * 60.0,
+    },
+    "dispatch-scheduled-broadcasts": {
+        "task": "apps.polls.tasks.dispatch_scheduled_broadcasts_task",
+        "schedule": 60.0,
+    },
+}
 # https://docs.celeryq.dev/en/stable/userguide/configuration.html#worker-send-task-events
 CELERY_WORKER_SEND_TASK_EVENTS = True
 # https://docs.celeryq.dev/en/stable/userguide/configuration.html#std-setting-task_send_sent_event
 CELERY_TASK_SEND_SENT_EVENT = True
 
+# Метрики Prometheus (config/metrics.py): порт HTTP-экспортера (0 — выключен)
+# и/или файл для textfile collector
+METRICS_PORT = env.int("METRICS_PORT", default=0)
+METRICS_TEXTFILE = env("METRICS_TEXTFILE", default="")
+# Bearer-токен для /metrics/ веб-процесса (пусто — без проверки, закрывать на уровне nginx)
+METRICS_TOKEN = env("METRICS_TOKEN", default="")
+
 # django-rest-framework
 # -------------------------------------------------------------------------------
 # django-rest-framework - https://www.django-rest-framework.org/api-guide/settings/
@@ -350,6 +423,26 @@ BOT_USERNAME = env("BOT_USERNAME", default="")
 BOT_WEBHOOK_PATH = "bot"
 BOT_HOST = env("HOST", default="https://bot.example.uz")
 WEBAPP_URL = env("WEBAPP_URL", default=f"{BOT_HOST}/webapp/")
+# Redis для бота: общий пул соединений и TTL состояний FSM (брошенные опросы)
+BOT_REDIS_MAX_CONNECTIONS = env.int("BOT_REDIS_MAX_CONNECTIONS", default=50)
+BOT_FSM_STATE_TTL = env.int("BOT_FSM_STATE_TTL", default=7 * 24 * 60 * 60)
+# Трассировка апдейтов бота: порог медленного апдейта (мс) и доля остальных в логе
+BOT_TRACE_SLOW_MS = env.int("BOT_TRACE_SLOW_MS", default=1000)
+BOT_TRACE_SAMPLE_RATE = env.float("BOT_TRACE_SAMPLE_RATE", default=0.01)
+# Политика показа капчи и порог риска для RiskScorePolicy
+BOT_CAPTCHA_POLICY = env("BOT_CAPTCHA_POLICY", default="apps.bot.captcha_policy.RiskScorePolicy")
+BOT_CAPTCHA_RISK_THRESHOLD = env.float("BOT_CAPTCHA_RISK_THRESHOLD", default=0.5)
+# Пул капч-картинок: размер и служебный чат, куда они загружаются для получения file_id
+BOT_CAPTCHA_IMAGE_POOL_SIZE = env.int("BOT_CAPTCHA_IMAGE_POOL_SIZE", default=200)
+BOT_CAPTCHA_UPLOAD_CHAT_ID = env("BOT_CAPTCHA_UPLOAD_CHAT_ID", default="")
+# Рассылки: интервал запуска чанков (сек) и окно "тихих часов" ("HH-HH", например "23-7"),
+# в которое уходят крупные запланированные рассылки и чанки запускаются плотнее
+BROADCAST_CHUNK_INTERVAL = env.float("BROADCAST_CHUNK_INTERVAL", default=2)
+BROADCAST_QUIET_CHUNK_INTERVAL = env.float("BROADCAST_QUIET_CHUNK_INTERVAL", default=0.5)
+BROADCAST_QUIET_HOURS = env("BROADCAST_QUIET_HOURS", default="")
+BROADCAST_QUIET_HOURS_MIN_USERS = env.int("BROADCAST_QUIET_HOURS_MIN_USERS", default=5000)
+# Через сколько минут без записей в журнал доставки рассылку "Отправляется" можно продолжить
+BROADCAST_STALL_MINUTES = env.int("BROADCAST_STALL_MINUTES", default=15)
 PAYMENT_PROVIDER_TOKEN = env("PAYMENT_PROVIDER_TOKEN", default="BOT")
 OPERATOR_CHAT_ID = env("OPERATOR_CHAT_ID", default="BOT")
 
@@ -10,6 +10,9 @@ from sentry_sdk.integrations.redis import RedisIntegration
 from .base import * # noqa
 from .base import DATABASES
 from .base import INSTALLED_APPS
+from .base import LOG_LEVEL
+from .base import LOG_RATE_LIMIT
+from .base import LOG_SAMPLE_RATE
 from .base import REDIS_URL
 from .base import SPECTACULAR_SETTINGS
 from .base import env
@@ -23,7 +26,24 @@ ALLOWED_HOSTS = env.list("DJANGO_ALLOWED_HOSTS", default=["toshmi.leetcode.uz"])
 
 # DATABASES
 # ------------------------------------------------------------------------------
-DATABASES["default"]["CONN_MAX_AGE"] = 0
+# default ходит через PgBouncer в режиме transaction pooling: серверное соединение
+# может смениться между транзакциями, поэтому серверные курсоры (iterator()) и
+# подготовленные выражения psycopg отключены.
+# Пулом соединений служит PgBouncer: ASGI-процесс (вебхук бота) закрывает соединение
+# после каждого запроса (постоянные соединения Django под ASGI не переиспользуются между
+# потоками), а новое соединение — локальный PgBouncer, а не Postgres. Долгоживущие
+# процессы (воркеры Celery) держат его DJANGO_CONN_MAX_AGE секунд с проверкой перед
+# использованием. Пул psycopg3 внутри процесса требует Django 5.1 (сейчас 5.0).
+DATABASES["default"]["CONN_MAX_AGE"] = env.int("DJANGO_CONN_MAX_AGE", default=0)
+DATABASES["default"]["DISABLE_SERVER_SIDE_CURSORS"] = True
+DATABASES["default"]["OPTIONS"] = {
+    **DATABASES["default"].get("OPTIONS", {}),
+    "prepare_threshold": None,
+}
+# direct — прямое соединение с Postgres для долгих курсоров экспорта:
+# серверные курсоры включены, соединение закрывается после задачи
+DATABASES["direct"]["CONN_MAX_AGE"] = 0
+DATABASES["direct"]["DISABLE_SERVER_SIDE_CURSORS"] = False
 
 # CACHES
 # ------------------------------------------------------------------------------
@@ -126,6 +146,14 @@ LOGGING = {
         "verbose": {
             "format": "%(levelname)s %(asctime)s %(module)s %(process)d %(thread)d %(message)s",
         },
+        "json": {"()": "config.log.JsonFormatter"},
+    },
+    "filters": {
+        "sampled": {
+            "()": "config.log.SampledFilter",
+            "sample_rate": LOG_SAMPLE_RATE,
+            "rate_limit": LOG_RATE_LIMIT,
+        },
     },
     "handlers": {
         "console": {
@@ -133,9 +161,16 @@ LOGGING = {
             "class": "logging.StreamHandler",
             "formatter": "verbose",
         },
+        "structured": {
+            "level": "DEBUG",
+            "class": "logging.StreamHandler",
+            "formatter": "json",
+            "filters": ["sampled"],
+        },
     },
     "root": {"level": "INFO", "handlers": ["console"]},
     "loggers": {
+        "apps": {"level": LOG_LEVEL, "handlers": ["structured"], "propagate": False},
         "django.db.backends": {
             "level": "ERROR",
             "handlers": ["console"],
@@ -11,6 +11,8 @@ from drf_spectacular.views import SpectacularAPIView
 from drf_spectacular.views import SpectacularSwaggerView
 from rest_framework.authtoken.views import obtain_auth_token
 
+from config.metrics import metrics_view
+
 
 urlpatterns = [
     path("", TemplateView.as_view(template_name="pages/home.html"), name="home"),
@@ -28,6 +30,8 @@ urlpatterns = [
     # ...
     path("bot/", include("apps.bot.urls")),
     path("webapp/", include("apps.polls_webapp.urls", namespace="polls_webapp")),
+    # Prometheus: метрики вебхука бота (апдейты, Bot API) из ASGI-процесса
+    path("metrics/", metrics_view, name="metrics"),
     # Media files
     *static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT),
 ]